@@ -1,41 +1,76 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 import os
-from PyPDF2 import PdfReader, PdfWriter
+from app.services.template_store import install_bundle, read_manifest
+from app.services import profiling
 
 router = APIRouter()
 
-# Pfad zu deinem Template-Ordner (relativ zur main.py oder absolut)
-TEMPLATE_DIR = "app/templates" 
-
 @router.post("/admin/upload-pdf")
 async def upload_admin_pdf(pdf: UploadFile = File(...)):
     if not pdf.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Datei muss eine PDF sein")
 
-    try:
-        # 1. Die hochgeladene Datei temporär lesen
-        reader = PdfReader(pdf.file)
-        
-        if len(reader.pages) < 2:
-            raise HTTPException(status_code=400, detail="Das PDF muss mindestens 2 Seiten haben")
-
-        # 2. Seite 1 extrahieren (Index 0)
-        writer1 = PdfWriter()
-        writer1.add_page(reader.pages[0])
-        path1 = os.path.join(TEMPLATE_DIR, "VV_Vorlage.pdf")
-        with open(path1, "wb") as f:
-            writer1.write(f)
-
-        # 3. Seite 2 extrahieren (Index 1)
-        writer2 = PdfWriter()
-        writer2.add_page(reader.pages[1])
-        path2 = os.path.join(TEMPLATE_DIR, "VV_2_Vorlage.pdf")
-        with open(path2, "wb") as f:
-            writer2.write(f)
-
-        return {"message": "PDF erfolgreich gesplittet und Vorlagen aktualisiert"}
+    data = await pdf.read()
 
+    try:
+        # Seite 1 → VV_Vorlage, Seite 2 → VV_2_Vorlage als neue Version;
+        # laufende Jobs bleiben auf ihrer bisherigen Version
+        manifest = await run_in_threadpool(install_bundle, data, pdf.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "message": "PDF erfolgreich gesplittet und Vorlagen aktualisiert",
+        "version": manifest["version"],
+        "pages": manifest["pages"],
+    }
+
+@router.get("/admin/templates")
+def get_templates():
+    # Aktive Vorlagen-Version inkl. Seitengeometrie
+    return read_manifest()
+
+# --- Profiling einzelner Uploads (POST /upload/?profile=true) ---
+
+@router.get("/admin/profiling")
+def get_profiling():
+    return {"enabled": profiling.profiling_enabled()}
+
+@router.post("/admin/profiling")
+def set_profiling(enabled: bool = Query(...)):
+    profiling.set_profiling_enabled(enabled)
+    return {"enabled": profiling.profiling_enabled()}
+
+@router.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    # Laufzeit pro Excel-Zeile, langsamste zuerst
+    rows = profiling.read_rows(profile_id)
+    if rows is None:
+        raise HTTPException(404, "Profil nicht gefunden")
+
+    return {
+        **rows,
+        "profile_url": f"/admin/profiles/{profile_id}/profile.prof",
+        "summary_url": f"/admin/profiles/{profile_id}/summary.txt",
+    }
+
+@router.get("/admin/profiles/{profile_id}/{name}")
+def download_profile(profile_id: str, name: str):
+    directory = profiling.profile_dir(profile_id)
+    media_types = {
+        profiling.PROFILE_FILE: "application/octet-stream",
+        profiling.SUMMARY_FILE: "text/plain; charset=utf-8",
+    }
+    if directory is None or name not in media_types or not os.path.exists(os.path.join(directory, name)):
+        raise HTTPException(404, "Profil nicht gefunden")
+
+    return FileResponse(
+        path=os.path.join(directory, name),
+        filename=f"{profile_id}_{name}",
+        media_type=media_types[name]
+    )
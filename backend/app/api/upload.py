@@ -1,227 +1,180 @@
-import uuid
 import os
 import shutil
 import tempfile
-import re
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-from collections import OrderedDict
-from app.services.excel import read_excel
-from app.services.vv_overlay import create_vv_pdf
-from app.services.vv2_overlay import create_vv2_pdf
-from app.services.ol_overlay import create_ol_pdf
-from app.services.pdf_merge import merge_pdfs
-from app.services.zip import zip_files
-from app.services.vv_overlay import split_multiple_objects
-
-def parse_we_list(value: str) -> list[int]:
-    if not value:
-        return []
-
-    parts = [p.strip() for p in str(value).split(",")]
-    return [int(p) for p in parts if p.isdigit()]
+from functools import partial
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query, Depends, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.services.excel import input_format, iter_rows, read_rows, Row
+from app.services.pdf_merge import STAMP_MODES
+from app.services.batch import render_batch, stream_batch, BatchOptions, BatchResult, OUTPUT_FORMATS
+from app.services.zip import ZIP_COMPRESSIONS
+from app.services.jobs import create_job, start_job, read_status, JOB_TTL_SECONDS
+from app.services.downloads import file_download
+from app.services.template_store import TemplateSet, current_templates
+from app.services.profiling import profiling_enabled, run_profiled
 
 def cleanup(path: str):
+    # Größe des Ordners misst render_batch, sobald das Ergebnis geschrieben ist
     shutil.rmtree(path, ignore_errors=True)
 
-def sum_vertrags_we(we_list: list[int]) -> int:
-    return sum(we_list)
-
-def sanitize_value(v):
-    if isinstance(v, float):
-        if v != v:  # Check auf NaN
-            return ""
-        if v.is_integer():
-            v = int(v)
-    
-    if isinstance(v, (str, int)):
-        v = str(v)
-        return (
-            v.replace("\u00a0", " ")   # NBSP
-             .replace("\u200b", "")    # Zero-width space
-             .replace("\u2011", "-")   # non-breaking hyphen
-             .strip()
-        )
-    return v
-
-def safe_filename(value: str, max_len: int = 80) -> str:
-    if not value:
-        return "objekt"
-
-    name = (
-        value
-        .replace("/", "-")
-        .replace(",", ",")
-    )
-
-    name = re.sub(r"[^\w\-, ]+", "", name)
-    name = re.sub(r"\s+", " ", name).strip()
-
-    return name[:max_len]
-
-def normalize_street_list(value: str) -> str:
-    if not value or not isinstance(value, str):
-        return value
-
-    parts = [p.strip() for p in value.split(",") if p.strip()]
-    result = []
-    current_street = None
-    
-    # Erkennt "Straße 123", "Str. 123a" oder "Straße 123 a"
-    street_re = re.compile(r"^(.+?)\s+(\d.*)$")
-
-    for part in parts:
-        m = street_re.match(part)
-        if m:
-            street, number = m.groups()
-            current_street = street.strip()
-            result.append(f"{current_street} {number.strip()}")
-        elif current_street:
-            # WICHTIG: Hier wird aus "b" -> "Bahner Str. b"
-            result.append(f"{current_street} {part}")
-        else:
-            result.append(part)
-
-    return ", ".join(result)
-def is_empty(v):
-    return (
-        v is None
-        or (isinstance(v, float) and v != v)  # NaN
-        or str(v).strip() == ""
-    )
-
-def is_weg(row: dict) -> bool:
-    return is_empty(row.get("Vertragsp. Firma")) and is_empty(row.get("Vertragsp. Name"))
-
-def shorten_streets(street_str: str) -> str:
-    if not street_str:
-        return ""
-    
-    parts = [p.strip() for p in str(street_str).split(",") if p.strip()]
-    streets = OrderedDict()
-
-    for part in parts:
-        # Wir versuchen den Split an der ERSTEN Stelle, wo eine Zahl auftaucht
-        # Das ist stabiler als rsplit, wenn Hausnummern Leerzeichen haben (8 a)
-        match = re.search(r"\s+\d", part)
-        
-        if match:
-            split_pos = match.start()
-            name = part[:split_pos].strip()
-            number = part[split_pos:].strip()
-            streets.setdefault(name, []).append(number)
-        else:
-            # Fallback: Wenn kein " Name Nummer" erkannt wird (z.B. nur "b")
-            # Schauen wir, ob wir das an die letzte Straße hängen können
-            if " " in part:
-                # Letzter Versuch: Split am letzten Leerzeichen
-                name, number = part.rsplit(" ", 1)
-                streets.setdefault(name.strip(), []).append(number.strip())
-            elif streets:
-                last_street = list(streets.keys())[-1]
-                streets[last_street].append(part)
-            else:
-                streets.setdefault(part.strip(), [])
-
-    result = []
-    for name, numbers in streets.items():
-        if numbers:
-            # Duplikate filtern und zusammenfügen
-            unique_nos = list(OrderedDict.fromkeys(numbers))
-            result.append(f"{name} {', '.join(unique_nos)}")
-        else:
-            result.append(name)
-
-    return ", ".join(result)
+def prepare_rows(file) -> list[Row]:
+    # Bereinigung + Straßen-Normalisierung spaltenweise in pandas
+    return read_rows(file)
+
+async def save_upload(file: UploadFile, workdir: str) -> str:
+    upload_path = os.path.join(workdir, f"upload{os.path.splitext(file.filename)[1].lower()}")
+    with open(upload_path, "wb") as f:
+        await run_in_threadpool(shutil.copyfileobj, file.file, f)
+    return upload_path
+
+def validate_upload(file: UploadFile):
+    if input_format(file) is None:
+        raise HTTPException(400, "Nur Excel-, CSV- oder Parquet-Dateien erlaubt")
+
+def batch_options(
+    stamp_mode: str = Query("merge"),
+    output: str = Query("zip"),
+    compression: str = Query("stored"),
+    compression_level: int | None = Query(None, ge=0, le=9)
+) -> BatchOptions:
+    if stamp_mode not in STAMP_MODES:
+        raise HTTPException(400, f"Unbekannter stamp_mode (erlaubt: {', '.join(STAMP_MODES)})")
+
+    if output not in OUTPUT_FORMATS:
+        raise HTTPException(400, f"Unbekanntes output-Format (erlaubt: {', '.join(OUTPUT_FORMATS)})")
+
+    if compression not in ZIP_COMPRESSIONS:
+        raise HTTPException(400, f"Unbekannte compression (erlaubt: {', '.join(ZIP_COMPRESSIONS)})")
+
+    return BatchOptions(output, stamp_mode, compression, compression_level)
+
+def run_upload(file, workdir: str, options: BatchOptions) -> BatchResult:
+    return render_batch(prepare_rows(file), workdir, options)
+
+def run_upload_job(
+    upload_path: str,
+    options: BatchOptions,
+    workdir: str,
+    progress,
+    templates: TemplateSet | None = None
+) -> BatchResult:
+    rows = prepare_rows(upload_path)
+    progress(0, len(rows))
+    return render_batch(rows, workdir, options, progress, templates)
 
 router = APIRouter(prefix="/upload")
 
 @router.post("/")
 async def upload_excel(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+    options: BatchOptions = Depends(batch_options),
+    stream: bool = Query(False),
+    profile: bool = Query(False)
 ):
-    if not file.filename.lower().endswith((".xlsx", ".xls")):
-        raise HTTPException(400, "Nur Excel-Dateien erlaubt")
+    validate_upload(file)
+
+    if stream and options.output != "zip":
+        raise HTTPException(400, "Streaming ist nur für output=zip möglich")
+
+    if profile and not profiling_enabled():
+        raise HTTPException(403, "Profiling ist nicht freigeschaltet (Admin)")
+
+    if profile and stream:
+        raise HTTPException(400, "Profiling ist nur ohne Streaming möglich")
 
     # --- Isolierter Temp-Ordner ---
     workdir = tempfile.mkdtemp(prefix="vv_")
 
-    rows = []
-
-    for row in read_excel(file):
-        row = {k: sanitize_value(v) for k, v in row.items()}
-
-        for col in (
-            "Objekt Str + Hnr",
-            "Bevollm. Str. Hnr",
-            "Vertragsp. Str + Hnr",
-        ):
-            if col in row:
-                row[col] = normalize_street_list(row[col])
-
-        rows.append(row)
-
-    final_pdfs = []
-
-    for i, row in enumerate(rows):
-        # 1. VV Seite 1 erzeugen
-        vv_pdf = create_vv_pdf(row, i, workdir)
-        
-        # 2. VV Seite 2 erzeugen (statt nur den Pfad zum Template zu nehmen)
-        vv2_pdf = create_vv2_pdf(row, i, workdir) 
-        
-        # Initialisiere die Liste für den Merge mit beiden bearbeiteten Seiten
-        pdfs_to_merge = [vv_pdf, vv2_pdf]
-
-        # Mehrere Objekte?
-        objects = split_multiple_objects(row.get("Objekt Str + Hnr", ""))
-
-        raw_val = row.get("Anzahl WE", "")
-        raw_we_str = str(raw_val).replace(".", ",")
-        we_list = [int(p.strip()) for p in raw_we_str.split(",") if p.strip().isdigit()]
-
-        if len(objects) > 1:
-            CHUNK_SIZE = 12
-
-            for chunk_idx in range(0, len(objects), CHUNK_SIZE):
-                obj_chunk = objects[chunk_idx:chunk_idx + CHUNK_SIZE]
-                we_chunk = we_list[chunk_idx:chunk_idx + CHUNK_SIZE]
-
-                ol_pdf = create_ol_pdf(
-                    objects=obj_chunk,
-                    plz=row.get("Objekt PLZ", ""),
-                    ort=row.get("Objekt Ort", ""),
-                    we_list=we_chunk,
-                    we_sum=sum_vertrags_we(we_list),
-                    index=f"{i}_{chunk_idx // CHUNK_SIZE}",
-                    workdir=workdir,
-                    start_lfd=chunk_idx
-                )
-                pdfs_to_merge.append(ol_pdf)
-
-        # VV (+ OL) zusammenfügen
-        if is_weg(row):
-            weg_name = f"WEG {shorten_streets(row.get('Objekt Str + Hnr'))}, {row.get('Objekt PLZ')} {row.get('Objekt Ort')}"
-            filename = safe_filename(weg_name)
-        else:
-            filename = safe_filename(f"{shorten_streets(row.get('Objekt Str + Hnr'))}, {row.get('Objekt PLZ')} {row.get('Objekt Ort')}")
-
-        final_pdf = merge_pdfs(
-            pdfs_to_merge,
-            f"{workdir}/{filename}.pdf"
-)
-
-        final_pdfs.append(final_pdf)
-
-    zip_path = zip_files(final_pdfs, workdir)
-    zip_path = os.path.abspath(zip_path)
-
     # --- Cleanup nach Download ---
     background_tasks.add_task(cleanup, workdir)
 
+    if stream:
+        # Upload sichern: gelesen wird erst während des Streamens, dann ist
+        # die UploadFile evtl. schon geschlossen
+        upload_path = await save_upload(file, workdir)
+
+        # Sync-Generator → Starlette iteriert ihn im Threadpool; Zeilen werden
+        # blockweise gelesen und gerendert, die ganze Datei liegt nie im Speicher
+        return StreamingResponse(
+            stream_batch(iter_rows(upload_path), options),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="Versorgungsvereinbarungen.zip"'}
+        )
+
+    headers = {}
+    if profile:
+        # Einlesen + Rendern in EINEM Thread, damit cProfile alles sieht;
+        # Ergebnis unter /admin/profiles/{id}
+        result, profile_id = await run_in_threadpool(
+            run_profiled, run_upload, file, workdir, options
+        )
+        headers["X-Profile-Id"] = profile_id
+    else:
+        # pandas / reportlab / pypdf blockieren → nicht auf dem Event-Loop
+        rows = await run_in_threadpool(prepare_rows, file)
+        result = await run_in_threadpool(render_batch, rows, workdir, options)
+
     return FileResponse(
-        path=zip_path,
-        filename="Versorgungsvereinbarungen.zip",
-        media_type="application/zip"
+        path=result.path,
+        filename=result.filename,
+        media_type=result.media_type,
+        headers={"X-Render-Errors": str(result.errors), **headers}
+    )
+
+# --- Job-Modus für große Uploads: sofort Job-ID, Fortschritt per Polling ---
+
+@router.post("/jobs", status_code=202)
+async def create_upload_job(
+    file: UploadFile = File(...),
+    options: BatchOptions = Depends(batch_options)
+):
+    validate_upload(file)
+
+    job_id, workdir = create_job()
+
+    # Upload sichern: die UploadFile ist nach dem Request geschlossen
+    upload_path = await save_upload(file, workdir)
+
+    # Vorlagen-Version beim Annehmen festhalten: ein Admin-Upload während der
+    # Job wartet oder läuft ändert seine Verträge nicht mehr
+    start_job(job_id, partial(run_upload_job, upload_path, options, templates=current_templates()))
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/upload/jobs/{job_id}",
+        "download_url": f"/upload/jobs/{job_id}/download",
+    }
+
+@router.get("/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    status = read_status(job_id)
+    if status is None:
+        raise HTTPException(404, "Job nicht gefunden")
+
+    return {
+        key: status.get(key)
+        for key in ("job_id", "status", "rows_done", "rows_total", "eta_seconds", "errors", "error")
+    }
+
+@router.get("/jobs/{job_id}/download")
+def download_upload_job(job_id: str, request: Request):
+    status = read_status(job_id)
+    if status is None:
+        raise HTTPException(404, "Job nicht gefunden")
+
+    if status["status"] != "done":
+        raise HTTPException(409, f"Job ist noch nicht fertig (Status: {status['status']})")
+
+    # Ergebnis ändert sich nie mehr → abgebrochene Downloads per Range fortsetzen
+    return file_download(
+        request,
+        path=status["path"],
+        filename=status["filename"],
+        media_type=status["media_type"],
+        cache_control=f"private, max-age={JOB_TTL_SECONDS}",
+        etag=status.get("etag"),
+        headers={"X-Render-Errors": str(status["errors"])}
     )
@@ -0,0 +1,325 @@
+# Benchmark der Upload-Pipeline, Ergebnis als JSON (zum Vergleich zwischen Versionen)
+#   cd backend
+#   python -m app.benchmark --rows 500 --output bench.json
+#   python -m app.benchmark --input echte_daten.xlsx --repeat 3
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlencode
+
+# Render-Cache würde ab dem zweiten Durchlauf alles überspringen
+os.environ.setdefault("RENDER_CACHE_MAX_MB", "0")
+
+from app.benchmark.workload import write_workbook
+from app.services import contract
+from app.services.contract import RENDERER_VERSION, build_batch_stamps, build_contract_stamps, contract_filename
+from app.services.excel import clean_frame, frame_rows, read_frame, read_rows
+from app.services.pdf_merge import StampWriter, write_stamps
+from app.services.render_pool import RENDER_BATCH_ROWS, RENDER_WORKERS, shutdown_executor
+from app.services.zip import zip_files
+
+BASE_DIR = Path(__file__).resolve().parents[2]   # backend
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Stages:
+    # Name → {"seconds": bester Lauf, "runs": alle Läufe, "items": ..., ...}
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: dict[str, dict] = {}
+
+    def run(self, name: str, func, items, **extra):
+        # items: Anzahl oder Funktion des Ergebnisses (z.B. len)
+        runs = []
+        for _ in range(self.repeat):
+            start = perf_counter()
+            value = func()
+            runs.append(perf_counter() - start)
+
+        self.add(name, runs, items(value) if callable(items) else items, **extra)
+        return value
+
+    def add(self, name: str, runs: list[float], items: int, **extra):
+        best = min(runs)
+        self.results[name] = {
+            "seconds": round(best, 6),
+            "runs": [round(r, 6) for r in runs],
+            "items": items,
+            "per_second": round(items / best, 3) if best > 0 else None,
+            **extra,
+        }
+        print(f"{name:24s} {best:9.3f}s  {items:7d} items", file=sys.stderr)
+
+@contextmanager
+def _timed_calls(module, names: list[str], totals: dict[str, list[float]]):
+    # Summierte Laufzeit der Funktionen, so wie contract sie aufruft
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(name, func):
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[name][0] += perf_counter() - start
+                totals[name][1] += 1
+        return timed
+
+    for name, func in originals.items():
+        setattr(module, name, wrap(name, func))
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+def _overlay_stages(stages: Stages, rows: list) -> list:
+    # Einzelne Overlay-Funktionen (je Stempel ein Canvas)
+    names = ["create_vv_stamp", "create_vv2_stamp", "create_ol_stamps"]
+    runs = {name: [] for name in names}
+    calls = {}
+    for _ in range(stages.repeat):
+        totals = {name: [0.0, 0] for name in names}
+        with _timed_calls(contract, names, totals):
+            for row in rows:
+                try:
+                    build_contract_stamps(row)
+                except Exception:
+                    pass
+        for name in names:
+            runs[name].append(totals[name][0])
+            calls[name] = totals[name][1]
+
+    for name in names:
+        stages.add(f"overlay.{name}", runs[name], calls[name])
+
+    # Produktionspfad: ein Canvas pro Stapel
+    def batched():
+        built = []
+        for i in range(0, len(rows), RENDER_BATCH_ROWS):
+            built.extend(build_batch_stamps(rows[i:i + RENDER_BATCH_ROWS]))
+        return built
+
+    built = stages.run("overlay.batched", batched, len(rows), batch_rows=RENDER_BATCH_ROWS)
+    return [
+        (contract_filename(row), stamps)
+        for row, stamps in zip(rows, built)
+        if not isinstance(stamps, Exception)
+    ]
+
+def _write_stages(stages: Stages, contracts: list, workdir: str) -> list[str]:
+    pages = sum(len(stamps) for _, stamps in contracts)
+
+    for mode in ("merge", "xobject"):
+        def write():
+            paths = []
+            for i, (filename, stamps) in enumerate(contracts):
+                path = os.path.join(workdir, mode, f"{i}_{filename}.pdf")
+                paths.append(write_stamps(stamps, path, mode=mode))
+            return paths
+
+        os.makedirs(os.path.join(workdir, mode), exist_ok=True)
+        paths = stages.run(f"write.{mode}", write, pages, unit="pages")
+        stages.results[f"write.{mode}"]["bytes"] = sum(os.path.getsize(p) for p in paths)
+
+    def combined():
+        writer = StampWriter()
+        for filename, stamps in contracts:
+            writer.add_document(filename, stamps)
+        buffer = BytesIO()
+        writer.write(buffer)
+        return buffer.getbuffer().nbytes
+
+    size = stages.run("write.combined_pdf", combined, pages, unit="pages")
+    stages.results["write.combined_pdf"]["bytes"] = size
+
+    return [os.path.join(workdir, "merge", name) for name in sorted(os.listdir(os.path.join(workdir, "merge")))]
+
+def _zip_stages(stages: Stages, paths: list[str], workdir: str):
+    size = sum(os.path.getsize(p) for p in paths)
+    for compression in ("stored", "deflate"):
+        zip_dir = os.path.join(workdir, f"zip_{compression}")
+        os.makedirs(zip_dir, exist_ok=True)
+        zip_path = stages.run(
+            f"zip.{compression}",
+            lambda: zip_files(paths, zip_dir, compression),
+            len(paths),
+            input_bytes=size
+        )
+        stages.results[f"zip.{compression}"]["bytes"] = os.path.getsize(zip_path)
+
+async def _asgi_upload(app, path: str, params: dict) -> tuple[int, int]:
+    # POST /upload/ direkt gegen die ASGI-App (ohne Netzwerk / HTTP-Client)
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        data = f.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/upload/",
+        "raw_path": b"/upload/",
+        "root_path": "",
+        "query_string": urlencode(params).encode(),
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+
+    done = asyncio.Event()
+    received = False
+    status = 0
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Erst nach der kompletten Antwort "trennt" der Client
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return status, size
+
+def _upload_stages(stages: Stages, path: str, rows: int):
+    from app.main import app
+
+    for name, params in (
+        ("upload.zip", {}),
+        ("upload.zip_stream", {"stream": "true"}),
+        ("upload.pdf", {"output": "pdf"}),
+    ):
+        status, size = stages.run(name, lambda: asyncio.run(_asgi_upload(app, path, params)), rows)
+        stages.results[name].update(status=status, bytes=size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der Upload-Pipeline (JSON-Ausgabe)")
+    parser.add_argument("--input", help="vorhandene Excel-/CSV-/Parquet-Datei statt synthetischer Daten")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--weg-share", type=float, default=0.3)
+    parser.add_argument("--multi-share", type=float, default=0.2)
+    parser.add_argument("--long-share", type=float, default=0.1)
+    parser.add_argument("--max-objects", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Läufe pro Stufe (gemeldet wird der schnellste)")
+    parser.add_argument("--skip-upload", action="store_true", help="POST /upload/ nicht messen")
+    parser.add_argument("--output", help="JSON-Datei (Standard: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vv_bench_")
+    try:
+        workload = {"input": args.input}
+        path = args.input
+        if path is None:
+            workload.update(
+                rows=args.rows,
+                weg_share=args.weg_share,
+                multi_share=args.multi_share,
+                long_share=args.long_share,
+                max_objects=args.max_objects,
+                seed=args.seed,
+            )
+            path = write_workbook(
+                os.path.join(workdir, "workload.xlsx"),
+                rows=args.rows,
+                weg_share=args.weg_share,
+                multi_share=args.multi_share,
+                long_share=args.long_share,
+                max_objects=args.max_objects,
+                seed=args.seed,
+            )
+
+        stages = Stages(max(1, args.repeat))
+
+        # Einlesen + Bereinigung
+        if path.lower().endswith((".xlsx", ".xls")):
+            frame = stages.run("read_excel", lambda: read_frame(path), len)
+            cleaned = stages.run("sanitize", lambda: clean_frame(frame), len(frame))
+            stages.run("frame_rows", lambda: frame_rows(cleaned), len(frame))
+        rows = stages.run("read_rows", lambda: read_rows(path), len)
+        workload["rows"] = len(rows)
+
+        # Rendern
+        contracts = _overlay_stages(stages, rows)
+        workload.update(
+            contracts=len(contracts),
+            errors=len(rows) - len(contracts),
+            weg_rows=sum(1 for row in rows if contract.is_weg(row)),
+            pages=sum(len(stamps) for _, stamps in contracts),
+        )
+
+        paths = _write_stages(stages, contracts, workdir)
+        _zip_stages(stages, paths, workdir)
+
+        if not args.skip_upload:
+            _upload_stages(stages, path, len(rows))
+
+        result = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "renderer_version": RENDERER_VERSION,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "render_workers": RENDER_WORKERS,
+                "render_batch_rows": RENDER_BATCH_ROWS,
+            },
+            "workload": workload,
+            "stages": stages.results,
+        }
+    finally:
+        shutdown_executor()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
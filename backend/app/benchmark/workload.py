@@ -0,0 +1,130 @@
+import random
+from pathlib import Path
+
+import pandas as pd
+
+# Synthetische Uploads in der Form von "Versorgungsvereinbarung Template.xlsx"
+BASE_DIR = Path(__file__).resolve().parents[1]   # backend/app
+TEMPLATE_XLSX = BASE_DIR / "templates" / "Versorgungsvereinbarung Template.xlsx"
+
+STREETS = [
+    "Hauptstraße", "Bahnhofstr.", "Lindenallee", "Am Markt", "Gartenweg",
+    "Schillerstraße", "Goethestr.", "Ringstraße", "Kirchplatz", "Bergstraße",
+]
+CITIES = [
+    ("10115", "Berlin"), ("50823", "Köln"), ("01067", "Dresden"), ("80331", "München"),
+    ("20095", "Hamburg"), ("04109", "Leipzig"), ("90402", "Nürnberg"), ("28195", "Bremen"),
+]
+FIRST_NAMES = ["Anna", "Hans", "Erika", "Jürgen", "Fatma", "Lukas", "Marie", "Özlem"]
+LAST_NAMES = ["Müller", "Schmidt", "Meier", "Schulz", "Yılmaz", "Wagner", "Becker", "Hoffmann"]
+COMPANIES = ["Hausverwaltung GmbH", "Immobilien KG", "Wohnbau eG", "Verwaltung & Partner"]
+
+# Erzwingen Umbruch, Verkleinern und den zeichenweisen Fallback in draw_text_in_box
+LONG_STREETS = [
+    "Am Sehr Langen Straßennamen-Weg-Der-Nicht-In-Die-Box-Passt",
+    "Donaudampfschifffahrtsgesellschaftskapitänswitwenstraße",
+]
+LONG_CITIES = ["Frankfurt am Main-Sachsenhausen-Nord", "Wolfratshausen-Waldram-Ost"]
+LONG_COMPANIES = [
+    "Haus- und Grundstücksverwaltungsgesellschaft Immobilienmanagement mbH & Co. KG",
+    "Wohnungseigentümergemeinschaftsverwaltungsgesellschaft",
+]
+LONG_NAMES = ["Müller-Lüdenscheidt-Hohenzollern", "Schmidt-Schwarzenberg von Falkenhausen"]
+
+
+def template_columns() -> list[str]:
+    return list(pd.read_excel(TEMPLATE_XLSX, nrows=0).columns)
+
+def _objects(rnd: random.Random, count: int, long: bool) -> tuple[str, list[int]]:
+    # Mehrere Objekte wie in echten Uploads: "Str 1, 3, Andere Str 4"
+    parts = []
+    while len(parts) < count:
+        street = rnd.choice(LONG_STREETS if long else STREETS)
+        numbers = rnd.sample(range(1, 200), min(count - len(parts), rnd.randint(1, 6)))
+        parts.append(f"{street} {numbers[0]}")
+        parts.extend(str(n) for n in numbers[1:])
+
+    return ", ".join(parts), [rnd.randint(1, 40) for _ in parts]
+
+def _person(rnd: random.Random, long: bool) -> tuple[str, str, str]:
+    # → (Herr/Frau, Name, Vorname)
+    return (
+        rnd.choice(["H", "F"]),
+        rnd.choice(LONG_NAMES if long else LAST_NAMES),
+        rnd.choice(FIRST_NAMES),
+    )
+
+def generate_rows(
+    rows: int = 1000,
+    weg_share: float = 0.3,
+    multi_share: float = 0.2,
+    long_share: float = 0.1,
+    max_objects: int = 40,
+    seed: int = 0
+) -> pd.DataFrame:
+    # weg_share:   Zeilen ohne Vertragspartner-Firma/-Name (is_weg)
+    # multi_share: Zeilen mit mehreren Objekten (OL-Seiten, ab 13 Objekten
+    #              mehrere OL-Chunks)
+    # long_share:  Zeilen mit überlangen Namen/Adressen
+    rnd = random.Random(seed)
+    columns = template_columns()
+    records = []
+
+    for _ in range(rows):
+        long = rnd.random() < long_share
+        multi = rnd.random() < multi_share
+        plz, ort = rnd.choice(CITIES)
+        if long:
+            ort = rnd.choice(LONG_CITIES)
+
+        objects, we_list = _objects(rnd, rnd.randint(2, max(2, max_objects)) if multi else 1, long)
+        record = {
+            "Objekt Str + Hnr": objects,
+            "Objekt PLZ": plz,
+            "Objekt Ort": ort,
+            "Anzahl WE": ",".join(map(str, we_list)) if multi else we_list[0],
+        }
+
+        # Bevollmächtigte: Firma, Person oder leer
+        kind = rnd.random()
+        if kind < 0.4:
+            record["Bevollm. Firma"] = rnd.choice(LONG_COMPANIES if long else COMPANIES)
+        elif kind < 0.8:
+            (
+                record["Bevollm. Herr/Frau (H/F)"],
+                record["Bevollm. Name"],
+                record["Bevollm. Vorname"],
+            ) = _person(rnd, long)
+        if kind < 0.8:
+            bev_plz, bev_ort = rnd.choice(CITIES)
+            record["Bevollm. Str. Hnr"] = f"{rnd.choice(STREETS)} {rnd.randint(1, 99)}"
+            record["Bevollm. PLZ"] = bev_plz
+            record["Bevollm. Ort"] = bev_ort
+
+        # Vertragspartner: fehlt bei WEG
+        if rnd.random() >= weg_share:
+            if rnd.random() < 0.5:
+                record["Vertragsp. Firma"] = rnd.choice(LONG_COMPANIES if long else COMPANIES)
+            else:
+                (
+                    record["Vertragsp. Herr/Frau (H/F)"],
+                    record["Vertragsp. Name"],
+                    record["Vertragsp. Vorname"],
+                ) = _person(rnd, long)
+            vp_plz, vp_ort = rnd.choice(CITIES)
+            record["Vertragsp. Str + Hnr"] = f"{rnd.choice(STREETS)} {rnd.randint(1, 99)}"
+            record["Vertragsp. PLZ"] = vp_plz
+            record["Vertragsp. Ort"] = vp_ort
+
+        if rnd.random() < 0.5:
+            record["Unterschrift Vorname Nachname"] = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+            record["Unterschrift Datum"] = f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2026"
+
+        records.append(record)
+
+    return pd.DataFrame(records, columns=columns)
+
+def write_workbook(path: str | Path, **kwargs) -> str:
+    # kwargs wie generate_rows
+    generate_rows(**kwargs).to_excel(path, index=False)
+    return str(path)
@@ -1,8 +1,12 @@
+import os
+import secrets
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from app.api.upload import router as upload_router
 from app.api import admin
+from app.services import metrics
+from app.services.downloads import file_download
 
 app = FastAPI()
 
@@ -18,25 +22,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"]
+    expose_headers=["Content-Disposition", "X-Render-Errors", "X-Profile-Id", "ETag", "Content-Range"]
 )
 
+# Laufzeiten aller Anfragen (außen, damit auch CORS-Antworten zählen)
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 # Upload API
 app.include_router(upload_router)
 app.include_router(admin.router)
 
 
-# Excel Template Download
+# Excel Template Download (Browser fragt nach Ablauf mit If-None-Match nach → 304)
+TEMPLATE_MAX_AGE = int(os.environ.get("TEMPLATE_MAX_AGE", "3600"))
+
 @app.get("/template")
-def download_template():
-    return FileResponse(
+def download_template(request: Request):
+    return file_download(
+        request,
         path="app/templates/Versorgungsvereinbarung Template.xlsx",
         filename="Versorgungsvereinbarung Template.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        cache_control=f"public, max-age={TEMPLATE_MAX_AGE}, must-revalidate"
     )
 
+# Prometheus-Metriken (Stufen-Laufzeiten, Zeilen, Seiten, Bytes). Mit
+# METRICS_TOKEN nur mit "Authorization: Bearer <Token>" (bearer_token in der
+# Prometheus-Konfiguration); ohne Token ist /metrics offen und muss dann per
+# Firewall/Reverse-Proxy von außen gesperrt werden
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or ""
+
+@app.get("/metrics")
+def get_metrics(request: Request):
+    if METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if not secrets.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            raise HTTPException(401, "Nicht angemeldet", headers={"WWW-Authenticate": "Bearer"})
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # venv\Scripts\activate
 # uvicorn app.main:app --reload
-# Produktiv: gunicorn -w 4 -k uvicorn.workers.UvicornWorker app.main:app
-# bash gunicorn -w 4 -k uvicorn.workers.UvicornWorker app.main:app
\ No newline at end of file
+# Produktiv: WEB_CONCURRENCY=4 gunicorn -k uvicorn.workers.UvicornWorker app.main:app
+# (WEB_CONCURRENCY = Anzahl Worker; RENDER_WORKERS gilt pro Worker und ist
+# standardmäßig Kerne / WEB_CONCURRENCY)
+# bash WEB_CONCURRENCY=4 gunicorn -k uvicorn.workers.UvicornWorker app.main:app
\ No newline at end of file
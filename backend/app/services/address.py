@@ -0,0 +1,108 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# Adresslisten wie "Bahner Str. 8 a, b, Hauptstr. 3" werden pro Wert EINMAL
+# zerlegt; Dateiname, VV-Felder und OL-Tabelle lesen dasselbe Ergebnis
+
+# Gleiche Zelle wird pro Zeile mehrfach gebraucht, Bevollmächtigten-Adressen
+# wiederholen sich über viele Zeilen
+ADDRESS_CACHE_SIZE = 4096
+
+# Erkennt "Straße 123", "Str. 123a" oder "Straße 123 a" (Normalisierung beim Einlesen)
+STREET_RE = re.compile(r"^(.+?)\s+(\d.*)$")
+
+_STREET_NUMBER_RE = re.compile(r"(.+?)\s+(\d+.*)$")    # Straße + Nummer (erste Straße)
+_NUMBER_START_RE = re.compile(r"\s+\d")                 # Beginn der Hausnummer
+_DIGIT_RE = re.compile(r"\d")
+_INT_RE = re.compile(r"\d+")
+
+# Objekte ohne erkennbare Nummer sortieren nach allen anderen
+_NO_NUMBER_KEY = 9999
+
+
+class AddressList(NamedTuple):
+    objects: tuple[str, ...]                        # Einzelobjekte (getrimmt, ohne leere)
+    street: str | None                              # erste Straße, sonst der ganze Text ...
+    house_numbers: str | None                       # ... und ihre Hausnummern ("8 a, 10")
+    groups: tuple[tuple[str, tuple[str, ...]], ...] # Straße → Hausnummern (ohne Duplikate)
+    short: str                                      # Kurzform "Bahner Str. 8 a, b, Hauptstr. 3"
+    lowest: tuple[str | None, str | None]           # Straße + Nummer mit der kleinsten Hausnummer
+
+
+EMPTY_ADDRESSES = AddressList((), None, None, (), "", (None, None))
+
+
+def _number_key(number: str) -> int:
+    # Natürliche Sortierung: "8a" vor "9", "10" nach "9"
+    match = _INT_RE.search(number)
+    return int(match.group()) if match else _NO_NUMBER_KEY
+
+def _parse(text: str) -> AddressList:
+    objects = tuple(p.strip() for p in text.split(",") if p.strip())
+
+    main_street = None
+    house_numbers = []
+    groups: dict[str, list[str]] = {}
+    pairs = []
+
+    for part in objects:
+        # Erste Straße + alle ihre Nummern; Teile ohne Ziffer ("b") sind Nachträge
+        match = _STREET_NUMBER_RE.search(part)
+        if match:
+            street, number = match.groups()
+            if main_street is None:
+                main_street = street
+            if street == main_street:
+                house_numbers.append(number)
+        elif main_street and house_numbers:
+            house_numbers.append(part)
+
+        # Gruppen für die Kurzform: Split an der ERSTEN Stelle, wo eine Zahl
+        # auftaucht (stabiler als rsplit, wenn Hausnummern Leerzeichen haben)
+        match = _NUMBER_START_RE.search(part)
+        if match:
+            groups.setdefault(part[:match.start()].strip(), []).append(part[match.start():].strip())
+        elif " " in part:
+            name, number = part.rsplit(" ", 1)
+            groups.setdefault(name.strip(), []).append(number.strip())
+        elif groups:
+            # Nur "b" → an die zuletzt angelegte Straße hängen
+            groups[next(reversed(groups))].append(part)
+        else:
+            groups.setdefault(part, [])
+
+        # Straße/Nummer ab der ersten Ziffer (für die kleinste Hausnummer)
+        match = _DIGIT_RE.search(part)
+        if match:
+            pairs.append((part[:match.start()].strip(), part[match.start():].strip()))
+        elif " " in part:
+            street, number = part.rsplit(" ", 1)
+            pairs.append((street.strip(), number.strip()))
+
+    unique_groups = tuple(
+        (name, tuple(dict.fromkeys(numbers))) for name, numbers in groups.items()
+    )
+
+    return AddressList(
+        objects=objects,
+        # Ohne erkennbare Nummer: ganzer Text als Straße
+        street=main_street if main_street else text,
+        house_numbers=", ".join(house_numbers) if main_street else "",
+        groups=unique_groups,
+        short=", ".join(
+            f"{name} {', '.join(numbers)}" if numbers else name
+            for name, numbers in unique_groups
+        ),
+        lowest=min(pairs, key=lambda p: _number_key(p[1])) if pairs else (text, ""),
+    )
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _parse_cached(text: str) -> AddressList:
+    return _parse(text)
+
+def parse_addresses(value) -> AddressList:
+    # Ergebnis ist unveränderlich und wird geteilt (Memo)
+    if not value:
+        return EMPTY_ADDRESSES
+    return _parse_cached(str(value))
@@ -0,0 +1,133 @@
+import os
+from functools import partial
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from app.services.contract import (
+    render_contract_bytes_batch,
+    render_contract_file_batch,
+    render_contract_stamps_batch,
+)
+from app.services import metrics
+from app.services.pdf_merge import StampWriter
+from app.services.render_cache import prune_cache
+from app.services.render_pool import iter_render_batches, render_rows, format_errors
+from app.services.template_store import TemplateSet, current_templates
+from app.services.zip import stream_zip, zip_files
+
+OUTPUT_FORMATS = ("zip", "pdf")
+
+# Streaming: erster Stapel nur eine Zeile → erstes Byte nach dem ersten
+# Vertrag statt nach RENDER_BATCH_ROWS Verträgen
+STREAM_FIRST_BATCH_ROWS = 1
+
+
+class BatchOptions(NamedTuple):
+    output: str = "zip"                     # "zip" | "pdf"
+    stamp_mode: str = "merge"               # siehe STAMP_MODES
+    compression: str = "stored"             # siehe ZIP_COMPRESSIONS
+    compression_level: int | None = None    # nur für deflate / auto
+
+
+class BatchResult(NamedTuple):
+    path: str
+    filename: str
+    media_type: str
+    errors: int     # Anzahl fehlgeschlagener Zeilen
+
+
+def render_batch(
+    rows: list[dict],
+    workdir: str,
+    options: BatchOptions = BatchOptions(),
+    progress: Callable[[int, int], None] | None = None,
+    templates: TemplateSet | None = None
+) -> BatchResult:
+    # Alle Zeilen mit derselben Vorlagen-Version, auch wenn der Admin
+    # währenddessen neue Vorlagen hochlädt
+    templates = templates or current_templates()
+
+    if options.output == "pdf":
+        # Overlays parallel rendern, danach ein Gesamt-PDF mit Lesezeichen pro
+        # Vertrag; Vorlagen und Fonts werden nur einmal eingebettet
+        results = render_rows(
+            partial(render_contract_stamps_batch, templates=templates),
+            rows,
+            progress,
+            batched=True
+        )
+
+        writer = StampWriter()
+        for result in results:
+            if result.error is None:
+                filename, stamps = result.value
+                writer.add_document(filename, stamps)
+
+        with metrics.stage("combined_pdf"):
+            pdf_path = writer.write(os.path.join(workdir, "Versorgungsvereinbarungen.pdf"))
+        metrics.record_workdir(workdir)
+
+        return BatchResult(
+            path=os.path.abspath(pdf_path),
+            filename="Versorgungsvereinbarungen.pdf",
+            media_type="application/pdf",
+            errors=sum(1 for r in results if r.error is not None)
+        )
+
+    # Jeder Stapel wird (ggf. in einem eigenen Prozess) auf einem Canvas
+    # gezeichnet, jede Zeile als eigenes PDF geschrieben; die Reihenfolge
+    # bleibt für die Namens-Suffixe erhalten
+    results = render_rows(
+        partial(render_contract_file_batch, workdir=workdir, stamp_mode=options.stamp_mode, templates=templates),
+        rows,
+        progress,
+        batched=True
+    )
+    final_pdfs = [r.value for r in results if r.error is None]
+    prune_cache()
+
+    errors = format_errors(results)
+    if errors:
+        error_path = os.path.join(workdir, "Fehler.txt")
+        with open(error_path, "w", encoding="utf-8") as f:
+            f.write(errors + "\n")
+        final_pdfs.append(error_path)
+
+    zip_path = zip_files(final_pdfs, workdir, options.compression, options.compression_level)
+    # Größter Stand: Upload, alle Einzel-PDFs und das ZIP liegen vor (gelöscht
+    # wird erst beim Aufräumen nach dem Download)
+    metrics.record_workdir(workdir)
+
+    return BatchResult(
+        path=os.path.abspath(zip_path),
+        filename="Versorgungsvereinbarungen.zip",
+        media_type="application/zip",
+        errors=sum(1 for r in results if r.error is not None)
+    )
+
+def _iter_contract_pdfs(rows: Iterable[dict], stamp_mode: str, templates: TemplateSet) -> Iterator[tuple[str, bytes]]:
+    failed = []
+
+    render = partial(render_contract_bytes_batch, stamp_mode=stamp_mode, templates=templates)
+    for result in iter_render_batches(render, rows, first_batch_size=STREAM_FIRST_BATCH_ROWS):
+        if result.error is None:
+            yield result.value
+        else:
+            failed.append(result)
+
+    prune_cache()
+
+    if failed:
+        yield "Fehler.txt", (format_errors(failed) + "\n").encode("utf-8")
+
+def stream_batch(
+    rows: Iterable[dict],
+    options: BatchOptions = BatchOptions(),
+    templates: TemplateSet | None = None
+) -> Iterator[bytes]:
+    # ZIP wird während des Renderns gestreamt: erstes Byte nach der ersten
+    # Zeile, keine PDFs und kein ZIP auf der Platte; rows darf ein Generator sein
+    return stream_zip(
+        _iter_contract_pdfs(rows, options.stamp_mode, templates or current_templates()),
+        options.compression,
+        options.compression_level
+    )
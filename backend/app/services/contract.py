@@ -0,0 +1,269 @@
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+from typing import Any, Callable
+from app.services import address, fonts, ol_overlay, overlay_batch, pdf_merge, template_cache, text_layout, vv_overlay, vv2_overlay
+from app.services.vv_overlay import create_vv_stamp, contract_start_date, vv_field_plan
+from app.services.vv2_overlay import create_vv2_stamp
+from app.services.ol_overlay import create_ol_stamps, OL_TEMPLATE
+from app.services.overlay_batch import OverlayBatch
+from app.services.pdf_merge import Stamp, write_stamps
+from app.services.address import parse_addresses
+from app.services import metrics, profiling
+from app.services.render_cache import cache_enabled, cache_key, get_bytes, get_file, put_bytes, put_file
+from app.services.template_cache import template_digest
+from app.services.template_store import TemplateSet, current_templates
+
+def _source_digest(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Ändert sich der Render-Code (Deployment), ändern sich alle Cache-Schlüssel
+RENDERER_VERSION = _source_digest(
+    __file__,
+    address.__file__,
+    vv_overlay.__file__,
+    vv2_overlay.__file__,
+    ol_overlay.__file__,
+    text_layout.__file__,
+    pdf_merge.__file__,
+    overlay_batch.__file__,
+    template_cache.__file__,
+    fonts.__file__,
+    *fonts.FONT_FILES,
+)
+
+def sum_vertrags_we(we_list: list[int]) -> int:
+    return sum(we_list)
+
+def safe_filename(value: str, max_len: int = 80) -> str:
+    if not value:
+        return "objekt"
+
+    name = (
+        value
+        .replace("/", "-")
+        .replace(",", ",")
+    )
+
+    name = re.sub(r"[^\w\-, ]+", "", name)
+    name = re.sub(r"\s+", " ", name).strip()
+
+    return name[:max_len]
+
+def is_empty(v):
+    return (
+        v is None
+        or (isinstance(v, float) and v != v)  # NaN
+        or str(v).strip() == ""
+    )
+
+def is_weg(row: dict) -> bool:
+    return is_empty(row.get("Vertragsp. Firma")) and is_empty(row.get("Vertragsp. Name"))
+
+def contract_filename(row: dict) -> str:
+    streets = parse_addresses(row.get('Objekt Str + Hnr')).short
+    if is_weg(row):
+        weg_name = f"WEG {streets}, {row.get('Objekt PLZ')} {row.get('Objekt Ort')}"
+        return safe_filename(weg_name)
+    return safe_filename(f"{streets}, {row.get('Objekt PLZ')} {row.get('Objekt Ort')}")
+
+def build_contract_stamps(
+    row: dict,
+    batch: OverlayBatch | None = None,
+    templates: TemplateSet | None = None,
+    vv_plan: tuple | None = None
+) -> list[Stamp]:
+    # Mit batch landen die Overlays im gemeinsamen Stapel-Canvas → danach
+    # batch.bind() aufrufen. templates: Vorlagen-Version (Standard: aktuelle),
+    # vv_plan: VV-Feldplan des Stapels (Standard: heutiger)
+    templates = templates or current_templates()
+
+    # 1. VV Seite 1 erzeugen (im Speicher)
+    with metrics.stage("vv_overlay"):
+        vv_stamp = create_vv_stamp(row, batch, templates.vv, vv_plan)
+    
+    # 2. VV Seite 2 erzeugen (statt nur den Pfad zum Template zu nehmen)
+    with metrics.stage("vv2_overlay"):
+        vv2_stamp = create_vv2_stamp(row, batch, templates.vv2) 
+    
+    # Initialisiere die Liste für den Merge mit beiden bearbeiteten Seiten
+    stamps = [vv_stamp, vv2_stamp]
+
+    # Mehrere Objekte?
+    objects = list(parse_addresses(row.get("Objekt Str + Hnr", "")).objects)
+
+    raw_val = row.get("Anzahl WE", "")
+    raw_we_str = str(raw_val).replace(".", ",")
+    we_list = [int(p.strip()) for p in raw_we_str.split(",") if p.strip().isdigit()]
+
+    if len(objects) > 1:
+        # Alle Objekte auf einmal: create_ol_stamps verteilt sie auf so viele
+        # OL-Seiten wie nötig (OL_ROWS_PER_PAGE Zeilen je Seite)
+        with metrics.stage("ol_overlay"):
+            ol_stamps = create_ol_stamps(
+                objects=objects,
+                plz=row.get("Objekt PLZ", ""),
+                ort=row.get("Objekt Ort", ""),
+                we_list=we_list,
+                we_sum=sum_vertrags_we(we_list),
+                batch=batch
+            )
+        stamps.extend(ol_stamps)
+
+    return stamps
+
+def render_key(row: dict, stamp_mode: str, templates: TemplateSet) -> str | None:
+    # Alles, was das fertige PDF bestimmt: Zeile, Code, Vorlagen, Datum, Modus
+    # Profil-Läufe rendern immer neu (Cache-Treffer würden langsame Zeilen verstecken)
+    if not cache_enabled() or profiling.active_timer() is not None:
+        return None
+
+    return cache_key(
+        RENDERER_VERSION,
+        stamp_mode,
+        contract_start_date(),
+        [template_digest(path) for path in (templates.vv, templates.vv2, OL_TEMPLATE)],
+        sorted(((str(k), v) for k, v in row.items()), key=lambda item: item[0]),
+    )
+
+def build_batch_stamps(rows: list[dict], templates: TemplateSet | None = None) -> list[list[Stamp] | Exception]:
+    # Overlays aller Zeilen als Seiten EINES Canvas; pro Zeile Stempel oder
+    # Exception (eine kaputte Zeile bricht den Stapel nicht ab)
+    templates = templates or current_templates()
+    batch = OverlayBatch()
+
+    # Feldplan (inkl. Vertragsbeginn) einmal für den ganzen Stapel
+    vv_plan = vv_field_plan()
+
+    built = []
+    for row in rows:
+        try:
+            built.append(build_contract_stamps(row, batch, templates, vv_plan))
+        except Exception as e:
+            built.append(e)
+
+    return [
+        stamps if isinstance(stamps, Exception) else batch.bind(stamps)
+        for stamps in built
+    ]
+
+def _render_batch(
+    rows: list[dict],
+    lookup: Callable[[dict], tuple[Any, str | None, Any]],
+    store: Callable[[list[Stamp], Any, str | None], Any],
+    templates: TemplateSet
+) -> list:
+    # lookup(row) → (Ziel, Cache-Schlüssel, Ergebnis aus dem Cache oder None)
+    # store(stamps, Ziel, Schlüssel) → Ergebnis; gezeichnet werden nur die
+    # Zeilen ohne Cache-Treffer, gemeinsam auf einem Canvas
+    results = []
+    todo = []
+    for row in rows:
+        try:
+            target, key, cached = lookup(row)
+        except Exception as e:
+            results.append(e)
+            continue
+
+        results.append(cached)
+        if cached is None:
+            todo.append((len(results) - 1, row, target, key))
+
+    built = build_batch_stamps([row for _, row, _, _ in todo], templates)
+    for (i, _, target, key), stamps in zip(todo, built):
+        if isinstance(stamps, Exception):
+            results[i] = stamps
+            continue
+        try:
+            results[i] = store(stamps, target, key)
+        except Exception as e:
+            results[i] = e
+
+    return results
+
+def _single(results: list):
+    # Einzelzeile = Stapel mit einer Zeile
+    if isinstance(results[0], Exception):
+        raise results[0]
+    return results[0]
+
+def render_contract_file_batch(
+    rows: list[dict],
+    workdir: str,
+    stamp_mode: str = "merge",
+    templates: TemplateSet | None = None
+) -> list[str | Exception]:
+    templates = templates or current_templates()
+
+    def lookup(row: dict):
+        # Eigener Unterordner pro Zeile: gleichnamige Verträge überschreiben sich
+        # nicht (auch nicht parallel), zip_files vergibt weiterhin die Suffixe
+        row_dir = tempfile.mkdtemp(dir=workdir)
+        path = os.path.join(row_dir, f"{contract_filename(row)}.pdf")
+
+        # Unveränderte Zeile aus früherem Upload → fertiges PDF übernehmen
+        key = render_key(row, stamp_mode, templates)
+        return path, key, path if key is not None and get_file(key, path) else None
+
+    def store(stamps: list[Stamp], path: str, key: str | None) -> str:
+        # VV (+ OL) zusammenfügen – einziger Schreibvorgang pro Vertrag
+        write_stamps(stamps, path, mode=stamp_mode)
+
+        if key is not None:
+            put_file(key, path)
+        return path
+
+    return _render_batch(rows, lookup, store, templates)
+
+def render_contract_bytes_batch(
+    rows: list[dict],
+    stamp_mode: str = "merge",
+    templates: TemplateSet | None = None
+) -> list[tuple[str, bytes] | Exception]:
+    # Für den Streaming-ZIP: Verträge komplett im Speicher, keine Temp-Files
+    templates = templates or current_templates()
+
+    def lookup(row: dict):
+        filename = f"{contract_filename(row)}.pdf"
+
+        key = render_key(row, stamp_mode, templates)
+        data = get_bytes(key) if key is not None else None
+        return filename, key, (filename, data) if data is not None else None
+
+    def store(stamps: list[Stamp], filename: str, key: str | None) -> tuple[str, bytes]:
+        buffer = BytesIO()
+        write_stamps(stamps, buffer, mode=stamp_mode)
+        data = buffer.getvalue()
+
+        if key is not None:
+            put_bytes(key, data)
+        return filename, data
+
+    return _render_batch(rows, lookup, store, templates)
+
+def render_contract_stamps_batch(
+    rows: list[dict],
+    templates: TemplateSet | None = None
+) -> list[tuple[str, list[Stamp]] | Exception]:
+    # Stempel eines Stapels teilen sich ein Overlay-PDF (wird nur einmal gepickelt)
+    return _render_batch(
+        rows,
+        lambda row: (contract_filename(row), None, None),
+        lambda stamps, filename, key: (filename, stamps),
+        templates or current_templates()
+    )
+
+def render_contract_file(row: dict, workdir: str, stamp_mode: str = "merge") -> str:
+    return _single(render_contract_file_batch([row], workdir, stamp_mode))
+
+def render_contract_bytes(row: dict, stamp_mode: str = "merge") -> tuple[str, bytes]:
+    return _single(render_contract_bytes_batch([row], stamp_mode))
+
+def render_contract_stamps(row: dict) -> tuple[str, list[Stamp]]:
+    return contract_filename(row), build_contract_stamps(row)
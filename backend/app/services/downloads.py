@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Downloads mit starkem ETag aus dem Dateiinhalt (nicht aus mtime: ein neu
+# geschriebener, gleicher Inhalt behält sein ETag). Range / If-Range erledigt
+# Starlettes FileResponse, hier kommen 304 und Cache-Control dazu
+ETAG_CHUNK_SIZE = 1024 * 1024
+
+# Gemerkte ETags (zuletzt benutzte Pfade); Job-Ergebnisse bringen ihr ETag
+# im Status mit und landen nicht hier
+ETAG_CACHE_SIZE = 256
+
+# Pfad → ((inode, mtime, Größe), ETag): gehasht wird nur bei Änderung
+_etags: OrderedDict[str, tuple[tuple[int, int, int], str]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def hash_file(path: str) -> str:
+    # ETag ohne Merken (für Dateien, die nur einmal gehasht werden)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(ETAG_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+def file_etag(path: str) -> str:
+    stat = os.stat(path)
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        cached = _etags.get(path)
+        if cached is not None and cached[0] == version:
+            _etags.move_to_end(path)
+            return cached[1]
+
+    etag = hash_file(path)
+
+    with _lock:
+        _etags[path] = (version, etag)
+        _etags.move_to_end(path)
+        while len(_etags) > ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match: Liste oder "*", schwacher Vergleich (W/ ignorieren)
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    # If-None-Match hat Vorrang vor If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+def file_download(
+    request: Request,
+    path: str,
+    filename: str,
+    media_type: str,
+    cache_control: str,
+    etag: str | None = None,
+    headers: dict | None = None
+) -> Response:
+    # etag: schon bekannter Wert (z.B. beim Job gespeichert), sonst gehasht
+    stat = os.stat(path)
+    etag = etag or file_etag(path)
+    cache_headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(
+            status_code=304,
+            headers={**cache_headers, "Last-Modified": formatdate(stat.st_mtime, usegmt=True)}
+        )
+
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type=media_type,
+        headers={**(headers or {}), **cache_headers},
+        stat_result=stat
+    )
@@ -1,5 +1,421 @@
+import codecs
+import os
+import zipfile
+from collections.abc import Iterator, Mapping
+from itertools import islice
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils.exceptions import InvalidFileException
+from pandas.io.parsers import TextParser
+
+from app.services import metrics
+from app.services.address import STREET_RE
+
+# Spalten mit Adresslisten ("Hauptstr. 1, 3, 5")
+STREET_COLUMNS = (
+    "Objekt Str + Hnr",
+    "Bevollm. Str. Hnr",
+    "Vertragsp. Str + Hnr",
+)
+
+# Alle Spalten, die beim Rendern gelesen werden; Kopfzeilen aus CSV/Parquet
+# (andere Groß-/Kleinschreibung, Leerzeichen, BOM) werden darauf abgebildet
+KNOWN_COLUMNS = (
+    "Objekt Str + Hnr",
+    "Objekt PLZ",
+    "Objekt Ort",
+    "Anzahl WE",
+    "Datum",
+    "Bevollm. Firma",
+    "Bevollm. Herr/Frau (H/F)",
+    "Bevollm. Name",
+    "Bevollm. Vorname",
+    "Bevollm. Str. Hnr",
+    "Bevollm. PLZ",
+    "Bevollm. Ort",
+    "Vertragsp. Firma",
+    "Vertragsp. Herr/Frau (H/F)",
+    "Vertragsp. Name",
+    "Vertragsp. Vorname",
+    "Vertragsp. Str + Hnr",
+    "Vertragsp. PLZ",
+    "Vertragsp. Ort",
+    "Unterschrift Vorname Nachname",
+    "Unterschrift Datum",
+)
+
+# Dateiendung → Format
+INPUT_FORMATS = {
+    ".xlsx": "excel",
+    ".xls": "excel",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+# Zeilen pro Block beim Streaming-Lesen (Excel/Parquet: Typ-Erkennung pro Block).
+# Jeder Block kostet in pandas einige ms fix → CSV/Parquet in großen Blöcken;
+# bei Excel bremst ohnehin openpyxl, kleine Blöcke = erster Vertrag früher
+INPUT_CHUNK_ROWS = {
+    "excel": 1000,
+    "csv": 50000,
+    "parquet": 50000,
+}
+
+# Erster Excel-Block: klein, damit die erste Zeile nicht wartet, bis
+# INPUT_CHUNK_ROWS Zeilen gelesen sind (Streaming: erstes Byte früh)
+FIRST_EXCEL_CHUNK_ROWS = 16
+
+# CSV-Kopf: so viele Bytes für Encoding und Trennzeichen ansehen
+CSV_SAMPLE_SIZE = 64 * 1024
+
+# Fehlerbehandlung beim UTF-8-Lesen: Bytes, die kein UTF-8 sind, als
+# Windows-1252 lesen. Die Stichprobe sieht nur den Anfang; ein Umlaut aus
+# einem cp1252-Export weiter hinten würde sonst mitten im Upload abbrechen
+CSV_FALLBACK_ERRORS = "vv_cp1252_fallback"
+
+
+class Row(Mapping):
+    # Eine Zeile = Werte-Tupel + gemeinsamer Spaltenindex aller Zeilen
+    # (statt eines eigenen dicts pro Zeile); nur lesend, wie ein dict nutzbar
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: dict, values: tuple):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+
+def sanitize_value(v):
+    if isinstance(v, float):
+        if v != v:  # Check auf NaN
+            return ""
+        if v.is_integer():
+            v = int(v)
+
+    if isinstance(v, (str, int)):
+        v = str(v)
+        return (
+            v.replace("\u00a0", " ")   # NBSP
+             .replace("\u200b", "")    # Zero-width space
+             .replace("\u2011", "-")   # non-breaking hyphen
+             .strip()
+        )
+    return v
+
+def _sanitize_float_column(col: pd.Series) -> pd.Series:
+    values = col.to_numpy()
+    result = values.astype(object)
+
+    result[np.isnan(values)] = ""
+
+    # Ganzzahlige Floats (Excel speichert PLZ / Nummern als 12345.0) → "12345"
+    integral = np.isfinite(values) & (values == np.floor(values))
+    small = integral & (np.abs(values) < 2**63)
+    result[small] = values[small].astype(np.int64).astype(str)
+    result[integral & ~small] = [str(int(v)) for v in values[integral & ~small]]
+
+    return pd.Series(result, index=col.index, name=col.name)
+
+def _map_unique(text: pd.Series, func) -> np.ndarray:
+    # Jeden unterschiedlichen Wert nur einmal verarbeiten (PLZ, Ort, Firma,
+    # Datum, ... wiederholen sich in großen Exporten ständig)
+    codes, uniques = pd.factorize(text)
+    return np.asarray(func(pd.Series(uniques)), dtype=object)[codes]
+
+def _clean_text(text: pd.Series) -> pd.Series:
+    return (
+        text.str.replace("\u00a0", " ", regex=False)   # NBSP
+            .str.replace("\u200b", "", regex=False)    # Zero-width space
+            .str.replace("\u2011", "-", regex=False)   # non-breaking hyphen
+            .str.strip()
+    )
+
+def _is_text(col: pd.Series, is_missing: pd.Series) -> pd.Series:
+    # Reine Textspalten (Normalfall) ohne Typprüfung pro Zelle erkennen
+    if pd.api.types.infer_dtype(col, skipna=True) in ("string", "empty"):
+        return ~is_missing
+    return col.map(type).eq(str)
+
+def _sanitize_column(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(col):
+        return _sanitize_float_column(col)
+
+    if pd.api.types.is_integer_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col.astype(str)
+
+    if pd.api.types.is_datetime64_any_dtype(col):
+        # Datum bleibt unverändert
+        return col.astype(object)
+
+    if not pd.api.types.is_object_dtype(col):
+        # Kategorien usw. (z.B. aus Parquet) → wie gemischte Spalte
+        col = col.astype(object)
+
+    is_missing = col.isna()     # NaN aus Excel/CSV, None aus Parquet
+    is_text = _is_text(col, is_missing)
+    rest = ~(is_text | is_missing)
+
+    result = col.copy()
+    result[is_text] = _map_unique(col[is_text], _clean_text)
+    result[is_missing] = ""
+    # Übrige Zellen einer gemischten Spalte (Zahlen, Datum, ...)
+    if rest.any():
+        result[rest] = col[rest].map(sanitize_value)
+    return result
+
+def _normalize_streets(values: pd.Series) -> np.ndarray:
+    # "Bahner Str. 8 a, b" → "Bahner Str. 8 a, Bahner Str. b" für alle Werte
+    # auf einmal: Teile explodieren, Straße pro Wert vorwärts füllen, wieder
+    # zusammenfügen
+    result = np.full(len(values), "", dtype=object)    # nur Kommas → leer
+
+    parts = values.str.split(",").explode().str.strip()
+    parts = parts[parts.ne("")]
+    if parts.empty:
+        return result
+
+    match = _map_unique(parts, lambda p: p.str.extract(STREET_RE).to_numpy())
+    street = pd.Series(match[:, 0], index=parts.index).str.strip()
+    number = pd.Series(match[:, 1], index=parts.index).str.strip()
+
+    current_street = street.groupby(level=0).ffill()
+
+    # WICHTIG: Hier wird aus "b" -> "Bahner Str. b"
+    normalized = parts.where(current_street.isna(), current_street + " " + parts)
+    normalized = normalized.where(street.isna(), street + " " + number)
+
+    # Teile eines Werts liegen hintereinander → Grenzen statt groupby
+    cells = normalized.index.to_numpy()
+    joined = normalized.to_numpy()
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    ends = np.r_[starts[1:], len(joined)]
+
+    result[cells[starts]] = [", ".join(joined[a:b]) for a, b in zip(starts, ends)]
+    return result
+
+def _normalize_street_column(col: pd.Series) -> pd.Series:
+    is_text = _is_text(col, col.isna()) & col.ne("")
+    if not is_text.any():
+        return col
+
+    result = col.copy()
+    result[is_text] = _map_unique(col[is_text], _normalize_streets)
+    return result
+
+def _column_key(name) -> str:
+    return " ".join(str(name).replace("\ufeff", "").split()).casefold()
+
+_KNOWN_COLUMN_KEYS = {_column_key(name): name for name in KNOWN_COLUMNS}
+
+def _canonical_columns(columns: pd.Index) -> list:
+    # Bekannte Spalten unter ihrem Originalnamen, aber nur wenn dieser nicht
+    # schon vorkommt (keine doppelten Spalten)
+    result = []
+    for name in columns:
+        canonical = _KNOWN_COLUMN_KEYS.get(_column_key(name), name)
+        result.append(name if canonical in columns or canonical in result else canonical)
+    return result
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Spaltenweise statt Zelle für Zelle
+    df = pd.DataFrame(
+        {i: _sanitize_column(col) for i, (_, col) in enumerate(df.items())},
+        index=df.index
+    ).set_axis(df.columns, axis=1)
+
+    for name in STREET_COLUMNS:
+        if name in df.columns:
+            df[name] = _normalize_street_column(df[name])
+
+    return df
+
+def frame_rows(df: pd.DataFrame) -> list[Row]:
+    index = {name: i for i, name in enumerate(df.columns)}
+
+    # Gleiche Werte (PLZ, Ort, ...) teilen sich ein Objekt
+    columns = []
+    for _, col in df.items():
+        values = col.to_numpy(dtype=object)
+        codes, uniques = pd.factorize(values)
+        shared = np.asarray(uniques, dtype=object)[codes]
+        # Fehlwerte (None, NaT) unverändert übernehmen
+        shared[codes < 0] = values[codes < 0]
+        columns.append(shared)
+
+    return [Row(index, values) for values in zip(*columns)]
+
+def read_frame(file) -> pd.DataFrame:
+    # UploadFile, Dateiobjekt oder Pfad
+    return pd.read_excel(getattr(file, "file", file))
+
+def _convert_cell(cell):
+    # Wie der openpyxl-Reader von pandas: leere Zelle → "" (wird zu NaN),
+    # Fehler → NaN, ganzzahlige Zahlen → int, sonst float
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+def _iter_sheet_rows(sheet) -> Iterator[list]:
+    # Dimension im Dateikopf kann falsch sein → ganze Tabelle lesen
+    sheet.reset_dimensions()
+
+    blank = []
+    for row in sheet.rows:
+        values = [_convert_cell(cell) for cell in row]
+        while values and values[-1] == "":
+            values.pop()
+
+        if not values:
+            # Leerzeilen nur weitergeben, wenn danach noch Daten kommen
+            blank.append(values)
+            continue
+
+        yield from blank
+        blank.clear()
+        yield values
+
+def _parse_chunk(header: list, rows: list[list], width: int) -> pd.DataFrame:
+    data = [row + [""] * (width - len(row)) for row in (header, *rows)]
+    # Gleicher Parser wie pd.read_excel (NaN-Erkennung, Zahlen, Spaltennamen)
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+def _iter_excel_frames(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    try:
+        book = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    except (InvalidFileException, zipfile.BadZipFile):
+        # Kein xlsx (z.B. altes .xls) → wie bisher komplett über pandas
+        if hasattr(source, "seek"):
+            source.seek(0)
+        yield read_frame(source)
+        return
+
+    try:
+        sheet = book.worksheets[0]
+        # Breite laut Dateikopf (falls vorhanden), damit alle Blöcke dieselben
+        # Spalten haben; sie wächst nur, falls der Kopf zu klein ist
+        declared_width = sheet.max_column or 0
+
+        rows = _iter_sheet_rows(sheet)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        width = max(len(header), declared_width)
+        size = min(chunk_size, FIRST_EXCEL_CHUNK_ROWS)
+        while chunk := list(islice(rows, size)):
+            width = max(width, *(len(row) for row in chunk))
+            yield _parse_chunk(header, chunk, width)
+            size = chunk_size
+    finally:
+        book.close()
+
+def _read_sample(source, size: int) -> bytes:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(size)
+
+    position = source.tell()
+    sample = source.read(size)
+    source.seek(position)
+    return sample
+
+def _sniff_csv(sample: bytes) -> tuple[str, str]:
+    # ERP-Exporte: UTF-8 (oft mit BOM) oder Windows-1252
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp1252"
+
+    # Trennzeichen = häufigstes Kandidatenzeichen in der Kopfzeile
+    header = sample.split(b"\n", 1)[0]
+    sep = max((";", "\t", ","), key=lambda c: header.count(c.encode()))
+    return encoding, sep
+
+def _cp1252_fallback(error: UnicodeDecodeError) -> tuple[str, int]:
+    return error.object[error.start:error.end].decode("cp1252", errors="replace"), error.end
+
+codecs.register_error(CSV_FALLBACK_ERRORS, _cp1252_fallback)
+
+def _iter_csv_frames(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    encoding, sep = _sniff_csv(_read_sample(source, CSV_SAMPLE_SIZE))
+    errors = CSV_FALLBACK_ERRORS if encoding == "utf-8-sig" else "replace"
+
+    # Alle Zellen als Text wie Excel-Textzellen: keine Typ-Erkennung (pro
+    # Block unterschiedlich), PLZ "01067" behält die Null, WE-Liste "10,20"
+    # wird nicht zur Dezimalzahl; leere Zellen bleiben NaN
+    for frame in pd.read_csv(
+        source,
+        sep=sep,
+        dtype=str,
+        encoding=encoding,
+        encoding_errors=errors,
+        chunksize=chunk_size
+    ):
+        yield frame.set_axis(_canonical_columns(frame.columns), axis=1)
+
+def _iter_parquet_frames(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    parquet = pq.ParquetFile(source)
+
+    # Decimal → float wie Excel-Zahlen
+    schema = pa.schema([
+        field.with_type(pa.float64()) if pa.types.is_decimal(field.type) else field
+        for field in parquet.schema_arrow
+    ])
+
+    for batch in parquet.iter_batches(batch_size=chunk_size):
+        # Datumsspalten als Timestamp wie aus Excel
+        frame = batch.cast(schema).to_pandas(date_as_object=False)
+        yield frame.set_axis(_canonical_columns(frame.columns), axis=1)
+
+def input_format(file) -> str | None:
+    # UploadFile (filename), Pfad oder Dateiobjekt (name)
+    name = getattr(file, "filename", None) or getattr(file, "name", None) or file
+    if not isinstance(name, (str, os.PathLike)):
+        return None
+    return INPUT_FORMATS.get(os.path.splitext(name)[1].lower())
+
+def iter_rows(file, chunk_size: int | None = None) -> Iterator[Row]:
+    # Zeilen blockweise liefern: Rendern kann beginnen, bevor die ganze
+    # Datei gelesen ist, der Speicher bleibt unabhängig von der Dateigröße
+    source = getattr(file, "file", file)
+
+    fmt = input_format(file) or "excel"
+    chunk_size = chunk_size or INPUT_CHUNK_ROWS[fmt]
+    if fmt == "csv":
+        frames = _iter_csv_frames(source, chunk_size)
+    elif fmt == "parquet":
+        frames = _iter_parquet_frames(source, chunk_size)
+    else:
+        frames = _iter_excel_frames(source, chunk_size)
+
+    for frame in metrics.timed(frames, f"read_{fmt}"):
+        with metrics.stage("sanitize"):
+            rows = frame_rows(clean_frame(frame))
+        yield from rows
 
-def read_excel(file):
-    df = pd.read_excel(file.file)
-    return df.to_dict(orient="records")
+def read_rows(file) -> list[Row]:
+    return list(iter_rows(file))
@@ -0,0 +1,78 @@
+import os
+
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+# Schrift der Overlays. Standard: Base-14 Helvetica (wird nicht eingebettet,
+# kennt aber nur WinAnsi). Mit OVERLAY_FONT / OVERLAY_FONT_BOLD (Pfad zu
+# einer TTF) wird die TTF registriert und als Subset eingebettet
+OVERLAY_FONT_PATH = os.environ.get("OVERLAY_FONT") or ""
+OVERLAY_FONT_BOLD_PATH = os.environ.get("OVERLAY_FONT_BOLD") or ""
+
+# Zeichen, die jedes Overlay-Dokument in fester Reihenfolge im ersten Subset
+# führt (ASCII legt reportlab ohnehin fest): gleiche Subsets in allen
+# Overlays → StampWriter bettet die Schrift pro Dokument nur EINMAL ein
+SUBSET_CHARS = (
+    "ÄÖÜäöüß€§°²³µ½¼¾×·–—„“”‚‘’«»…"
+    "ÀÁÂÃÅÆÇÈÉÊËÌÍÎÏÑÒÓÔÕØÙÚÛÝàáâãåæçèéêëìíîïñòóôõøùúûýÿ"
+    "ŠšŽžŒœŁłŃńŚśŹźŻżĆćĘęĄą"
+)
+
+# Eingebettete Schriftdateien (ändern das Ergebnis → Teil der Cache-Schlüssel)
+FONT_FILES: list[str] = []
+
+
+def _register(name: str, path: str, fallback: str) -> str:
+    if not path:
+        return fallback
+
+    try:
+        pdfmetrics.registerFont(TTFont(name, path))
+    except Exception as e:
+        # Falsche/fehlende Datei → Standardschrift statt Ausfall
+        print(f"Error in Schrift {path}: {e}")
+        return fallback
+
+    FONT_FILES.append(path)
+    return name
+
+FONT = _register("OverlayFont", OVERLAY_FONT_PATH, "Helvetica")
+FONT_BOLD = _register("OverlayFont-Bold", OVERLAY_FONT_BOLD_PATH, "Helvetica-Bold")
+
+_TTF_FONTS = [
+    pdfmetrics.getFont(name) for name in (FONT, FONT_BOLD)
+    if isinstance(pdfmetrics.getFont(name), TTFont)
+]
+
+_warned = False
+
+
+def _warn_no_subsets():
+    # Einmal pro Prozess melden statt bei jedem Overlay
+    global _warned
+
+    if _TTF_FONTS and not _warned:
+        _warned = True
+        print(f"Error in Schrift: reportlab {reportlab.Version} ohne Canvas._doc, TTF-Subsets werden nicht vorbelegt")
+
+def overlay_canvas(buffer, canvasmaker=canvas.Canvas, **kwargs) -> canvas.Canvas:
+    # Alle Overlays über diese Funktion anlegen: TTF-Subsets werden vorbelegt
+    # (eingebettet wird eine Schrift nur, wenn sie auch benutzt wird); die
+    # Startschrift der Seite ist FONT, sonst käme Helvetica immer mit
+    kwargs.setdefault("initialFontName", FONT)
+    c = canvasmaker(buffer, **kwargs)
+
+    # Subsets vergibt reportlab nur über das (interne) Dokument des Canvas;
+    # öffentlich ginge es nur über Text, der die Schrift auch einbettet (auch
+    # in leere Overlays). reportlab ist in requirements.txt gepinnt; fehlt das
+    # Dokument in einer anderen Version, entfällt das Vorbelegen (Ausgabe
+    # bleibt richtig, die Schrift wird dann aber mehrfach eingebettet)
+    doc = getattr(c, "_doc", None)
+    if doc is None:
+        _warn_no_subsets()
+        return c
+    for font in _TTF_FONTS:
+        font.splitString(SUBSET_CHARS, doc)
+    return c
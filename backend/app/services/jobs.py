@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from app.services import metrics
+from app.services.downloads import hash_file
+
+# Jobs liegen auf der Platte, damit jeder gunicorn-Worker Status und
+# Ergebnis ausliefern kann (nicht nur der, der den Job angenommen hat)
+JOBS_DIR = os.environ.get("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "vv_jobs")
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+JOB_THREADS = int(os.environ.get("JOB_THREADS", "2"))
+
+# Fortschritt höchstens alle 0,5 s auf die Platte schreiben
+PROGRESS_INTERVAL = 0.5
+
+# Jeder Worker erneuert "updated" seiner wartenden/laufenden Jobs regelmäßig.
+# Bleibt das aus (Worker neu gestartet, --max-requests, Absturz), gilt der
+# Job nach JOB_STALE_SECONDS als abgebrochen statt ewig "running"
+JOB_HEARTBEAT_SECONDS = 10
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "120"))
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_STATUS_FILE = "status.json"
+
+# Threads statt Event-Loop: das Rendern selbst läuft im Render-Pool
+_runner = ThreadPoolExecutor(max_workers=JOB_THREADS, thread_name_prefix="vv-job")
+
+# Job-ID → Status der Jobs dieses Workers (für den Heartbeat)
+_active: dict[str, dict] = {}
+_status_lock = threading.Lock()
+_heartbeat: threading.Thread | None = None
+_heartbeat_lock = threading.Lock()
+
+
+def job_dir(job_id: str) -> str | None:
+    if not _JOB_ID_RE.match(job_id):
+        return None
+    return os.path.join(JOBS_DIR, job_id)
+
+def _write_status(job_id: str, status: dict):
+    # Atomar ersetzen, damit Leser nie eine halbe Datei sehen; Job-Thread
+    # und Heartbeat schreiben dieselbe Datei
+    path = os.path.join(job_dir(job_id), _STATUS_FILE)
+    tmp_path = f"{path}.tmp"
+    with _status_lock:
+        status["updated"] = time.time()
+        # Kopie: der Job-Thread kann status gerade ändern
+        snapshot = dict(status)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+def _beat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        for job_id, status in list(_active.items()):
+            try:
+                _write_status(job_id, status)
+            except Exception as e:
+                print(f"Error in Job-Heartbeat {job_id}: {e}")
+
+def _is_stale(status: dict) -> bool:
+    if status.get("status") not in ("queued", "running"):
+        return False
+    updated = status.get("updated") or status.get("created") or 0
+    return time.time() - updated > JOB_STALE_SECONDS
+
+def read_status(job_id: str) -> dict | None:
+    directory = job_dir(job_id)
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, _STATUS_FILE), encoding="utf-8") as f:
+            status = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if _is_stale(status):
+        # Der Worker mit diesem Job lebt nicht mehr → kommt nie mehr zu Ende
+        status.update(status="error", error="Job abgebrochen (Server wurde neu gestartet), bitte erneut hochladen")
+    return status
+
+def sweep_jobs():
+    # Abgelaufene Jobs (inkl. Ergebnisdatei) entfernen
+    if not os.path.isdir(JOBS_DIR):
+        return
+
+    now = time.time()
+    for name in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > JOB_TTL_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def create_job() -> tuple[str, str]:
+    sweep_jobs()
+
+    job_id = uuid.uuid4().hex
+    directory = job_dir(job_id)
+    os.makedirs(directory)
+
+    _write_status(job_id, {
+        "job_id": job_id,
+        "status": "queued",
+        "rows_done": 0,
+        "rows_total": None,
+        "eta_seconds": None,
+        "created": time.time(),
+    })
+    return job_id, directory
+
+def _run(job_id: str, task: Callable[[str, Callable[[int, int], None]], NamedTuple]):
+    status = _active[job_id]
+    status.update(status="running", started=time.time())
+    _write_status(job_id, status)
+
+    last_write = 0.0
+
+    def progress(done: int, total: int):
+        nonlocal last_write
+
+        now = time.time()
+        if done < total and now - last_write < PROGRESS_INTERVAL:
+            return
+        last_write = now
+
+        elapsed = now - status["started"]
+        status.update(
+            rows_done=done,
+            rows_total=total,
+            eta_seconds=round(elapsed / done * (total - done), 1) if done else None,
+        )
+        _write_status(job_id, status)
+
+    try:
+        result = task(job_dir(job_id), progress)
+        status.update(status="done", eta_seconds=0, finished=time.time(), **result._asdict())
+        if "path" in status:
+            # Einmal hier hashen statt in jedem Worker beim ersten Download
+            status["etag"] = hash_file(status["path"])
+    except Exception as e:
+        print(f"Error in Job {job_id}: {e}")
+        status.update(status="error", error=str(e), finished=time.time())
+
+    _active.pop(job_id, None)
+    _write_status(job_id, status)
+    # Läuft außerhalb einer Anfrage → Messwerte selbst ablegen
+    metrics.flush()
+
+def _start_heartbeat():
+    global _heartbeat
+
+    # Gleichzeitige erste Jobs starten nur EINEN Heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="vv-job-heartbeat", daemon=True)
+            _heartbeat.start()
+
+def start_job(job_id: str, task: Callable[[str, Callable[[int, int], None]], NamedTuple]):
+    # task(workdir, progress) → Ergebnis-NamedTuple (z.B. BatchResult)
+    _active[job_id] = read_status(job_id)
+    _start_heartbeat()
+    _runner.submit(_run, job_id, task)
@@ -0,0 +1,240 @@
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+# Metriken im Prometheus-Textformat (ohne Zusatzpaket). Pro Messung nur ein
+# paar Additionen unter einem Lock → kann in Produktion immer an bleiben
+
+# Mehrere gunicorn-Worker: jeder legt hier regelmäßig seinen Stand ab,
+# /metrics summiert alle (ohne: nur der Worker, der die Anfrage bekommt)
+METRICS_DIR = os.environ.get("METRICS_DIR")
+
+# Eigenen Stand höchstens alle 5 s auf die Platte schreiben
+FLUSH_INTERVAL = 5.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Name → (Typ, Hilfetext); Raten (Zeilen/s, Seiten/s) liefert rate() über die Zähler
+METRICS = {
+    "vv_stage_duration_seconds": ("histogram", "Dauer einer Pipeline-Stufe pro Aufruf"),
+    "vv_http_request_duration_seconds": ("histogram", "Dauer einer HTTP-Anfrage bis die Antwort komplett gesendet ist"),
+    "vv_rows_total": ("counter", "Verarbeitete Zeilen nach Ergebnis"),
+    "vv_pages_total": ("counter", "Geschriebene PDF-Seiten"),
+    "vv_bytes_written_total": ("counter", "Geschriebene Bytes nach Art (pdf, zip)"),
+    "vv_workdir_peak_bytes": ("gauge", "Größter Temp-Ordner eines Uploads (Upload, PDFs, Ergebnis) seit Prozessstart"),
+}
+
+# (Name, Labels) → Zahl (counter, gauge) bzw. [Anzahl pro Bucket..., +Inf, Summe]
+_samples: dict[tuple[str, tuple[tuple[str, str], ...]], float | list[float]] = {}
+_lock = threading.Lock()
+
+# Eindeutig auch bei wiederverwendeten PIDs (sonst springen Zähler zurück)
+_process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_last_flush = 0.0
+
+
+def _key(name: str, labels: dict) -> tuple[str, tuple[tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _samples[key] = _samples.get(key, 0) + value
+
+def set_max(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _samples[key] = max(_samples.get(key, 0), value)
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _samples.get(key)
+        if hist is None:
+            hist = _samples[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        hist[bisect_left(LATENCY_BUCKETS, value)] += 1
+        hist[-1] += value
+
+@contextmanager
+def stage(name: str):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe("vv_stage_duration_seconds", perf_counter() - start, stage=name)
+
+def timed(items, name: str):
+    # Wie stage, aber für das Holen jedes Elements eines Iterators (z.B.
+    # Lese-Blöcke); das Ende des Iterators zählt nicht als Aufruf
+    items = iter(items)
+    while True:
+        start = perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        observe("vv_stage_duration_seconds", perf_counter() - start, stage=name)
+        yield item
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def record_workdir(path: str):
+    set_max("vv_workdir_peak_bytes", dir_size(path))
+
+def _combine(target: dict, items):
+    for key, value in items:
+        current = target.get(key)
+        if current is None:
+            target[key] = list(value) if isinstance(value, list) else value
+        elif METRICS[key[0]][0] == "histogram":
+            target[key] = [a + b for a, b in zip(current, value)]
+        elif METRICS[key[0]][0] == "gauge":
+            target[key] = max(current, value)
+        else:
+            target[key] = current + value
+
+def drain() -> list:
+    # Für Render-Prozesse: Stand abgeben und zurücksetzen (der Elternprozess
+    # übernimmt ihn mit merge)
+    with _lock:
+        items = list(_samples.items())
+        _samples.clear()
+    return items
+
+def merge(items: list):
+    with _lock:
+        _combine(_samples, items)
+
+def flush(force: bool = False):
+    global _last_flush
+
+    if METRICS_DIR is None:
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+
+    with _lock:
+        items = [[name, list(labels), value] for (name, labels), value in _samples.items()]
+
+    path = os.path.join(METRICS_DIR, f"{_process_id}.json")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"Error in Metriken: {e}")
+
+def _load_others() -> list:
+    items = []
+    if METRICS_DIR is None or not os.path.isdir(METRICS_DIR):
+        return items
+
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json") or name == f"{_process_id}.json":
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        items.extend(
+            ((metric, tuple(tuple(label) for label in labels)), value)
+            for metric, labels, value in data
+            if metric in METRICS
+        )
+    return items
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+def render() -> str:
+    flush(force=True)
+
+    combined = {}
+    with _lock:
+        _combine(combined, list(_samples.items()))
+    _combine(combined, _load_others())
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for (metric, labels), value in sorted(combined.items()):
+            if metric != name:
+                continue
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (math.inf,), value[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(float(bound))
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {_number(cumulative)}")
+
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    # Reine ASGI-Middleware: misst bis zum letzten Byte (auch bei Streaming)
+    # und ordnet die Anfrage ihrem Endpunkt zu (wenige, feste Label-Werte)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = scope.get("endpoint")
+            observe(
+                "vv_http_request_duration_seconds",
+                perf_counter() - start,
+                handler=getattr(endpoint, "__name__", "none"),
+                method=scope["method"],
+                status=status
+            )
+            flush()
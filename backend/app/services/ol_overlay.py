@@ -1,8 +1,15 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from pypdf import PdfReader, PdfWriter
+from pypdf import PageObject
 from pathlib import Path
-from reportlab.pdfbase.pdfmetrics import stringWidth
+from io import BytesIO
+from functools import lru_cache, partial
+
+from app.services.fonts import FONT, FONT_BOLD, overlay_canvas
+from app.services.overlay_batch import OverlayBatch
+from app.services.pdf_merge import Stamp, apply_stamp, merge_pages
+from app.services.template_cache import get_base_pages
+from app.services.text_layout import draw_text_in_box_plain as draw_text_in_box, layout_text, text_width
 
 # services → app → template
 BASE_DIR = Path(__file__).resolve().parents[1]   # backend/app
@@ -11,188 +18,44 @@ OL_TEMPLATE = BASE_DIR / "templates" / "OL_Vorlage_normalized.pdf"
 if not OL_TEMPLATE.exists():
     raise FileNotFoundError(f"OL Template fehlt: {OL_TEMPLATE}")
 
+# Tabellenlayout (deine Werte)
+START_Y = 117 * mm
+ROW_HEIGHT = 6.5 * mm
 
-def sum_vertrags_we(we_list: list[int]) -> int:
-    return sum(we_list)
-
-def draw_text_in_box(
-    c: canvas.Canvas,
-    text: str,
-    x: float,
-    y_base: float,
-    box_width: float,
-    max_lines: int = 2,
-    font: str = "Helvetica",
-    font_size: int = 8,
-    min_font_size: int = 5,
-    line_spacing: float = 1.2,
-):
-    if not text:
-        return
-
-    text = str(text)
-
-    def break_word_chars(word: str, size: int) -> list[str]:
-        parts, current = [], ""
-        for ch in word:
-            if stringWidth(current + ch, font, size) <= box_width:
-                current += ch
-            else:
-                parts.append(current)
-                current = ch
-        if current:
-            parts.append(current)
-        return parts
-
-    for size in range(font_size, min_font_size - 1, -1):
-        c.setFont(font, size)
-        words = text.split(" ")
-        lines = []
-        current = ""
-
-        for word in words:
-            candidate = (current + " " + word).strip()
-            if stringWidth(candidate, font, size) <= box_width:
-                current = candidate
-            else:
-                if current:
-                    lines.append(current)
-                current = word
-
-                # Wort ist breiter als Box → zeichenweise
-                if stringWidth(current, font, size) > box_width:
-                    parts = break_word_chars(current, size)
-                    lines.extend(parts[:-1])
-                    current = parts[-1]
-
-        if current:
-            lines.append(current)
-
-        # Text darf NUR akzeptiert werden, wenn ALLES reinpasst
-        if (
-            len(lines) <= max_lines
-            and all(stringWidth(line, font, size) <= box_width for line in lines)
-        ):
-            final_lines = lines
-            final_size = size
-            break
-    else:
-        # selbst min_font_size reicht nicht
-        c.setFont(font, min_font_size)
-        parts = break_word_chars(text, min_font_size)
-        final_lines = parts[:max_lines]
-        final_size = min_font_size
-
-    # Vertikal zentrieren
-    c.setFont(font, final_size)
-    line_height = final_size * line_spacing
-    total_height = len(final_lines) * line_height
-    start_y = y_base + (total_height - line_height) / 2
-
-    y = start_y
-    for line in final_lines:
-        c.drawString(x, y, line)
-        y -= line_height
+# Unterkante der Objekttabelle in der Vorlage (darunter die Summenzeile);
+# jede Grundlinie ab START_Y, die noch darüber liegt, ist eine Tabellenzeile
+TABLE_BOTTOM = 43.8 * mm
+OL_ROWS_PER_PAGE = int((START_Y - TABLE_BOTTOM) / ROW_HEIGHT) + 1
 
-def create_ol_pdf(
-    objects: list[str],
-    plz: str,
-    ort: str,
-    we_list: list[int],
-    we_sum: int,
-    index: int,
-    workdir: str,
-    start_lfd: int = 0
-) -> str:
+# Spalten der Objekttabelle (lfd. Nr. und WE rücken je nach Stellenzahl ein)
+COL_STR_X = 15 * mm
+COL_PLZ_X = 68 * mm
+COL_ORT_X = 82 * mm
+COL_WIDTH = 45 * mm
+COL_ORT_WIDTH = 21 * mm
 
-    overlay_path = f"{workdir}/ol_overlay_{index}.pdf"
-    output_path = f"{workdir}/ol_filled_{index}.pdf"
+TABLE_FONT = FONT
+TABLE_FONT_SIZE = 8
+LINE_SPACING = 1.2
 
-    # Seitengröße aus Vorlage lesen
-    base = PdfReader(str(OL_TEMPLATE))
-    base_page = base.pages[0]
 
-    page_width = float(base_page.mediabox.width)
-    page_height = float(base_page.mediabox.height)
+def sum_vertrags_we(we_list: list[int]) -> int:
+    return sum(we_list)
 
-    # Overlay exakt gleich groß erzeugen
-    c = canvas.Canvas(
-        overlay_path,
-        pagesize=(page_width, page_height)
+@lru_cache(maxsize=None)
+def render_ol_static(lines: int, page_width: float, page_height: float) -> bytes:
+    # GE und Preise sind in jeder Zeile gleich → pro Zeilenanzahl einmal
+    # rendern, wird in die Vorlage eingebrannt.
+    # invariant: gleiche Bytes in allen Prozessen (kein Datum / keine ID im PDF)
+    buffer = BytesIO()
+    c = overlay_canvas(
+        buffer,
+        pagesize=(page_width, page_height),
+        invariant=1
     )
 
-    # Tabellenlayout (deine Werte)
-    start_y = 117 * mm
-    row_height = 6.5 * mm
-
-    
-    y = start_y
-
-    for i, address in enumerate(objects):
-        lfd_nr = start_lfd + i + 1
-
-        c.setFont("Helvetica", 8)
-
-        we_value = we_list[i] if i < len(we_list) else 0
-
-        col_x = {
-            "lfd": 9.5 * mm if lfd_nr < 10 else 8.5 * mm,
-            "str": 15 * mm,
-            "plz": 68 * mm,
-            "ort": 82 * mm,
-            "we": (
-                186.8 * mm if we_value < 10
-                else 186.3 * mm if we_value < 100
-                else 185.7 * mm
-            ),
-        }
-
-        draw_text_in_box(
-            c=c,
-            text=str(lfd_nr),
-            x=col_x["lfd"],
-            y_base=y,
-            box_width=45 * mm,
-            max_lines=2,
-            font_size=8
-        )
-        draw_text_in_box(
-            c=c,
-            text=address,
-            x=col_x["str"],
-            y_base=y,
-            box_width=45 * mm,
-            max_lines=2,
-            font_size=8
-        )
-        draw_text_in_box(
-            c=c,
-            text=str(plz),
-            x=col_x["plz"],
-            y_base=y,
-            box_width=45 * mm,
-            max_lines=2,
-            font_size=8
-        )
-        draw_text_in_box(
-            c=c,
-            text=str(ort),
-            x=col_x["ort"],
-            y_base=y,
-            box_width=21 * mm,
-            max_lines=2,
-            font_size=8
-        )
-        draw_text_in_box(
-            c=c,
-            text=str(we_value),
-            x=col_x["we"],
-            y_base=y,
-            box_width=45 * mm,
-            max_lines=2,
-            font_size=8
-        )
-
+    y = START_Y
+    for _ in range(min(lines, OL_ROWS_PER_PAGE)):
         # GE:
         draw_text_in_box(
             c=c,
@@ -233,31 +96,241 @@ def create_ol_pdf(
             font_size=8
         )
 
-        y -= row_height
+        y -= ROW_HEIGHT
 
-        if y < 25 * mm:
-            c.showPage()
-            y = start_y
+    c.save()
+    return buffer.getvalue()
 
-    c.setFont("Helvetica-Bold", 9)
-    c.drawRightString(
-        page_width - 19 * mm,
-        page_height - 53.5 * mm,
-        str(we_sum)
+def _lfd_x(lfd_nr: int) -> float:
+    return 9.5 * mm if lfd_nr < 10 else 8.5 * mm
+
+def _we_x(we_value: int) -> float:
+    # WE rechtsbündig nach Stellenzahl
+    return (
+        186.8 * mm if we_value < 10
+        else 186.3 * mm if we_value < 100
+        else 185.7 * mm
+    )
+
+def _cell_layout(text: str, box_width: float) -> tuple[tuple[str, ...], int]:
+    # Schneller Weg: passt der Text einzeilig in Originalgröße (und hat keine
+    # Leerzeichen, die das Umbrechen entfernen würde), ist das genau das
+    # Ergebnis von layout_text – ohne Umbruch-/Verkleinerungsschleife
+    if (
+        text_width(text, TABLE_FONT, TABLE_FONT_SIZE) <= box_width
+        and text[0] != " " and text[-1] != " " and "  " not in text
+    ):
+        return (text,), TABLE_FONT_SIZE
+
+    return layout_text(
+        text, box_width, 2, TABLE_FONT, TABLE_FONT_SIZE, 5,
+        hyphenate=False, shrink_multiline=False
     )
 
+def ol_pages(count: int) -> list[tuple[int, int]]:
+    # (erstes Objekt, Anzahl Zeilen) je OL-Seite; ohne Objekte eine leere
+    # Seite (nur Summe)
+    pages = [
+        (start, min(OL_ROWS_PER_PAGE, count - start))
+        for start in range(0, count, OL_ROWS_PER_PAGE)
+    ]
+    return pages or [(0, 0)]
+
+def layout_ol_table(
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    start_lfd: int = 0
+) -> list[list[tuple[float, float, str, int]]]:
+    # Ganze Tabelle auf einmal setzen → pro OL-Seite (x, y, Zeile, Größe);
+    # gleiche Positionen wie draw_text_in_box_plain je Zelle
+    plz_text, ort_text = str(plz), str(ort)
+    pages = []
+
+    for start, count in ol_pages(len(objects)):
+        cells = []
+        y = START_Y
+
+        for i in range(start, start + count):
+            lfd_nr = start_lfd + i + 1
+            we_value = we_list[i] if i < len(we_list) else 0
+
+            row = (
+                (_lfd_x(lfd_nr), COL_WIDTH, str(lfd_nr)),
+                (COL_STR_X, COL_WIDTH, objects[i]),
+                (COL_PLZ_X, COL_WIDTH, plz_text),
+                (COL_ORT_X, COL_ORT_WIDTH, ort_text),
+                (_we_x(we_value), COL_WIDTH, str(we_value)),
+            )
+            for x, box_width, text in row:
+                if not text:
+                    continue
+
+                # Vertikal zentrieren
+                lines, size = _cell_layout(text, box_width)
+                line_height = size * LINE_SPACING
+                total_height = len(lines) * line_height
+                line_y = y + (total_height - line_height) / 2
+                for line in lines:
+                    cells.append((x, line_y, line, size))
+                    line_y -= line_height
+
+            y -= ROW_HEIGHT
+
+        pages.append(cells)
+
+    return pages
+
+def _draw_cells(c: canvas.Canvas, cells: list[tuple[float, float, str, int]]):
+    # Alle Zellen einer Seite in EINEM Textobjekt (statt BT/ET + Tf pro Zelle)
+    if not cells:
+        return
+
+    text = c.beginText()
+    current_size = None
+    for x, y, line, size in cells:
+        if size != current_size:
+            text.setFont(TABLE_FONT, size, size * LINE_SPACING)
+            current_size = size
+        text.setTextOrigin(x, y)
+        text.textOut(line)
+    c.drawText(text)
+
+def draw_ol_overlay(
+    c: canvas.Canvas,
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    we_sum: int,
+    page_width: float,
+    page_height: float,
+    start_lfd: int = 0
+):
+    # Alle Objekte einer Zeile: eine Overlay-Seite je OL-Seite (ol_pages),
+    # laufende Nummern, WE-Summe auf jeder Seite
+    pages = layout_ol_table(objects, plz, ort, we_list, start_lfd)
+    for page_no, cells in enumerate(pages):
+        if page_no:
+            c.showPage()
+        _draw_cells(c, cells)
+
+        c.setFont(FONT_BOLD, 9)
+        c.drawRightString(
+            page_width - 19 * mm,
+            page_height - 53.5 * mm,
+            str(we_sum)
+        )
+
+def render_ol_overlay(
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    we_sum: int,
+    page_width: float,
+    page_height: float,
+    start_lfd: int = 0
+) -> BytesIO:
+
+    # Overlay exakt gleich groß erzeugen (nur im Speicher)
+    buffer = BytesIO()
+    c = overlay_canvas(
+        buffer,
+        pagesize=(page_width, page_height)
+    )
+    draw_ol_overlay(c, objects, plz, ort, we_list, we_sum, page_width, page_height, start_lfd)
     c.save()
+    buffer.seek(0)
+
+    return buffer
+
+def create_ol_stamps(
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    we_sum: int,
+    start_lfd: int = 0,
+    batch: OverlayBatch | None = None
+) -> list[Stamp]:
 
-    # Overlay AUF Vorlage mergen
-    overlay = PdfReader(overlay_path)
-    writer = PdfWriter()
+    # Seitengröße aus Vorlage lesen (Vorlage nur einmal pro Prozess geparst)
+    base_pages = get_base_pages(OL_TEMPLATE)
+    base_page = base_pages[0]
 
-    for base_page in base.pages:
-        page = base_page
-        page.merge_page(overlay.pages[0])
-        writer.add_page(page)
+    page_width = float(base_page.mediabox.width)
+    page_height = float(base_page.mediabox.height)
 
-    with open(output_path, "wb") as f:
-        writer.write(f)
+    # Alle Objekte in EINEM Durchgang; je OL-Seite eine Overlay-Seite und
+    # die statische Ebene (GE, Preise) für ihre Zeilenzahl
+    statics = [
+        render_ol_static(count, page_width, page_height)
+        for _, count in ol_pages(len(objects))
+    ]
+
+    # Mit batch: Overlay-Seiten liegen hintereinander im gemeinsamen Stapel-Canvas
+    if batch is not None:
+        first = batch.draw(
+            partial(
+                draw_ol_overlay,
+                objects=objects,
+                plz=plz,
+                ort=ort,
+                we_list=we_list,
+                we_sum=we_sum,
+                page_width=page_width,
+                page_height=page_height,
+                start_lfd=start_lfd
+            ),
+            pagesize=(page_width, page_height)
+        )
+        return [
+            batch.stamp(str(OL_TEMPLATE), i, None if first is None else first + page, static=static)
+            for page, static in enumerate(statics)
+            for i in range(len(base_pages))
+        ]
+
+    overlay = render_ol_overlay(
+        objects=objects,
+        plz=plz,
+        ort=ort,
+        we_list=we_list,
+        we_sum=we_sum,
+        page_width=page_width,
+        page_height=page_height,
+        start_lfd=start_lfd
+    ).getvalue()
+
+    # Overlay AUF Vorlage stempeln
+    return [
+        Stamp(template=str(OL_TEMPLATE), page_index=i, overlay=overlay, static=static, overlay_page=page)
+        for page, static in enumerate(statics)
+        for i in range(len(base_pages))
+    ]
+
+def create_ol_pages(
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    we_sum: int,
+    start_lfd: int = 0
+) -> list[PageObject]:
+    stamps = create_ol_stamps(objects, plz, ort, we_list, we_sum, start_lfd)
+    return [apply_stamp(stamp) for stamp in stamps]
 
-    return output_path
+def create_ol_pdf(
+    objects: list[str],
+    plz: str,
+    ort: str,
+    we_list: list[int],
+    we_sum: int,
+    index: int,
+    workdir: str,
+    start_lfd: int = 0
+) -> str:
+    output_path = f"{workdir}/ol_filled_{index}.pdf"
+    pages = create_ol_pages(objects, plz, ort, we_list, we_sum, start_lfd)
+    return merge_pages(pages, output_path)
@@ -0,0 +1,62 @@
+from io import BytesIO
+from typing import Callable
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.services.fonts import overlay_canvas
+from app.services.pdf_merge import Stamp
+
+
+class _BatchCanvas(canvas.Canvas):
+    # Merkt sich, ob auf der aktuellen Seite etwas gezeichnet wurde; alle
+    # Overlays zeichnen Text (drawString & Co. laufen über drawText)
+    drawn = False
+
+    def drawText(self, aTextObject):
+        self.drawn = True
+        super().drawText(aTextObject)
+
+    def showPage(self):
+        super().showPage()
+        self.drawn = False
+
+
+class OverlayBatch:
+    # Overlays vieler Zeilen als Seiten EINES reportlab-Canvas: ein Font-
+    # Dictionary, ein save() und ein Parse für den ganzen Stapel statt je Stempel
+    def __init__(self):
+        self._buffer = BytesIO()
+        self._canvas = overlay_canvas(self._buffer, canvasmaker=_BatchCanvas)
+        self._data: bytes | None = None
+
+    def draw(self, draw: Callable[[canvas.Canvas], None], pagesize=A4) -> int | None:
+        # → Seite des Overlays im Stapel-PDF (0-basiert), None wenn nichts
+        # gezeichnet wurde (wie ein leerer Canvas: Vorlage bleibt unverändert)
+        c = self._canvas
+        c.setPageSize(pagesize)
+        page = c.getPageNumber() - 1
+
+        try:
+            draw(c)
+        finally:
+            # Auch nach einem Fehler neue Seite beginnen: die angefangene
+            # Seite wird von keinem Stempel referenziert
+            if c.drawn:
+                c.showPage()
+            else:
+                page = None
+
+        return page
+
+    def stamp(self, template: str, page_index: int, overlay_page: int | None, static: bytes | None = None) -> Stamp:
+        # overlay wird erst von bind() gesetzt (PDF existiert erst nach save())
+        return Stamp(template, page_index, b"", static, overlay_page)
+
+    def bind(self, stamps: list[Stamp]) -> list[Stamp]:
+        if self._data is None:
+            self._canvas.save()
+            self._data = self._buffer.getvalue()
+
+        # Alle Stempel teilen sich dasselbe bytes-Objekt (auch beim Pickeln)
+        return [stamp._replace(overlay=self._data) for stamp in stamps]
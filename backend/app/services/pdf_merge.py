@@ -1,4 +1,56 @@
-from pypdf import PdfReader, PdfWriter
+import hashlib
+
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+)
+from io import BytesIO
+from functools import lru_cache
+from typing import IO, NamedTuple
+
+from app.services import metrics
+from app.services.template_cache import copy_page, get_base_pages
+
+# "merge":   Overlay wird in den Inhalt jeder Vorlagenseite eingerechnet
+# "xobject": Vorlage wird EINMAL pro Dokument als Form XObject eingebettet
+STAMP_MODES = ("merge", "xobject")
+
+# Zuletzt benutzte Overlay-PDFs, die geparst im Speicher bleiben
+OVERLAY_READERS = 4
+
+
+class Stamp(NamedTuple):
+    # Nur Pfade und Bytes → lässt sich zwischen Prozessen verschicken
+    template: str      # Pfad der Vorlage (Seiten kommen aus dem Template-Cache)
+    page_index: int    # Seite innerhalb der Vorlage
+    overlay: bytes     # reportlab-Overlay als PDF (pro Zeile oder pro Stapel)
+    static: bytes | None = None    # für alle Zeilen gleiches Overlay, wird in die Vorlage eingebrannt
+    overlay_page: int | None = 0   # Seite im Overlay-PDF (None = nichts zu stempeln)
+
+
+@lru_cache(maxsize=OVERLAY_READERS)
+def _overlay_reader(data: bytes) -> PdfReader:
+    # Stempel eines Stapels teilen sich EIN Overlay-PDF → nur einmal parsen
+    return PdfReader(BytesIO(data))
+
+def _overlay_page(data: bytes, index: int | None = 0) -> PageObject | None:
+    overlay = _overlay_reader(data)
+    # Leerer Canvas erzeugt keine Seite → Vorlage unverändert übernehmen
+    if index is None or index >= len(overlay.pages):
+        return None
+    return overlay.pages[index]
+
+def _resolve(stamp: Stamp) -> tuple[PageObject, PageObject | None]:
+    # Vorlage inkl. eingebrannter statischer Ebene
+    template = get_base_pages(stamp.template, stamp.static)[stamp.page_index]
+    return template, _overlay_page(stamp.overlay, stamp.overlay_page)
+
 
 def merge_pdfs(pdfs: list[str], output: str) -> str:
     writer = PdfWriter()
@@ -12,3 +64,229 @@ def merge_pdfs(pdfs: list[str], output: str) -> str:
         writer.write(f)
 
     return output
+
+def _write(writer: PdfWriter, output: str | IO[bytes]) -> str | IO[bytes]:
+    if isinstance(output, str):
+        with open(output, "wb") as f:
+            writer.write(f)
+            size = f.tell()
+    else:
+        start = output.tell()
+        writer.write(output)
+        size = output.tell() - start
+
+    metrics.inc("vv_pages_total", len(writer.pages))
+    metrics.inc("vv_bytes_written_total", size, kind="pdf")
+    return output
+
+def merge_pages(pages: list[PageObject], output: str | IO[bytes]) -> str | IO[bytes]:
+    # Seiten liegen bereits im Speicher → nur EIN Schreibvorgang pro Dokument
+    writer = PdfWriter()
+
+    for page in pages:
+        writer.add_page(page)
+
+    return _write(writer, output)
+
+def apply_stamp(stamp: Stamp) -> PageObject:
+    template, overlay = _resolve(stamp)
+    page = copy_page(template)
+    if overlay is not None:
+        page.merge_page(overlay)
+    return page
+
+def _clone_ref(obj, writer: PdfWriter):
+    # Geklontes Objekt möglichst als Referenz einhängen (nicht inline duplizieren)
+    clone = obj.clone(writer)
+    if isinstance(clone, IndirectObject):
+        return clone
+    return getattr(clone, "indirect_reference", None) or clone
+
+def _box(rect) -> ArrayObject:
+    return ArrayObject(FloatObject(v) for v in (rect.left, rect.bottom, rect.right, rect.top))
+
+def _digest_object(obj, digest):
+    obj = obj.get_object()
+    if isinstance(obj, DictionaryObject):
+        for key in sorted(obj):
+            digest.update(key.encode())
+            _digest_object(obj.raw_get(key), digest)
+        if isinstance(obj, StreamObject):
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _digest_object(item, digest)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode())
+
+def _content_key(obj) -> bytes:
+    # Inhalt statt Objektnummer: gleiche Schrift aus verschiedenen PDFs
+    digest = hashlib.sha256()
+    _digest_object(obj, digest)
+    return digest.digest()
+
+def _template_xobject(
+    writer: PdfWriter,
+    template: PageObject,
+    font_dict=None
+) -> IndirectObject:
+    contents = template.get("/Contents")
+    contents = contents.get_object() if contents is not None else ArrayObject()
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+
+    form = DecodedStreamObject()
+    form.set_data(b"\n".join(s.get_object().get_data() for s in streams))
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): _box(template.mediabox),
+    })
+    if "/Resources" in template:
+        if font_dict is None:
+            form[NameObject("/Resources")] = _clone_ref(template["/Resources"], writer)
+        else:
+            resources = DictionaryObject()
+            for key, value in template["/Resources"].items():
+                if key == "/Font":
+                    resources[NameObject(key)] = font_dict(value.get_object())
+                else:
+                    resources[NameObject(key)] = _clone_ref(value, writer)
+            form[NameObject("/Resources")] = resources
+
+    return writer._add_object(form.flate_encode())
+
+class StampWriter:
+    # Sammelt gestempelte Seiten in EINEM Dokument: jede Vorlage wird nur
+    # einmal als Form XObject eingebettet, inhaltsgleiche Fonts (aus allen
+    # Overlays, Vorlagen und statischen Ebenen) nur einmal
+    def __init__(self):
+        self.writer = PdfWriter()
+        # id(Vorlagenseite) bzw. Bytes der statischen Ebene → (Seite, Name,
+        # XObject, "Do"-Stream); die Seite wird mitgehalten, damit ihre id()
+        # nicht neu vergeben werden kann
+        self._forms: dict[int | bytes, tuple[PageObject, str, IndirectObject, IndirectObject]] = {}
+        # Inhalt → Font im Dokument; (id(PDF), Objektnummer) → (PDF, Inhalt),
+        # das PDF wird mitgehalten, damit seine id() nicht neu vergeben wird
+        self._fonts: dict[bytes, IndirectObject] = {}
+        self._font_keys: dict[tuple[int, int], tuple[object, bytes]] = {}
+
+    def _form(self, key: int | bytes, template: PageObject) -> tuple[str, IndirectObject, IndirectObject]:
+        if key not in self._forms:
+            name = f"/Tpl{len(self._forms)}"
+            form = _template_xobject(self.writer, template, self._font_dict)
+            do_stream = DecodedStreamObject()
+            do_stream.set_data(f"q {name} Do Q\n".encode())
+            self._forms[key] = (template, name, form, self.writer._add_object(do_stream))
+        return self._forms[key][1:]
+
+    def _static_form(self, static: bytes) -> tuple[str, IndirectObject, IndirectObject] | None:
+        # Statische Ebene als eigenes kleines XObject statt eingebrannt: die
+        # Vorlage bleibt EIN XObject, egal wie viele Varianten (z.B.
+        # OL-Zeilenzahlen) im Dokument vorkommen
+        if static in self._forms:
+            return self._forms[static][1:]
+
+        layer = _overlay_page(static)
+        if layer is None:
+            return None
+        return self._form(static, layer)
+
+    def _font_key(self, font) -> bytes:
+        if not isinstance(font, IndirectObject):
+            return _content_key(font)
+
+        ref = (id(font.pdf), font.idnum)
+        if ref not in self._font_keys:
+            self._font_keys[ref] = (font.pdf, _content_key(font))
+        return self._font_keys[ref][1]
+
+    def _font_dict(self, fonts: DictionaryObject) -> DictionaryObject:
+        shared = DictionaryObject()
+        for name, font in fonts.items():
+            key = self._font_key(font)
+            if key not in self._fonts:
+                self._fonts[key] = _clone_ref(font, self.writer)
+            shared[NameObject(name)] = self._fonts[key]
+        return shared
+
+    def add(self, stamp: Stamp) -> PageObject:
+        template = get_base_pages(stamp.template)[stamp.page_index]
+        overlay = _overlay_page(stamp.overlay, stamp.overlay_page)
+        name, form, do_stream = self._form(id(template), template)
+
+        page = self.writer.add_blank_page(1, 1)
+        page[NameObject("/MediaBox")] = _box(template.mediabox)
+        if "/CropBox" in template:
+            page[NameObject("/CropBox")] = _box(template.cropbox)
+
+        resources = DictionaryObject()
+        xobjects = DictionaryObject()
+        contents = ArrayObject([do_stream])
+
+        static = self._static_form(stamp.static) if stamp.static is not None else None
+        if static is not None:
+            static_name, static_form, static_do = static
+            xobjects[NameObject(static_name)] = static_form
+            contents.append(static_do)
+
+        if overlay is not None:
+            overlay_resources = overlay.get("/Resources")
+            if overlay_resources is not None:
+                for key, value in overlay_resources.get_object().items():
+                    if key == "/XObject":
+                        xobjects.update(value.get_object().clone(self.writer))
+                    elif key == "/Font":
+                        resources[NameObject(key)] = self._font_dict(value.get_object())
+                    else:
+                        resources[NameObject(key)] = _clone_ref(value, self.writer)
+
+            overlay_contents = overlay.get("/Contents")
+            if overlay_contents is not None:
+                if isinstance(overlay_contents.get_object(), ArrayObject):
+                    contents.extend(overlay_contents.get_object().clone(self.writer))
+                else:
+                    contents.append(overlay_contents.clone(self.writer))
+
+        xobjects[NameObject(name)] = form
+        resources[NameObject("/XObject")] = xobjects
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = contents
+
+        # Annotationen der Vorlage gehören jeder Seite einzeln
+        if "/Annots" in template:
+            annots = ArrayObject()
+            for annot in template["/Annots"]:
+                clone = annot.get_object().clone(self.writer, force_duplicate=True)
+                if "/Popup" in clone:
+                    clone["/Popup"].get_object()[NameObject("/Parent")] = clone.indirect_reference
+                clone[NameObject("/P")] = page.indirect_reference
+                annots.append(clone.indirect_reference)
+            page[NameObject("/Annots")] = annots
+
+        return page
+
+    def add_document(self, title: str, stamps: list[Stamp]):
+        # Ein Lesezeichen pro Vertrag, zeigt auf dessen erste Seite
+        first_page = len(self.writer.pages)
+        for stamp in stamps:
+            self.add(stamp)
+        self.writer.add_outline_item(title, first_page)
+
+    def write(self, output: str | IO[bytes]) -> str | IO[bytes]:
+        return _write(self.writer, output)
+
+def stamp_pages(stamps: list[Stamp], output: str | IO[bytes]) -> str | IO[bytes]:
+    # Jede Vorlage wird pro Dokument nur einmal als Form XObject eingebettet,
+    # pro Seite kommt nur noch der kleine Overlay-Stream dazu
+    writer = StampWriter()
+    for stamp in stamps:
+        writer.add(stamp)
+    return writer.write(output)
+
+def write_stamps(stamps: list[Stamp], output: str | IO[bytes], mode: str = "merge") -> str | IO[bytes]:
+    with metrics.stage("write_pdf"):
+        if mode == "xobject":
+            return stamp_pages(stamps, output)
+        return merge_pages([apply_stamp(stamp) for stamp in stamps], output)
@@ -0,0 +1,140 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable
+
+# Profile einzelner Uploads (?profile=true), nur wenn im Admin freigeschaltet.
+# Liegen auf der Platte, damit jeder gunicorn-Worker sie ausliefern kann
+PROFILES_DIR = os.environ.get("PROFILES_DIR") or os.path.join(tempfile.gettempdir(), "vv_profiles")
+PROFILE_TTL_SECONDS = int(os.environ.get("PROFILE_TTL_SECONDS", "86400"))
+
+# Funktionen in der Text-Zusammenfassung (nach kumulierter Zeit)
+SUMMARY_FUNCTIONS = 60
+
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_ENABLED_FILE = "enabled"
+
+PROFILE_FILE = "profile.prof"       # cProfile-Rohdaten (pstats, snakeviz, ...)
+SUMMARY_FILE = "summary.txt"
+ROWS_FILE = "rows.json"
+
+_local = threading.local()
+
+
+class RowTimer:
+    # Laufzeit pro Excel-Zeile während eines Profil-Laufs
+    def __init__(self):
+        self.rows: list[dict] = []
+
+    def add(self, index: int, seconds: float, error: str | None):
+        self.rows.append({
+            "row": index + 2,     # Excel-Zeile
+            "seconds": round(seconds, 6),
+            "error": error,
+        })
+
+
+def profiling_enabled() -> bool:
+    return os.path.exists(os.path.join(PROFILES_DIR, _ENABLED_FILE))
+
+def set_profiling_enabled(enabled: bool):
+    path = os.path.join(PROFILES_DIR, _ENABLED_FILE)
+    if enabled:
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        open(path, "w").close()
+    elif os.path.exists(path):
+        os.remove(path)
+
+def active_timer() -> RowTimer | None:
+    # Gesetzt, solange im aktuellen Thread ein Profil läuft
+    return getattr(_local, "timer", None)
+
+@contextmanager
+def _row_timer(timer: RowTimer):
+    _local.timer = timer
+    try:
+        yield
+    finally:
+        _local.timer = None
+
+def profile_dir(profile_id: str) -> str | None:
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    return os.path.join(PROFILES_DIR, profile_id)
+
+def sweep_profiles():
+    if not os.path.isdir(PROFILES_DIR):
+        return
+
+    now = time.time()
+    for name in os.listdir(PROFILES_DIR):
+        path = os.path.join(PROFILES_DIR, name)
+        try:
+            if os.path.isdir(path) and now - os.path.getmtime(path) > PROFILE_TTL_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def _summary(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(SUMMARY_FUNCTIONS)
+    return out.getvalue()
+
+def run_profiled(func: Callable[..., Any], *args, **kwargs) -> tuple[Any, str]:
+    # func läuft komplett im aufrufenden Thread (cProfile sieht nur diesen);
+    # der Render-Pool rendert währenddessen seriell und zeilenweise
+    sweep_profiles()
+
+    profile_id = uuid.uuid4().hex
+    directory = profile_dir(profile_id)
+    os.makedirs(directory)
+
+    timer = RowTimer()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+
+    with _row_timer(timer):
+        profiler.enable()
+        try:
+            value = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+
+            try:
+                profiler.dump_stats(os.path.join(directory, PROFILE_FILE))
+                with open(os.path.join(directory, SUMMARY_FILE), "w", encoding="utf-8") as f:
+                    f.write(_summary(profiler))
+                with open(os.path.join(directory, ROWS_FILE), "w", encoding="utf-8") as f:
+                    json.dump({
+                        "profile_id": profile_id,
+                        "created": time.time(),
+                        "seconds": round(elapsed, 6),
+                        "rows_seconds": round(sum(r["seconds"] for r in timer.rows), 6),
+                        # Langsamste zuerst
+                        "rows": sorted(timer.rows, key=lambda r: r["seconds"], reverse=True),
+                    }, f)
+            except OSError as e:
+                print(f"Error in Profil {profile_id}: {e}")
+
+    return value, profile_id
+
+def read_rows(profile_id: str) -> dict | None:
+    directory = profile_dir(profile_id)
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, ROWS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+# Fertige Vertrags-PDFs pro Zeile, adressiert über den Hash ihrer Eingaben.
+# Liegt auf der Platte, damit alle Render-Prozesse und Worker ihn teilen
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "vv_render_cache")
+
+# Größenlimit in MB (0 = Cache aus); darüber fliegen die am längsten nicht
+# benutzten Einträge raus, bis wieder 90 % frei sind
+RENDER_CACHE_MAX_MB = int(os.environ.get("RENDER_CACHE_MAX_MB", "1024"))
+
+# Aufräumen läuft nach jedem Upload, durchsucht aber den ganzen Ordner →
+# pro Prozess höchstens alle 60 s (das Limit darf kurz überschritten werden)
+PRUNE_INTERVAL = 60.0
+
+_last_prune = -PRUNE_INTERVAL
+
+
+def cache_enabled() -> bool:
+    return RENDER_CACHE_MAX_MB > 0
+
+def cache_key(*parts) -> str:
+    # repr unterscheidet "1" von 1 und ist für str/int/float/Timestamp stabil
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _path(key: str) -> str:
+    return os.path.join(RENDER_CACHE_DIR, key[:2], f"{key}.pdf")
+
+def _touch(path: str):
+    # mtime = letzte Nutzung (für LRU)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def get_bytes(key: str) -> bytes | None:
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    _touch(path)
+    return data
+
+def get_file(key: str, dest: str) -> bool:
+    path = _path(key)
+    try:
+        # Hardlink: kein Kopieren, bleibt gültig auch wenn der Eintrag verdrängt wird
+        os.link(path, dest)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            shutil.copyfile(path, dest)
+        except OSError:
+            return False
+
+    _touch(path)
+    return True
+
+def _store(key: str, write):
+    path = _path(key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(tmp_path)
+        # Atomar: parallele Leser sehen nie eine halbe Datei
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error in Render-Cache: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def put_bytes(key: str, data: bytes):
+    def write(tmp_path: str):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    _store(key, write)
+
+def put_file(key: str, src: str):
+    _store(key, lambda tmp_path: shutil.copyfile(src, tmp_path))
+
+def prune_cache(force: bool = False):
+    global _last_prune
+
+    if not cache_enabled() or not os.path.isdir(RENDER_CACHE_DIR):
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+
+    entries = []
+    total = 0
+    for root, _, files in os.walk(RENDER_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    limit = RENDER_CACHE_MAX_MB * 1024 * 1024
+    if total <= limit:
+        return
+
+    # Älteste zuerst löschen, bis 90 % des Limits erreicht sind
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit * 0.9:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,267 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from app.services import metrics, profiling
+
+# Anzahl gunicorn-Worker (gunicorn liest WEB_CONCURRENCY selbst als -w)
+WEB_CONCURRENCY = max(1, int(os.environ.get("WEB_CONCURRENCY") or "1"))
+
+# Anzahl Render-Prozesse PRO Webserver-Worker (1 = seriell im Request-Prozess).
+# Standard: Kerne gleichmäßig auf die Webserver-Worker verteilt, sonst
+# laufen bei "-w 4" viermal so viele Render-Prozesse wie Kerne
+RENDER_WORKERS = int(
+    os.environ.get("RENDER_WORKERS")
+    or max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+)
+
+# Aufgaben pro Render-Prozess, die gleichzeitig in Arbeit / in der Queue sind
+PENDING_PER_WORKER = 4
+
+# Einzelversuche je Stapel nach einem Prozess-Absturz (ein anderer Upload im
+# selben Pool kann einen Versuch mit abreißen)
+CRASH_RETRIES = 2
+
+# Zeilen pro Aufgabe bei Stapel-Funktionen (ein Canvas / ein Overlay-PDF pro Stapel)
+RENDER_BATCH_ROWS = int(os.environ.get("RENDER_BATCH_ROWS", "16"))
+
+
+class RowResult(NamedTuple):
+    index: int          # 0-basiert (Excel-Zeile = index + 2)
+    value: Any
+    error: str | None
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_isolation_lock = threading.Lock()
+
+def get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+
+    if RENDER_WORKERS <= 1:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            # "spawn": keine geerbten Threads / Event-Loop aus dem Webserver-Prozess
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def _restart_executor(broken: ProcessPoolExecutor):
+    # Abgestürzter Render-Prozess (z.B. OOM, Segfault) → alle Futures dieses
+    # Pools schlagen fehl. Nur ersetzen, wenn nicht schon ein anderer Upload
+    # (gleicher Pool) das getan hat
+    global _executor
+
+    with _executor_lock:
+        if _executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def shutdown_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _each_row(func: Callable[[dict], Any], rows: list[dict]) -> list:
+    # Zeilen-Funktion als Stapel-Funktion
+    values = []
+    for row in rows:
+        try:
+            values.append(func(row))
+        except Exception as e:
+            values.append(e)
+    return values
+
+def _batch_results(start: int, values: list) -> list[RowResult]:
+    results = []
+    for i, value in enumerate(values):
+        index = start + i
+        if isinstance(value, Exception):
+            print(f"Error in Zeile {index + 2}: {value}")
+            results.append(RowResult(index, None, f"{type(value).__name__}: {value}"))
+        else:
+            results.append(RowResult(index, value, None))
+
+    errors = sum(1 for r in results if r.error is not None)
+    metrics.inc("vv_rows_total", len(results) - errors, result="ok")
+    metrics.inc("vv_rows_total", errors, result="error")
+    return results
+
+def _call_batch(func: Callable[[list[dict]], list], start: int, rows: list[dict]) -> list[RowResult]:
+    # Fehler einer Zeile brechen nicht den ganzen Stapel ab: func liefert pro
+    # Zeile Wert oder Exception
+    try:
+        values = func(rows)
+    except Exception as e:
+        values = [e] * len(rows)
+    return _batch_results(start, values)
+
+def _call_batch_remote(func: Callable[[list[dict]], list], start: int, rows: list[dict]) -> tuple[list[RowResult], list]:
+    # Im Render-Prozess: Messwerte gehen mit dem Ergebnis an den Elternprozess
+    results = _call_batch(func, start, rows)
+    return results, metrics.drain()
+
+def _collect(future) -> list[RowResult]:
+    results, samples = future.result()
+    metrics.merge(samples)
+    return results
+
+def _run_isolated(func: Callable[[list[dict]], list], start: int, batch: list[dict]) -> list[RowResult]:
+    # Immer nur ein Upload wiederholt gleichzeitig: ein Absturz während des
+    # Versuchs kommt dann fast sicher vom Stapel selbst
+    with _isolation_lock:
+        for _ in range(CRASH_RETRIES):
+            executor = get_executor()
+            try:
+                return _collect(executor.submit(_call_batch_remote, func, start, batch))
+            except BrokenProcessPool:
+                _restart_executor(executor)
+
+    error = BrokenProcessPool("Render-Prozess abgestürzt")
+    return _batch_results(start, [error] * len(batch))
+
+def _retry_isolated(
+    func: Callable[[list[dict]], list],
+    batches: list[tuple[int, list[dict], Future]]
+) -> Iterator[list[RowResult]]:
+    # Nach einem Absturz ist unklar, welcher der laufenden Stapel ihn
+    # ausgelöst hat → jeden nicht fertigen Stapel einzeln wiederholen; nur
+    # ein Stapel, der dabei jedes Mal abstürzt, gilt als fehlgeschlagen
+    for start, batch, future in batches:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            yield _collect(future)
+        else:
+            yield _run_isolated(func, start, batch)
+
+def _batches(rows: Iterable[dict], size: int, first_size: int | None = None) -> Iterator[tuple[int, list[dict]]]:
+    # first_size: Größe nur des ersten Stapels (danach size)
+    start, batch = 0, []
+    limit = first_size or size
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= limit:
+            yield start, batch
+            start, batch = start + len(batch), []
+            limit = size
+    if batch:
+        yield start, batch
+
+def iter_render_batches(
+    func: Callable[[list[dict]], list],
+    rows: Iterable[dict],
+    batch_size: int = RENDER_BATCH_ROWS,
+    first_batch_size: int | None = None
+) -> Iterator[RowResult]:
+    # func rendert einen ganzen Stapel und liefert pro Zeile Wert oder
+    # Exception. Ergebnisse kommen in Zeilenreihenfolge, jeweils sobald ihr
+    # Stapel fertig ist; rows darf ein Generator sein (z.B. direkt aus dem
+    # Excel-Reader). first_batch_size: kleiner erster Stapel, damit das
+    # erste Ergebnis nicht auf einen vollen Stapel wartet (Streaming)
+    executor = get_executor()
+    timer = profiling.active_timer()
+    if timer is not None:
+        # Profil-Lauf: seriell im aufrufenden Thread (nur den sieht cProfile)
+        # und zeilenweise, damit jede Zeile ihre eigene Laufzeit bekommt
+        executor, batch_size = None, 1
+    elif isinstance(rows, list):
+        if executor is None or len(rows) < 2:
+            executor = None
+        else:
+            # Kleine Uploads trotzdem auf alle Render-Prozesse verteilen
+            batch_size = min(batch_size, -(-len(rows) // RENDER_WORKERS))
+    batch_size = max(1, batch_size)
+    batches = _batches(rows, batch_size, min(first_batch_size or batch_size, batch_size))
+
+    if executor is None:
+        for start, batch in batches:
+            started = perf_counter()
+            results = _call_batch(func, start, batch)
+            if timer is not None:
+                timer.add(start, perf_counter() - started, results[0].error)
+            yield from results
+        return
+
+    # Nur begrenzt viele Stapel gleichzeitig unterwegs → Speicher bleibt
+    # flach, auch wenn die Eingabe noch gelesen wird
+    pending: deque[tuple[int, list[dict], Future]] = deque()
+
+    def submit(start: int, batch: list[dict]):
+        try:
+            future = executor.submit(_call_batch_remote, func, start, batch)
+        except BrokenProcessPool as e:
+            # Pool ist schon kaputt → wie ein abgestürzter Stapel behandeln
+            future = Future()
+            future.set_exception(e)
+        pending.append((start, batch, future))
+
+    def collect_next() -> Iterator[RowResult]:
+        nonlocal executor
+        try:
+            results = _collect(pending[0][2])
+        except BrokenProcessPool:
+            # Alle offenen Stapel dieses Pools sind verloren: neuer Pool,
+            # offene Stapel einzeln wiederholen, danach normal weiter
+            broken = list(pending)
+            pending.clear()
+            _restart_executor(executor)
+            for results in _retry_isolated(func, broken):
+                yield from results
+            executor = get_executor()
+            return
+        pending.popleft()
+        yield from results
+
+    try:
+        for start, batch in batches:
+            submit(start, batch)
+            # Fertige Stapel vorne sofort ausliefern (erste Zeile kommt nach
+            # ihrem eigenen Rendern, nicht erst bei voller Queue); die
+            # Obergrenze bremst nur das Einlesen
+            while pending and pending[0][2].done():
+                yield from collect_next()
+            if len(pending) >= RENDER_WORKERS * PENDING_PER_WORKER:
+                yield from collect_next()
+
+        while pending:
+            yield from collect_next()
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+
+def iter_render_rows(func: Callable[[dict], Any], rows: Iterable[dict]) -> Iterator[RowResult]:
+    # Wie iter_render_batches, aber func bekommt eine einzelne Zeile
+    return iter_render_batches(partial(_each_row, func), rows, batch_size=1)
+
+def render_rows(
+    func: Callable[[dict], Any],
+    rows: list[dict],
+    progress: Callable[[int, int], None] | None = None,
+    batched: bool = False
+) -> list[RowResult]:
+    # batched: func ist eine Stapel-Funktion (siehe iter_render_batches)
+    results = []
+    iterate = iter_render_batches if batched else iter_render_rows
+    for result in iterate(func, rows):
+        results.append(result)
+        if progress is not None:
+            progress(len(results), len(rows))
+
+    return results
+
+def format_errors(results: list[RowResult]) -> str:
+    return "\n".join(
+        f"Zeile {r.index + 2}: {r.error}" for r in results if r.error is not None
+    )
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+from io import BytesIO
+from pathlib import Path
+from pypdf import PdfReader, PageObject
+from pypdf.generic import ArrayObject, ContentStream, DictionaryObject, NameObject
+
+# Prozessweiter Cache: Pfad → ((mtime_ns, size), PdfReader, SHA-256)
+_cache: dict[str, tuple[tuple[int, int], PdfReader, str]] = {}
+
+# (Pfad, statische Ebene) → (mtime_ns, size) der Vorlage, Seiten mit
+# eingebrannter statischer Ebene
+_baked: dict[tuple[str, bytes], tuple[tuple[int, int], list[PageObject]]] = {}
+_lock = threading.Lock()
+
+# Pfade, die sich nie ändern (versionierte Vorlagen) → kein stat pro Zugriff
+_frozen: set[str] = set()
+
+
+def _signature(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _resolve_all(obj, seen: set[int]):
+    # Alle indirekten Objekte einmalig auflösen, damit der Reader danach
+    # nie wieder in die Datei greift (Kopien sind so auch thread-sicher)
+    obj = obj.get_object()
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+
+    if isinstance(obj, DictionaryObject):
+        for value in obj.values():
+            _resolve_all(value, seen)
+    elif isinstance(obj, ArrayObject):
+        for value in obj:
+            _resolve_all(value, seen)
+
+def _entry(path: str | Path) -> tuple[tuple[int, int], PdfReader, str]:
+    path = str(path)
+    entry = _cache.get(path)
+    if entry is not None and path in _frozen:
+        return entry
+
+    signature = _signature(path)
+    if entry is not None and entry[0] == signature:
+        return entry
+
+    with _lock:
+        # Ein anderer Thread könnte die Vorlage inzwischen geladen haben
+        entry = _cache.get(path)
+        if entry is None or entry[0] != signature:
+            with open(path, "rb") as f:
+                data = f.read()
+
+            reader = PdfReader(BytesIO(data))
+            seen: set[int] = set()
+            for page in reader.pages:
+                _resolve_all(page, seen)
+                # /P der Annotationen zeigt auf die Originalseite; sonst würde
+                # jede Kopie beim Schreiben die ganze Vorlagenseite mitziehen
+                for annot in page.get("/Annots", ArrayObject()).get_object():
+                    annot.get_object().pop("/P", None)
+            entry = (signature, reader, hashlib.sha256(data).hexdigest())
+            _cache[path] = entry
+
+    return entry
+
+def get_template(path: str | Path) -> PdfReader:
+    return _entry(path)[1]
+
+def template_digest(path: str | Path) -> str:
+    # SHA-256 des Vorlageninhalts (z.B. für Cache-Schlüssel)
+    return _entry(path)[2]
+
+def copy_page(page: PageObject) -> PageObject:
+    # Flache Kopie: Inhalte/Ressourcen werden geteilt, merge_page ersetzt
+    # /Contents und /Resources nur auf der Kopie
+    copy = PageObject(page.pdf)
+    copy.update(page)
+    return copy
+
+def get_template_page(path: str | Path, index: int = 0) -> PageObject:
+    return copy_page(get_template(path).pages[index])
+
+def _rename_resources(layer: PageObject, suffix: str):
+    # reportlab nennt die Fonts JEDES Overlays /F1, /F2, ... → ohne eigene
+    # Namen kollidiert die eingebrannte Ebene mit dem Zeilen-Overlay und pypdf
+    # müsste bei jeder Zeile dessen Content-Stream umschreiben
+    resources = layer.get("/Resources")
+    if resources is None:
+        return
+
+    resources = resources.get_object()
+    rename = {}
+    for category, entries in list(resources.items()):
+        entries = entries.get_object()
+        if not isinstance(entries, DictionaryObject):
+            continue    # z.B. /ProcSet
+        renamed = DictionaryObject()
+        for name, value in entries.items():
+            rename[name] = NameObject(f"{name}{suffix}")
+            renamed[rename[name]] = value
+        resources[NameObject(category)] = renamed
+
+    contents = ContentStream(layer["/Contents"].get_object(), layer.pdf)
+    for operands, _ in contents.operations:
+        for i, operand in enumerate(operands):
+            if isinstance(operand, NameObject) and operand in rename:
+                operands[i] = rename[operand]
+    layer[NameObject("/Contents")] = contents
+
+def _bake(pages: list[PageObject], static: bytes) -> list[PageObject]:
+    reader = PdfReader(BytesIO(static))
+    if not reader.pages:
+        return list(pages)
+
+    layer = reader.pages[0]
+    _resolve_all(layer, set())
+    _rename_resources(layer, "_static")
+
+    baked = []
+    for page in pages:
+        page = copy_page(page)
+        page.merge_page(layer)
+        baked.append(page)
+    return baked
+
+def get_base_pages(path: str | Path, static: bytes | None = None) -> list[PageObject]:
+    # Originalseiten (nicht kopieren/verändern!), z.B. für Form XObjects.
+    # static: für jede Zeile gleiches Overlay (PDF), wird EINMAL pro
+    # Vorlagenversion in die Seiten eingerechnet
+    signature, reader, _ = _entry(path)
+    if static is None:
+        return list(reader.pages)
+
+    key = (str(path), static)
+    entry = _baked.get(key)
+    if entry is None or entry[0] != signature:
+        with _lock:
+            entry = _baked.get(key)
+            if entry is None or entry[0] != signature:
+                entry = (signature, _bake(reader.pages, static))
+                _baked[key] = entry
+
+    return list(entry[1])
+
+def get_template_pages(path: str | Path) -> list[PageObject]:
+    return [copy_page(page) for page in get_template(path).pages]
+
+def freeze_template(path: str | Path):
+    _frozen.add(str(path))
+
+def invalidate_templates(path: str | Path | None = None):
+    with _lock:
+        if path is None:
+            _cache.clear()
+            _baked.clear()
+            _frozen.clear()
+        else:
+            _cache.pop(str(path), None)
+            _frozen.discard(str(path))
+            for key in [key for key in _baked if key[0] == str(path)]:
+                del _baked[key]
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from io import BytesIO
+from typing import NamedTuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+from app.services import template_cache
+from app.services.jobs import JOB_TTL_SECONDS
+from app.services.vv_overlay import VV_TEMPLATE, render_vv_static
+from app.services.vv2_overlay import VV2_TEMPLATE
+
+# Versionierte Vorlagen aus dem Admin-Upload: jede Version ist ein eigener,
+# nie mehr veränderter Ordner; CURRENT zeigt auf die aktive Version und wird
+# atomar ersetzt. Alle gunicorn-Worker sehen den Wechsel am nächsten Upload
+TEMPLATE_VERSIONS_DIR = os.environ.get("TEMPLATE_VERSIONS_DIR") or "app/templates/versions"
+
+# Abgelöste Versionen bleiben so lange liegen, wie ein Job sie noch halten
+# kann (Jobs leben höchstens JOB_TTL_SECONDS): wartende/laufende Jobs enden
+# auf der Version, mit der sie begonnen haben
+TEMPLATE_RETAIN_SECONDS = int(os.environ.get("TEMPLATE_RETAIN_SECONDS") or JOB_TTL_SECONDS)
+
+_CURRENT_FILE = "CURRENT"
+_MANIFEST_FILE = "manifest.json"
+
+# Seite im Admin-PDF → Datei in der Version
+BUNDLE_FILES = ("VV_Vorlage.pdf", "VV_2_Vorlage.pdf")
+
+# Overlays sind in mm auf A4-Hochformat positioniert
+A4_SIZE = (595.2756, 841.8898)
+SIZE_TOLERANCE = 3      # pt
+
+
+class TemplateSet(NamedTuple):
+    version: str
+    vv: str
+    vv2: str
+
+
+BUILTIN_TEMPLATES = TemplateSet("builtin", VV_TEMPLATE, VV2_TEMPLATE)
+
+# (Signatur von CURRENT, Vorlagen)
+_current: tuple[tuple[int, int, int], TemplateSet] | None = None
+_lock = threading.Lock()
+
+
+def _templates(version: str) -> TemplateSet:
+    directory = os.path.join(TEMPLATE_VERSIONS_DIR, version)
+    return TemplateSet(version, *(os.path.join(directory, name) for name in BUNDLE_FILES))
+
+def _preload(templates: TemplateSet):
+    # Seiten einmal parsen (inkl. eingebrannter statischer Ebene), nicht
+    # erst in der ersten Zeile; versionierte Dateien ändern sich nie
+    for path in templates[1:]:
+        template_cache.freeze_template(path)
+    template_cache.get_base_pages(templates.vv, render_vv_static())
+    template_cache.get_base_pages(templates.vv2)
+
+def current_templates() -> TemplateSet:
+    # Pro Upload/Job einmal aufrufen und die Vorlagen durchreichen: so endet
+    # ein laufender Job auf der Version, mit der er begonnen hat
+    global _current
+
+    try:
+        st = os.stat(os.path.join(TEMPLATE_VERSIONS_DIR, _CURRENT_FILE))
+    except FileNotFoundError:
+        return BUILTIN_TEMPLATES
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    current = _current
+    if current is not None and current[0] == signature:
+        return current[1]
+
+    with _lock:
+        if _current is None or _current[0] != signature:
+            with open(os.path.join(TEMPLATE_VERSIONS_DIR, _CURRENT_FILE), encoding="utf-8") as f:
+                templates = _templates(f.read().strip())
+            try:
+                _preload(templates)
+            except Exception as e:
+                # Kaputte/fehlende Version → mitgelieferte Vorlagen statt Ausfall
+                print(f"Error in Vorlagen-Version {templates.version}: {e}")
+                templates = BUILTIN_TEMPLATES
+            _current = (signature, templates)
+
+        return _current[1]
+
+def read_manifest(templates: TemplateSet | None = None) -> dict:
+    templates = templates or current_templates()
+    if templates.version == BUILTIN_TEMPLATES.version:
+        return {"version": templates.version}
+
+    with open(os.path.join(TEMPLATE_VERSIONS_DIR, templates.version, _MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def build_bundle(data: bytes) -> tuple[list[bytes], list[dict]]:
+    # Prüft das Admin-PDF und liefert die normalisierten Einzelseiten
+    # (+ Geometrie); ValueError mit Meldung für den Admin
+    try:
+        reader = PdfReader(BytesIO(data))
+        if reader.is_encrypted and not reader.decrypt(""):
+            raise ValueError("Das PDF ist passwortgeschützt")
+        count = len(reader.pages)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Das PDF kann nicht gelesen werden: {e}")
+
+    if count < len(BUNDLE_FILES):
+        raise ValueError(f"Das PDF muss mindestens {len(BUNDLE_FILES)} Seiten haben")
+
+    files, pages = [], []
+    for i, name in enumerate(BUNDLE_FILES):
+        writer = PdfWriter()
+        page = writer.add_page(reader.pages[i])
+
+        # Drehung in den Inhalt übernehmen (wie normalize_ol_template.py),
+        # Overlays rechnen mit ungedrehter Seite
+        rotation = page.rotation
+        if rotation:
+            page.transfer_rotation_to_content()
+
+        box = page.mediabox
+        width, height = float(box.width), float(box.height)
+        if abs(width - A4_SIZE[0]) > SIZE_TOLERANCE or abs(height - A4_SIZE[1]) > SIZE_TOLERANCE:
+            raise ValueError(f"Seite {i + 1} ist kein A4-Hochformat ({width:.0f} × {height:.0f} pt)")
+
+        # Sichtbarer Bereich = ganze Seite (Overlays decken die volle A4-Fläche ab)
+        for box_name in ("/CropBox", "/BleedBox", "/TrimBox", "/ArtBox"):
+            page.pop(NameObject(box_name), None)
+
+        buffer = BytesIO()
+        writer.write(buffer)
+        content = buffer.getvalue()
+
+        # Ergebnis muss sich wieder laden lassen (so wie es der Renderer tut)
+        if len(PdfReader(BytesIO(content)).pages) != 1:
+            raise ValueError(f"Seite {i + 1} konnte nicht übernommen werden")
+
+        files.append(content)
+        pages.append({
+            "file": name,
+            "source_page": i + 1,
+            "width": round(width, 4),
+            "height": round(height, 4),
+            "origin": [round(float(box.left), 4), round(float(box.bottom), 4)],
+            "rotation_normalized": rotation,
+            "sha256": hashlib.sha256(content).hexdigest(),
+        })
+
+    return files, pages
+
+def _write_current(version: str):
+    path = os.path.join(TEMPLATE_VERSIONS_DIR, _CURRENT_FILE)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+
+def _prune(keep: str):
+    # Lange abgelöste Versionen und Reste abgebrochener Uploads entfernen.
+    # Eine Version ist abgelöst, seit die nächste angelegt wurde (Namen
+    # beginnen mit dem Zeitstempel → sortiert = Reihenfolge der Uploads)
+    names = sorted(os.listdir(TEMPLATE_VERSIONS_DIR))
+    versions = [n for n in names if os.path.isdir(os.path.join(TEMPLATE_VERSIONS_DIR, n)) and not n.startswith(".")]
+
+    now = time.time()
+    old = [
+        name for name, successor in zip(versions, versions[1:])
+        if name != keep
+        and now - os.path.getmtime(os.path.join(TEMPLATE_VERSIONS_DIR, successor)) > TEMPLATE_RETAIN_SECONDS
+    ]
+
+    for name in names:
+        path = os.path.join(TEMPLATE_VERSIONS_DIR, name)
+        stale_tmp = name.startswith(".") and now - os.path.getmtime(path) > 3600
+        if name in old or stale_tmp:
+            for template in _templates(name)[1:]:
+                template_cache.invalidate_templates(template)
+            shutil.rmtree(path, ignore_errors=True)
+
+def install_bundle(data: bytes, source: str = "") -> dict:
+    # Neue Version komplett in einen Temp-Ordner schreiben, dann umbenennen
+    # und CURRENT umstellen → kein Worker sieht je eine halbe Version
+    files, pages = build_bundle(data)
+
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifest = {
+        "version": version,
+        "created": time.time(),
+        "source": source,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "pages": pages,
+    }
+
+    os.makedirs(TEMPLATE_VERSIONS_DIR, exist_ok=True)
+    tmp_dir = os.path.join(TEMPLATE_VERSIONS_DIR, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        for name, content in zip(BUNDLE_FILES, files):
+            with open(os.path.join(tmp_dir, name), "wb") as f:
+                f.write(content)
+        with open(os.path.join(tmp_dir, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_dir, os.path.join(TEMPLATE_VERSIONS_DIR, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _write_current(version)
+
+    # Dieser Worker lädt sofort, die übrigen beim nächsten current_templates()
+    current_templates()
+    _prune(version)
+    return manifest
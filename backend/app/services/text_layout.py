@@ -0,0 +1,167 @@
+from functools import lru_cache, partial
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from app.services.fonts import FONT
+
+# Zeichenbreiten in 1/1000 em je Font (größenunabhängig). reportlab rechnet
+# Breite = Summe(Einheiten) * 0.001 * Größe → gleiche Rechnung, gleiches Ergebnis
+_char_units: dict[str, dict[str, float]] = {}
+
+# Gleiche Werte (PLZ, Ort, "0.00 €", ...) wiederholen sich tausendfach pro Stapel
+LAYOUT_CACHE_SIZE = 4096
+
+
+def _units(text: str, font: str, total: float = 0) -> float:
+    # total: bisherige Summe weiterführen (Zeichen für Zeichen wie beim
+    # Messen des ganzen Strings → identisches Ergebnis)
+    widths = _char_units.get(font)
+    if widths is None:
+        widths = _char_units.setdefault(font, {})
+
+    for ch in text:
+        w = widths.get(ch)
+        if w is None:
+            # Metriken sind ganzzahlig, round() entfernt nur Float-Rauschen
+            w = widths[ch] = round(stringWidth(ch, font, 1000), 3)
+        total += w
+    return total
+
+def text_width(text: str, font: str, size: float) -> float:
+    return _units(text, font) * 0.001 * size
+
+def _break_word_chars(word: str, font: str, size: int, box_width: float) -> list[str]:
+    # Laufende Breitensumme statt jeden Teilstring neu zu messen
+    parts, current, current_units = [], "", 0
+    for ch in word:
+        ch_units = _units(ch, font)
+        if (current_units + ch_units) * 0.001 * size <= box_width:
+            current += ch
+            current_units += ch_units
+        else:
+            parts.append(current)
+            current, current_units = ch, ch_units
+    if current:
+        parts.append(current)
+    return parts
+
+def _split_hyphen(word: str) -> list[str]:
+    # Bindestrich = Umbruchstelle, bleibt am Ende des Teils
+    parts = []
+    current = ""
+    for ch in word:
+        current += ch
+        if ch == "-":
+            parts.append(current)
+            current = ""
+    if current:
+        parts.append(current)
+    return parts
+
+def _wrap(tokens: list[str], font: str, size: int, box_width: float, hyphenate: bool) -> list[str]:
+    # Laufende Breitensumme der aktuellen Zeile: pro Token nur das Token
+    # (+ Leerzeichen) messen, nicht die ganze bisherige Zeile
+    lines = []
+    current, current_units = "", 0
+
+    for token in tokens:
+        if hyphenate:
+            # kein Leerzeichen wenn current mit "-" endet
+            sep = "" if current.endswith("-") or not current else " "
+            candidate = current + sep + token
+        else:
+            candidate = (current + " " + token).strip()
+
+        if current and candidate.startswith(current):
+            candidate_units = _units(candidate[len(current):], font, current_units)
+        else:
+            candidate_units = _units(candidate, font)
+
+        if candidate_units * 0.001 * size <= box_width:
+            current, current_units = candidate, candidate_units
+        else:
+            if current:
+                lines.append(current)
+            current, current_units = token, _units(token, font)
+
+            # Wort ist breiter als Box → zeichenweise
+            if current_units * 0.001 * size > box_width:
+                parts = _break_word_chars(current, font, size, box_width)
+                lines.extend(parts[:-1])
+                current = parts[-1]
+                current_units = _units(current, font)
+
+    if current:
+        lines.append(current)
+    return lines
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def layout_text(
+    text: str,
+    box_width: float,
+    max_lines: int = 2,
+    font: str = FONT,
+    font_size: int = 8,
+    min_font_size: int = 5,
+    hyphenate: bool = True,
+    shrink_multiline: bool = True,
+) -> tuple[tuple[str, ...], int]:
+    # → (Zeilen, Schriftgröße); größte Größe, bei der ALLES in die Box passt
+    if hyphenate:
+        tokens = [part for w in text.split(" ") for part in _split_hyphen(w)]
+    else:
+        tokens = text.split(" ")
+
+    for size in range(font_size, min_font_size - 1, -1):
+        lines = _wrap(tokens, font, size, box_width, hyphenate)
+
+        # Mehrzeiliger Text wird eine Stufe kleiner gesetzt
+        effective_size = size - 1 if shrink_multiline and len(lines) > 1 else size
+        if effective_size < min_font_size:
+            continue
+
+        if (
+            len(lines) <= max_lines
+            and all(text_width(line, font, effective_size) <= box_width for line in lines)
+        ):
+            return tuple(lines), effective_size
+
+    # selbst min_font_size reicht nicht
+    parts = _break_word_chars(text, font, min_font_size, box_width)
+    return tuple(parts[:max_lines]), min_font_size
+
+def draw_text_in_box(
+    c: canvas.Canvas,
+    text: str,
+    x: float,
+    y_base: float,
+    box_width: float,
+    max_lines: int = 2,
+    font: str = FONT,
+    font_size: int = 8,
+    min_font_size: int = 5,
+    line_spacing: float = 1.2,
+    hyphenate: bool = True,
+    shrink_multiline: bool = True,
+):
+    if not text:
+        return
+
+    final_lines, final_size = layout_text(
+        str(text), box_width, max_lines, font, font_size, min_font_size,
+        hyphenate, shrink_multiline
+    )
+
+    # Vertikal zentrieren
+    c.setFont(font, final_size)
+    line_height = final_size * line_spacing
+    total_height = len(final_lines) * line_height
+    start_y = y_base + (total_height - line_height) / 2
+
+    y = start_y
+    for line in final_lines:
+        c.drawString(x, y, line)
+        y -= line_height
+
+# OL-Variante: nur an Leerzeichen umbrechen, Größe nicht zusätzlich verkleinern
+draw_text_in_box_plain = partial(draw_text_in_box, hyphenate=False, shrink_multiline=False)
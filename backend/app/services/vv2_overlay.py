@@ -1,9 +1,13 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from pypdf import PdfReader, PdfWriter
-import os
+from pypdf import PageObject
+from io import BytesIO
+from functools import partial
 
-from app.services.vv_overlay import draw_text_in_box 
+from app.services.fonts import overlay_canvas
+from app.services.text_layout import draw_text_in_box
+from app.services.overlay_batch import OverlayBatch
+from app.services.pdf_merge import Stamp, apply_stamp, merge_pages
 
 VV2_TEMPLATE = "app/templates/VV_2_Vorlage.pdf"
 
@@ -13,28 +17,35 @@ FIELD_MAPPING_VV2 = {
     "Unterschrift Datum": (133 * mm, 118.5 * mm, 7, 50 * mm),  # Beispielposition
 }
 
-def create_vv2_pdf(row: dict, index: int, workdir: str) -> str:
-    overlay_path = f"{workdir}/vv2_overlay_{index}.pdf"
-    output_path = f"{workdir}/vv2_filled_{index}.pdf"
-
-    c = canvas.Canvas(overlay_path)
-    
+def draw_vv2_overlay(c: canvas.Canvas, row: dict):
     for field, (x, y, font_size, box_width) in FIELD_MAPPING_VV2.items():
         value = row.get(field)
         if value:
             draw_text_in_box(c, str(value), x, y, box_width, font_size=font_size)
 
+def render_vv2_overlay(row: dict) -> BytesIO:
+    buffer = BytesIO()
+    c = overlay_canvas(buffer)
+    draw_vv2_overlay(c, row)
     c.save()
+    buffer.seek(0)
 
-    base = PdfReader(VV2_TEMPLATE)
-    overlay = PdfReader(overlay_path)
-    writer = PdfWriter()
+    return buffer
 
-    page = base.pages[0]
-    page.merge_page(overlay.pages[0])
-    writer.add_page(page)
+def create_vv2_stamp(row: dict, batch: OverlayBatch | None = None, template: str = VV2_TEMPLATE) -> Stamp:
+    # Ohne Unterschriftsfelder bleibt der Canvas leer (Vorlage bleibt unverändert)
+    if batch is not None:
+        return batch.stamp(template, 0, batch.draw(partial(draw_vv2_overlay, row=row)))
 
-    with open(output_path, "wb") as f:
-        writer.write(f)
+    return Stamp(
+        template=template,
+        page_index=0,
+        overlay=render_vv2_overlay(row).getvalue()
+    )
 
-    return output_path
\ No newline at end of file
+def create_vv2_page(row: dict) -> PageObject:
+    return apply_stamp(create_vv2_stamp(row))
+
+def create_vv2_pdf(row: dict, index: int, workdir: str) -> str:
+    output_path = f"{workdir}/vv2_filled_{index}.pdf"
+    return merge_pages([create_vv2_page(row)], output_path)
@@ -1,10 +1,15 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfbase.pdfmetrics import stringWidth
-import re
-from collections import OrderedDict
+from pypdf import PageObject
+from io import BytesIO
 from datetime import date
+from functools import lru_cache, partial
+from typing import Callable, NamedTuple
+from app.services.address import AddressList, parse_addresses
+from app.services.fonts import FONT, overlay_canvas
+from app.services.overlay_batch import OverlayBatch
+from app.services.pdf_merge import Stamp, apply_stamp, merge_pages
+from app.services.text_layout import draw_text_in_box
 
 VV_TEMPLATE = "app/templates/VV_Vorlage.pdf"
 FONT_SIZE = 6
@@ -36,43 +41,6 @@ FIELD_MAPPING = {
 }
 
 # HILFSFUNKTION
-def split_strasse_hausnummer(text: str):
-    if not text:
-        return None, None
-
-    # Wir splitten nicht nur hart am Komma, sondern trimmen auch
-    parts = [p.strip() for p in text.split(",") if p.strip()]
-
-    main_street = None
-    house_numbers = []
-
-    for part in parts:
-        # NEUER REGEX: 
-        # (.+?) -> Straße (greedy bis zur Nummer)
-        # \s+ -> Mindestens ein Leerzeichen
-        # (\d+.*) -> Die Nummer beginnt mit einer Ziffer, darf aber danach alles enthalten (a, b, /1 etc.)
-        match = re.search(r"(.+?)\s+(\d+.*)$", part)
-        
-        if not match:
-            # Falls gar keine Ziffer gefunden wird, ist es vielleicht nur ein Buchstabe (Nachtrag)
-            if main_street and house_numbers:
-                house_numbers.append(part)
-            continue
-
-        street, number = match.groups()
-
-        if main_street is None:
-            main_street = street
-
-        # Wenn die Straße gleich bleibt oder wir im ersten Durchgang sind
-        if street == main_street:
-            house_numbers.append(number)
-
-    if not main_street:
-        # Fallback: Wenn der Regex gar nicht greift, gib den Text als Straße zurück
-        return text, ""
-
-    return main_street, ", ".join(house_numbers)
 def parse_anzahl_we(value):
     if value is None or str(value).strip() == "":
         return None
@@ -105,111 +73,6 @@ def parse_anzahl_we(value):
         return int(value_str)
 
     return None
-def split_multiple_objects(value: str) -> list[str]:
-    if not value:
-        return []
-
-    return [v.strip() for v in value.split(",") if v.strip()]
-def draw_text_in_box(
-    c: canvas.Canvas,
-    text: str,
-    x: float,
-    y_base: float,
-    box_width: float,
-    max_lines: int = 2,
-    font: str = "Helvetica",
-    font_size: int = 8,
-    min_font_size: int = 5,
-    line_spacing: float = 1.2,
-):
-    if not text:
-        return
-
-    text = str(text)
-
-    def break_word_chars(word: str, size: int) -> list[str]:
-        parts, current = [], ""
-        for ch in word:
-            if stringWidth(current + ch, font, size) <= box_width:
-                current += ch
-            else:
-                parts.append(current)
-                current = ch
-        if current:
-            parts.append(current)
-        return parts
-
-    def split_word(word: str) -> list[str]:
-        parts = []
-        current = ""
-        for ch in word:
-            current += ch
-            if ch == "-":
-                parts.append(current)
-                current = ""
-        if current:
-            parts.append(current)
-        return parts
-
-    # Tokens erzeugen (Bindestrich = Umbruchstelle)
-    tokens = []
-    for w in text.split(" "):
-        tokens.extend(split_word(w))
-
-    for size in range(font_size, min_font_size - 1, -1):
-        c.setFont(font, size)
-        lines = []
-        current = ""
-
-        for token in tokens:
-            # kein Leerzeichen wenn current mit "-" endet
-            sep = "" if current.endswith("-") or not current else " "
-            candidate = current + sep + token
-
-            if stringWidth(candidate, font, size) <= box_width:
-                current = candidate
-            else:
-                if current:
-                    lines.append(current)
-                current = token
-
-                if stringWidth(current, font, size) > box_width:
-                    parts = break_word_chars(current, size)
-                    lines.extend(parts[:-1])
-                    current = parts[-1]
-
-        if current:
-            lines.append(current)
-
-        effective_size = size - 1 if len(lines) > 1 else size
-        if effective_size < min_font_size:
-            continue
-
-        c.setFont(font, effective_size)
-
-        if (
-            len(lines) <= max_lines
-            and all(stringWidth(line, font, effective_size) <= box_width for line in lines)
-        ):
-            final_lines = lines
-            final_size = effective_size
-            break
-    else:
-        c.setFont(font, min_font_size)
-        parts = break_word_chars(text, min_font_size)
-        final_lines = parts[:max_lines]
-        final_size = min_font_size
-
-    # Vertikal zentrieren
-    c.setFont(font, final_size)
-    line_height = final_size * line_spacing
-    total_height = len(final_lines) * line_height
-    start_y = y_base + (total_height - line_height) / 2
-
-    y = start_y
-    for line in final_lines:
-        c.drawString(x, y, line)
-        y -= line_height
 def is_empty(*v_args):
     # Falls nur ein Argument übergeben wurde, verhalte dich wie vorher
     # Falls mehrere übergeben wurden, prüfe ob MINDESTENS eines leer ist
@@ -221,46 +84,6 @@ def is_empty(*v_args):
         ):
             return True
     return False
-def shorten_streets(street_str: str) -> str:
-    if not street_str:
-        return ""
-    
-    parts = [p.strip() for p in str(street_str).split(",") if p.strip()]
-    streets = OrderedDict()
-
-    for part in parts:
-        # Wir versuchen den Split an der ERSTEN Stelle, wo eine Zahl auftaucht
-        # Das ist stabiler als rsplit, wenn Hausnummern Leerzeichen haben (8 a)
-        match = re.search(r"\s+\d", part)
-        
-        if match:
-            split_pos = match.start()
-            name = part[:split_pos].strip()
-            number = part[split_pos:].strip()
-            streets.setdefault(name, []).append(number)
-        else:
-            # Fallback: Wenn kein " Name Nummer" erkannt wird (z.B. nur "b")
-            # Schauen wir, ob wir das an die letzte Straße hängen können
-            if " " in part:
-                # Letzter Versuch: Split am letzten Leerzeichen
-                name, number = part.rsplit(" ", 1)
-                streets.setdefault(name.strip(), []).append(number.strip())
-            elif streets:
-                last_street = list(streets.keys())[-1]
-                streets[last_street].append(part)
-            else:
-                streets.setdefault(part.strip(), [])
-
-    result = []
-    for name, numbers in streets.items():
-        if numbers:
-            # Duplikate filtern und zusammenfügen
-            unique_nos = list(OrderedDict.fromkeys(numbers))
-            result.append(f"{name} {', '.join(unique_nos)}")
-        else:
-            result.append(name)
-
-    return ", ".join(result)
 def split_word(word: str):
     # trennt an "-" UND behält den Bindestrich
     parts = []
@@ -273,54 +96,30 @@ def split_word(word: str):
     if current:
         parts.append(current)
     return parts
-def split_strasse_hausnummer_lexico(text: str):
-    if not text:
-        return None, None
-
-    # 1. Wir nutzen die Normalisierung, falls noch nicht geschehen
-    # "Bahner Str. 8 a, b, c" -> ["Bahner Str. 8 a", "Bahner Str. b", ...]
-    parts = [p.strip() for p in text.split(",") if p.strip()]
-    pairs = []
-
-    for part in parts:
-        # Wir suchen die POSITION der ersten Ziffer
-        match = re.search(r"\d", part)
-        if match:
-            idx = match.start()
-            # Alles VOR der ersten Ziffer ist die Straße
-            street = part[:idx].strip()
-            # Alles AB der ersten Ziffer ist die Nummer
-            number = part[idx:].strip()
-            pairs.append((street, number))
-        else:
-            # Fallback für Teile wie "Bahner Str. b" (ohne Ziffer)
-            # Hier nehmen wir rsplit am letzten Leerzeichen
-            if " " in part:
-                s, n = part.rsplit(" ", 1)
-                pairs.append((s.strip(), n.strip()))
-
-    if not pairs:
-        return text, ""
 
-    # 2. Den Teil mit der "kleinsten" Hausnummer finden
-    # Wir sortieren so, dass 8a vor 9 kommt (natürliche Sortierung)
-    def natural_sort_key(p):
-        num = re.search(r"\d+", p[1])
-        return int(num.group()) if num else 9999
+def contract_start_date(heute: date | None = None) -> str:
+    # Vertragsbeginn: 1. des Folgemonats, ab dem 20. des übernächsten Monats
+    heute = heute or date.today()
 
-    chosen_street, chosen_number = min(pairs, key=natural_sort_key)
-
-    return chosen_street, chosen_number
-
-def create_vv_pdf(row: dict, index: int, workdir: str) -> str:
-    overlay_path = f"{workdir}/vv_overlay_{index}.pdf"
-    output_path = f"{workdir}/vv_filled_{index}.pdf"
+    if heute.day < 20:
+        monat = heute.month + 1
+        jahr = heute.year
+    else:
+        monat = heute.month + 2
+        jahr = heute.year
 
-    c = canvas.Canvas(overlay_path)
+    if monat > 12:
+        monat -= 12
+        jahr += 1
 
-    objects = split_multiple_objects(row.get("Objekt Str + Hnr", ""))
-    multi_object = len(objects) > 1
+    return f"01.{monat:02d}.{jahr}"
 
+@lru_cache(maxsize=1)
+def render_vv_static() -> bytes:
+    # Für jede Zeile gleich → einmal rendern, wird in die Vorlage eingebrannt.
+    # invariant: gleiche Bytes in allen Prozessen (kein Datum / keine ID im PDF)
+    buffer = BytesIO()
+    c = overlay_canvas(buffer, invariant=1)
 
     # Kosten
     draw_text_in_box(
@@ -341,298 +140,250 @@ def create_vv_pdf(row: dict, index: int, workdir: str) -> str:
         max_lines=2,
         font_size=6
     )
-    # -------------------------------------------- Kreuz handeling --------------------------------------------
-    # Kreuz bei mehreren Objekten
-    if multi_object:
-        x, y, font_size, box_width = FIELD_MAPPING["__MULTI_OBJECT_CHECK__"]
-        c.setFont("Helvetica", 9)
-        c.drawString(x, y, "X")
 
-    # Kreuz bei Bevollmächtigten
-    firma = row.get("Bevollm. Firma")
-    geschlecht = str(row.get("Bevollm. Herr/Frau (H/F)") or "").strip().lower()
+    c.save()
+    return buffer.getvalue()
 
-    if not is_empty(firma):
-        #Firma hat IMMER Vorrang
-        c.setFont("Helvetica", 9)
-        c.drawString(141.5 * mm, 238 * mm, "X")
+class _VVRow(NamedTuple):
+    # Pro Zeile einmal ermittelt, von allen Feldern gelesen
+    row: dict
+    addresses: AddressList
+    multi_object: bool
 
-    else:
-        if geschlecht in ("h", "herr"):
-            c.setFont("Helvetica", 9)
-            c.drawString(115 * mm, 238 * mm, "X")
 
-        elif geschlecht in ("f", "frau"):
-            c.setFont("Helvetica", 9)
-            c.drawString(128.5 * mm, 238 * mm, "X")
+# Kreuze Anrede (Firma hat IMMER Vorrang): Herr/Frau → x-Position
+_BEVOLLM_CHECK_X = {"h": 115 * mm, "herr": 115 * mm, "f": 128.5 * mm, "frau": 128.5 * mm}
+_BEVOLLM_FIRMA_X = 141.5 * mm
+_VERTRAGSP_CHECK_X = {"h": 31 * mm, "herr": 31 * mm, "f": 44.5 * mm, "frau": 44.5 * mm}
+_VERTRAGSP_FIRMA_X = 57.5 * mm     # auch ohne Anrede (WEG)
 
-    # Kreuz bei Vertragspartner
-    firma = row.get("Vertragsp. Firma")
-    geschlecht = str(row.get("Vertragsp. Herr/Frau (H/F)") or "").strip().lower()
+def _draw_check(c: canvas.Canvas, x: float, y: float):
+    c.setFont(FONT, 9)
+    c.drawString(x, y, "X")
 
-    if not is_empty(firma):
-        #Firma hat IMMER Vorrang
-        c.setFont("Helvetica", 9)
-        c.drawString(57.5 * mm, 83.5 * mm, "X")
+def _draw_checks(c: canvas.Canvas, r: _VVRow):
+    # Kreuz bei mehreren Objekten
+    if r.multi_object:
+        x, y = FIELD_MAPPING["__MULTI_OBJECT_CHECK__"][:2]
+        _draw_check(c, x, y)
 
+    # Kreuz bei Bevollmächtigten
+    if not is_empty(r.row.get("Bevollm. Firma")):
+        _draw_check(c, _BEVOLLM_FIRMA_X, 238 * mm)
     else:
-        if geschlecht in ("h", "herr"):
-            c.setFont("Helvetica", 9)
-            c.drawString(31 * mm, 83.5 * mm, "X")
+        geschlecht = str(r.row.get("Bevollm. Herr/Frau (H/F)") or "").strip().lower()
+        x = _BEVOLLM_CHECK_X.get(geschlecht)
+        if x is not None:
+            _draw_check(c, x, 238 * mm)
+
+    # Kreuz bei Vertragspartner
+    if not is_empty(r.row.get("Vertragsp. Firma")):
+        _draw_check(c, _VERTRAGSP_FIRMA_X, 83.5 * mm)
+    else:
+        geschlecht = str(r.row.get("Vertragsp. Herr/Frau (H/F)") or "").strip().lower()
+        _draw_check(c, _VERTRAGSP_CHECK_X.get(geschlecht, _VERTRAGSP_FIRMA_X), 83.5 * mm)
 
-        elif geschlecht in ("f", "frau"):
-            c.setFont("Helvetica", 9)
-            c.drawString(44.5 * mm, 83.5 * mm, "X")
-        else:
-            c.setFont("Helvetica", 9)
-            c.drawString(57.5 * mm, 83.5 * mm, "X")
-    
     # Kreuz bei Ansprechpartner (8)
     if not is_empty("Bevollm. Firma", "Bevollm. Herr/Frau (H/F)", "Bevollm. Name"):
-        c.setFont("Helvetica", 9)
-        c.drawString(141.5 * mm, 187.5 * mm, "X")
+        _draw_check(c, 141.5 * mm, 187.5 * mm)
     else:
-        c.setFont("Helvetica", 9)
-        c.drawString(115 * mm, 187.5 * mm, "X")
-    # ------------------------------------------- Felder handeling --------------------------------------------
-    for field, (x, y, font_size, box_width) in FIELD_MAPPING.items():
+        _draw_check(c, 115 * mm, 187.5 * mm)
 
-        # DIREKTZUGRIFF auf ROW
-        value = row.get(field)
+# ------------------------------------------- Felder handeling --------------------------------------------
+# Jede Funktion zeichnet EIN Feld: (c, Zeile, Feld, Position aus FIELD_MAPPING)
 
-        # Adresse komplett überspringen bei mehreren Objekten
-        if multi_object and field in {
-            "Objekt Str + Hnr",
-            "Objekt PLZ",
-            "Objekt Ort",
-        }:
-            continue
-        
-
-
-        # Sonderlogik Straße + Hausnr (nur bei EINEM Objekt)
-        if field == "Objekt Str + Hnr" and not multi_object:
-            first_object = objects[0]
-            street, house_number = split_strasse_hausnummer(first_object)
-
-            c.setFont("Helvetica", font_size)
-            if street:
-                draw_text_in_box(
-                    c=c,
-                    text=street,
-                    x=38 * mm,
-                    y_base=210 * mm,
-                    box_width=50*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            if house_number:
-                draw_text_in_box(
-                    c=c,
-                    text=house_number,
-                    x=94 * mm,
-                    y_base=210 * mm,
-                    box_width=box_width,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            continue
-        if field == "Bevollm. Str. Hnr" and not is_empty(value):
-            kombination = row.get("Bevollm. Str. Hnr")
-            street, house_number = split_strasse_hausnummer(kombination)
-
-            c.setFont("Helvetica", font_size)
-            if street:
-                draw_text_in_box(
-                    c=c,
-                    text=street,
-                    x=122 * mm,
-                    y_base=213.5 * mm,
-                    box_width=50*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            if house_number:
-                draw_text_in_box(
-                    c=c,
-                    text=house_number,
-                    x=178 * mm,
-                    y_base=213.5 * mm,
-                    box_width=box_width,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            continue
-        if field == "Vertragsp. Str + Hnr" and not is_empty(value):
-            kombination = row.get("Vertragsp. Str + Hnr")
-            street, house_number = split_strasse_hausnummer(kombination)
-
-            c.setFont("Helvetica", font_size)
-            if street:
-                draw_text_in_box(
-                    c=c,
-                    text=street,
-                    x=38 * mm,
-                    y_base=62.5 * mm,
-                    box_width=50*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            if house_number:
-                draw_text_in_box(
-                    c=c,
-                    text=house_number,
-                    x=94 * mm,
-                    y_base=62.5 * mm,
-                    box_width=20*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            continue
-        if field == "Vertragsp. Str + Hnr" and is_empty(value):
-            kombination = row.get("Objekt Str + Hnr")
-            street, house_number = split_strasse_hausnummer_lexico(kombination)
-
-            c.setFont("Helvetica", font_size)
-            if street:
-                draw_text_in_box(
-                    c=c,
-                    text=street,
-                    x=38 * mm,
-                    y_base=62.5 * mm,
-                    box_width=50*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            if house_number:
-                draw_text_in_box(
-                    c=c,
-                    text=house_number,
-                    x=93 * mm,
-                    y_base=62.5 * mm,
-                    box_width=12*mm,
-                    max_lines=2,
-                    font_size=font_size
-                )
-            continue
-        # Ort:
-        if field == "Objekt Ort":
-            draw_text_in_box(
-                c=c,
-                text=value,
-                x=x,
-                y_base=y,
-                box_width=box_width,
-                max_lines=2,
-                font_size=font_size
-            )
-            continue
+def _draw_box(c: canvas.Canvas, text, x: float, y: float, box_width: float, font_size: int):
+    draw_text_in_box(
+        c=c,
+        text=text,
+        x=x,
+        y_base=y,
+        box_width=box_width,
+        max_lines=2,
+        font_size=font_size
+    )
 
-        # PLZ:
-        if field == "Objekt PLZ":
-            draw_text_in_box(
-                c=c,
-                text=str(value) if value is not None else "",
-                x=x,
-                y_base=y,
-                box_width=box_width,
-                max_lines=2,
-                font_size=font_size
-            )
-            continue
+def _draw_street_number(
+    c: canvas.Canvas,
+    street: str | None,
+    house_number: str | None,
+    font_size: int,
+    street_pos: tuple[float, float],
+    number_pos: tuple[float, float],
+    number_width: float
+):
+    c.setFont(FONT, font_size)
+    if street:
+        _draw_box(c, street, *street_pos, 50 * mm, font_size)
+    if house_number:
+        _draw_box(c, house_number, *number_pos, number_width, font_size)
+
+def _draw_value(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    # Allgemeine Felder
+    value = r.row.get(field)
+    if not is_empty(value):
+        _draw_box(c, str(value), x, y, box_width, font_size)
+
+def _draw_text(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float, text: str):
+    # Fester Text für den ganzen Stapel (Datum)
+    _draw_box(c, text, x, y, box_width, font_size)
+
+def _draw_objekt_address(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    # Straße + Hausnr (nur bei EINEM Objekt, sonst steht alles in der OL)
+    if r.multi_object:
+        return
+    address = parse_addresses(r.addresses.objects[0])
+    _draw_street_number(
+        c, address.street, address.house_numbers, font_size,
+        (38 * mm, 210 * mm), (94 * mm, 210 * mm), box_width
+    )
 
-        # Sonderlogik Anzahl WE (IMMER schreiben)
-        if field == "Anzahl WE":
-            total = parse_anzahl_we(value)
-            if total is not None:
-                c.setFont("Helvetica", font_size)
-                c.drawString(x, y, str(total))
-            continue
+def _draw_objekt_plz(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    if r.multi_object:
+        return
+    value = r.row.get(field)
+    _draw_box(c, str(value) if value is not None else "", x, y, box_width, font_size)
 
-        if field == "Datum":
-            heute = date.today()
-
-            if heute.day < 20:
-                monat = heute.month + 1
-                jahr = heute.year
-            else:
-                monat = heute.month + 2
-                jahr = heute.year
-
-            if monat > 12:
-                monat -= 12
-                jahr += 1
-
-            draw_text_in_box(
-                c=c,
-                text=f"01.{monat:02d}.{jahr}",
-                x=x,
-                y_base=y,
-                box_width=box_width,
-                max_lines=2,
-                font_size=font_size
-            )
-            continue
+def _draw_objekt_ort(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    if r.multi_object:
+        return
+    _draw_box(c, r.row.get(field), x, y, box_width, font_size)
+
+def _draw_anzahl_we(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    # Anzahl WE (IMMER schreiben)
+    total = parse_anzahl_we(r.row.get(field))
+    if total is not None:
+        c.setFont(FONT, font_size)
+        c.drawString(x, y, str(total))
+
+def _draw_bevollm_address(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    value = r.row.get(field)
+    if is_empty(value):
+        return
+    address = parse_addresses(value)
+    _draw_street_number(
+        c, address.street, address.house_numbers, font_size,
+        (122 * mm, 213.5 * mm), (178 * mm, 213.5 * mm), box_width
+    )
 
-        # Sonderlogik (Bei nicht-Eingaben):
-        if is_empty(value) and field == "Vertragsp. Firma" and is_empty(row.get("Vertragsp. Name")):
-            draw_text_in_box(
-                c=c,
-                text= f"WEG {shorten_streets(row.get("Objekt Str + Hnr"))}, {str(row.get("Objekt PLZ"))} {row.get("Objekt Ort")}",
-                x=x,
-                y_base=y,
-                box_width= 70*mm,
-                max_lines=2,
-                font_size=font_size
-            )
-            continue
-        if is_empty(value) and field == "Vertragsp. PLZ":
-            draw_text_in_box(
-                c=c,
-                text=str(row.get("Objekt PLZ") or ""),
-                x=x,
-                y_base=y,
-                box_width=70*mm,
-                max_lines=2,
-                font_size=font_size
-            )
-            continue
-        if is_empty(value) and field == "Vertragsp. Ort":
-            draw_text_in_box(
-                c=c,
-                text= f"{row.get("Objekt Ort")}",
-                x=x,
-                y_base=y,
-                box_width= 70*mm,
-                max_lines=2,
-                font_size=font_size
-            )
+def _draw_vertragsp_address(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    value = r.row.get(field)
+    if not is_empty(value):
+        address = parse_addresses(value)
+        _draw_street_number(
+            c, address.street, address.house_numbers, font_size,
+            (38 * mm, 62.5 * mm), (94 * mm, 62.5 * mm), 20 * mm
+        )
+    else:
+        # Ohne eigene Adresse: Objekt mit der kleinsten Hausnummer
+        street, house_number = r.addresses.lowest
+        _draw_street_number(
+            c, street, house_number, font_size,
+            (38 * mm, 62.5 * mm), (93 * mm, 62.5 * mm), 12 * mm
+        )
+
+# Sonderlogik (Bei nicht-Eingaben): Vertragspartner fehlt → Werte der WEG
+
+def _draw_vertragsp_firma(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    row = r.row
+    if is_empty(row.get(field)) and is_empty(row.get("Vertragsp. Name")):
+        text = f"WEG {r.addresses.short}, {str(row.get("Objekt PLZ"))} {row.get("Objekt Ort")}"
+        _draw_box(c, text, x, y, 70 * mm, font_size)
+        return
+    _draw_value(c, r, field, x, y, font_size, box_width)
+
+def _draw_vertragsp_plz(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    if is_empty(r.row.get(field)):
+        _draw_box(c, str(r.row.get("Objekt PLZ") or ""), x, y, 70 * mm, font_size)
+        return
+    _draw_value(c, r, field, x, y, font_size, box_width)
+
+def _draw_vertragsp_ort(c: canvas.Canvas, r: _VVRow, field: str, x: float, y: float, font_size: int, box_width: float):
+    if is_empty(r.row.get(field)):
+        _draw_box(c, f"{r.row.get("Objekt Ort")}", x, y, 70 * mm, font_size)
+        return
+    _draw_value(c, r, field, x, y, font_size, box_width)
+
+# Feld → Zeichenfunktion; alle übrigen Felder aus FIELD_MAPPING: _draw_value
+FIELD_HANDLERS = {
+    "Objekt Str + Hnr": _draw_objekt_address,
+    "Objekt PLZ": _draw_objekt_plz,
+    "Objekt Ort": _draw_objekt_ort,
+    "Anzahl WE": _draw_anzahl_we,
+    "Bevollm. Str. Hnr": _draw_bevollm_address,
+    "Vertragsp. Firma": _draw_vertragsp_firma,
+    "Vertragsp. Str + Hnr": _draw_vertragsp_address,
+    "Vertragsp. PLZ": _draw_vertragsp_plz,
+    "Vertragsp. Ort": _draw_vertragsp_ort,
+}
+
+# Nur Positionen für Kreuze, keine Zeilenwerte
+_CHECK_FIELDS = {"__MULTI_OBJECT_CHECK__"}
+
+@lru_cache(maxsize=4)
+def _compile_vv_plan(start_date: str) -> tuple[Callable, ...]:
+    # FIELD_MAPPING einmal in fertige Zeichen-Schritte übersetzen (Funktion,
+    # Position, Font gebunden); pro Zeile wird nur noch der Plan abgearbeitet
+    fixed_texts = {"Datum": start_date}
+
+    plan = []
+    for field, (x, y, font_size, box_width) in FIELD_MAPPING.items():
+        if field in _CHECK_FIELDS:
             continue
+        if field in fixed_texts:
+            handler = partial(_draw_text, text=fixed_texts[field])
+        else:
+            handler = FIELD_HANDLERS.get(field, _draw_value)
+        plan.append(partial(handler, field=field, x=x, y=y, font_size=font_size, box_width=box_width))
+    return tuple(plan)
 
-        # Allgemeine felder:
-        if not is_empty(value):
-            draw_text_in_box(
-                c=c,
-                text=str(value),
-                x=x,
-                y_base=y,
-                box_width=box_width,
-                max_lines=2,
-                font_size=font_size
-            )
-        
-        
-    c.save()
+def vv_field_plan(heute: date | None = None) -> tuple[Callable, ...]:
+    # Einmal pro Stapel holen: alle Zeilen bekommen denselben Vertragsbeginn
+    return _compile_vv_plan(contract_start_date(heute))
+
+def draw_vv_overlay(c: canvas.Canvas, row: dict, plan: tuple[Callable, ...] | None = None):
+    # Objektadresse einmal zerlegen: Einzelobjekte, Straße/Nummer, Kurzform
+    addresses = parse_addresses(row.get("Objekt Str + Hnr", ""))
+    r = _VVRow(row, addresses, len(addresses.objects) > 1)
+
+    # -------------------------------------------- Kreuz handeling --------------------------------------------
+    _draw_checks(c, r)
 
-    base = PdfReader(VV_TEMPLATE)
-    overlay = PdfReader(overlay_path)
+    for draw in plan or vv_field_plan():
+        draw(c, r)
 
-    writer = PdfWriter()
-    page = base.pages[0]
-    page.merge_page(overlay.pages[0])
-    writer.add_page(page)
+def render_vv_overlay(row: dict, plan: tuple[Callable, ...] | None = None) -> BytesIO:
+    # Overlay nur im Speicher erzeugen (kein Temp-File)
+    buffer = BytesIO()
+    c = overlay_canvas(buffer)
+    draw_vv_overlay(c, row, plan)
+    c.save()
+    buffer.seek(0)
+
+    return buffer
+
+def create_vv_stamp(
+    row: dict,
+    batch: OverlayBatch | None = None,
+    template: str = VV_TEMPLATE,
+    plan: tuple[Callable, ...] | None = None
+) -> Stamp:
+    # Mit batch: Overlay wird eine Seite des gemeinsamen Stapel-Canvas;
+    # plan: vv_field_plan() des Stapels (sonst pro Zeile geholt)
+    if batch is not None:
+        page = batch.draw(partial(draw_vv_overlay, row=row, plan=plan))
+        return batch.stamp(template, 0, page, static=render_vv_static())
+
+    return Stamp(
+        template=template,
+        page_index=0,
+        overlay=render_vv_overlay(row, plan).getvalue(),
+        static=render_vv_static()
+    )
 
-    with open(output_path, "wb") as f:
-        writer.write(f)
+def create_vv_page(row: dict) -> PageObject:
+    return apply_stamp(create_vv_stamp(row))
 
-    return output_path
+def create_vv_pdf(row: dict, index: int, workdir: str) -> str:
+    output_path = f"{workdir}/vv_filled_{index}.pdf"
+    return merge_pages([create_vv_page(row)], output_path)
@@ -1,25 +1,115 @@
 import zipfile
+import zlib
 import os
+from typing import Iterable, Iterator
 
-def zip_files(files: list[str], workdir: str) -> str:
+from app.services import metrics
+
+# "stored":  PDFs sind intern schon Flate-komprimiert → nur kopieren
+# "deflate": klassisch komprimieren (Level 0–9, Standard 6)
+# "auto":    pro Eintrag eine Stichprobe komprimieren und nur bei Gewinn deflaten
+ZIP_COMPRESSIONS = ("stored", "deflate", "auto")
+
+AUTO_SAMPLE_SIZE = 64 * 1024
+AUTO_MIN_SAVING = 0.05   # mindestens 5 % kleiner, sonst lohnt die CPU nicht
+
+def unique_name(base_name: str, used_names: dict) -> str:
+    name, ext = os.path.splitext(base_name)
+
+    # Prüfen, ob der Name schon existiert
+    if base_name in used_names:
+        used_names[base_name] += 1
+        # Neuen Namen generieren: "Name_1.pdf"
+        return f"{name}_{used_names[base_name]}{ext}"
+
+    used_names[base_name] = 0
+    return base_name
+
+def choose_compression(sample: bytes, compression: str = "stored", level: int | None = None) -> tuple[int, int | None]:
+    if compression == "stored":
+        return zipfile.ZIP_STORED, None
+
+    if compression == "deflate":
+        return zipfile.ZIP_DEFLATED, level
+
+    # auto: schneller Probelauf (Level 1) auf dem Anfang des Eintrags
+    sample = sample[:AUTO_SAMPLE_SIZE]
+    if not sample:
+        return zipfile.ZIP_STORED, None
+
+    saving = 1 - len(zlib.compress(sample, 1)) / len(sample)
+    if saving < AUTO_MIN_SAVING:
+        return zipfile.ZIP_STORED, None
+    return zipfile.ZIP_DEFLATED, level
+
+def zip_files(files: list[str], workdir: str, compression: str = "stored", level: int | None = None) -> str:
     zip_path = os.path.join(workdir, "Versorgungsvereinbarungen.zip")
     
-    with zipfile.ZipFile(zip_path, "w") as zipf:
+    with metrics.stage("zip"), zipfile.ZipFile(zip_path, "w") as zipf:
         used_names = {} # Speichert, wie oft ein Name schon vorkam
 
         for f in files:
-            base_name = os.path.basename(f)
-            name, ext = os.path.splitext(base_name)
-            
-            # Prüfen, ob der Name schon existiert
-            if base_name in used_names:
-                used_names[base_name] += 1
-                # Neuen Namen generieren: "Name_1.pdf"
-                new_name = f"{name}_{used_names[base_name]}{ext}"
-            else:
-                used_names[base_name] = 0
-                new_name = base_name
-
-            zipf.write(f, new_name)
+            sample = b""
+            if compression == "auto":
+                with open(f, "rb") as fh:
+                    sample = fh.read(AUTO_SAMPLE_SIZE)
 
+            compress_type, compresslevel = choose_compression(sample, compression, level)
+            zipf.write(
+                f,
+                unique_name(os.path.basename(f), used_names),
+                compress_type=compress_type,
+                compresslevel=compresslevel
+            )
+
+    metrics.inc("vv_bytes_written_total", os.path.getsize(zip_path), kind="zip")
     return zip_path
+
+
+class _StreamBuffer:
+    # Nicht-seekbares Ziel für ZipFile: sammelt die Bytes, bis der
+    # Generator sie an die HTTP-Antwort weiterreicht
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(
+    entries: Iterable[tuple[str, bytes]],
+    compression: str = "stored",
+    level: int | None = None
+) -> Iterator[bytes]:
+    # Jeder Eintrag wird sofort nach dem Rendern ausgeliefert; erst am Ende
+    # folgt das zentrale Verzeichnis
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        used_names = {}
+
+        for base_name, data in entries:
+            # Nur das Packen messen, nicht das Rendern im Generator davor
+            with metrics.stage("zip"):
+                compress_type, compresslevel = choose_compression(data, compression, level)
+                zipf.writestr(
+                    unique_name(base_name, used_names),
+                    data,
+                    compress_type=compress_type,
+                    compresslevel=compresslevel
+                )
+                chunk = buffer.drain()
+            metrics.inc("vv_bytes_written_total", len(chunk), kind="zip")
+            yield chunk
+
+    chunk = buffer.drain()
+    metrics.inc("vv_bytes_written_total", len(chunk), kind="zip")
+    yield chunk
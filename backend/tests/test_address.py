@@ -0,0 +1,87 @@
+import pytest
+
+from app.services.address import EMPTY_ADDRESSES, parse_addresses
+
+# Erwartete Werte = Ausgaben der früheren Einzelfunktionen
+# (split_multiple_objects, split_strasse_hausnummer, shorten_streets,
+# split_strasse_hausnummer_lexico) für dieselbe Zelle
+CASES = [
+    # Text, Objekte, (Straße, Hausnummern), Kurzform, kleinste Hausnummer
+    ("", (), (None, None), "", (None, None)),
+    ("Hauptstr. 1", ("Hauptstr. 1",), ("Hauptstr.", "1"), "Hauptstr. 1", ("Hauptstr.", "1")),
+    (
+        "Hauptstr. 1, Nebenweg 2, Hauptstr. 3",
+        ("Hauptstr. 1", "Nebenweg 2", "Hauptstr. 3"),
+        ("Hauptstr.", "1, 3"),
+        "Hauptstr. 1, 3, Nebenweg 2",
+        ("Hauptstr.", "1"),
+    ),
+    (
+        "Bahner Str. 8 a, b, Hauptstr. 3",
+        ("Bahner Str. 8 a", "b", "Hauptstr. 3"),
+        ("Bahner Str.", "8 a, b"),
+        "Bahner Str. 8 a, b, Hauptstr. 3",
+        ("Hauptstr.", "3"),
+    ),
+    (
+        "Am Ring 12a, Am Ring 9, Am Ring 10b",
+        ("Am Ring 12a", "Am Ring 9", "Am Ring 10b"),
+        ("Am Ring", "12a, 9, 10b"),
+        "Am Ring 12a, 9, 10b",
+        ("Am Ring", "9"),
+    ),
+    (
+        "Weg 3, Weg 3, Weg 5, Weg 3",
+        ("Weg 3", "Weg 3", "Weg 5", "Weg 3"),
+        ("Weg", "3, 3, 5, 3"),
+        "Weg 3, 5",
+        ("Weg", "3"),
+    ),
+    (
+        "Weg 12a, Weg 12a, Weg 12 a",
+        ("Weg 12a", "Weg 12a", "Weg 12 a"),
+        ("Weg", "12a, 12a, 12 a"),
+        "Weg 12a, 12 a",
+        ("Weg", "12a"),
+    ),
+    ("Nur Text", ("Nur Text",), ("Nur Text", ""), "Nur Text", ("Nur", "Text")),
+    ("b, Hauptstr. 2", ("b", "Hauptstr. 2"), ("Hauptstr.", "2"), "b, Hauptstr. 2", ("Hauptstr.", "2")),
+    (
+        "Lindenallee, Lindenallee 4",
+        ("Lindenallee", "Lindenallee 4"),
+        ("Lindenallee", "4"),
+        "Lindenallee 4",
+        ("Lindenallee", "4"),
+    ),
+    (
+        " Hauptstr. 1 ,, Hauptstr. 2 ",
+        ("Hauptstr. 1", "Hauptstr. 2"),
+        ("Hauptstr.", "1, 2"),
+        "Hauptstr. 1, 2",
+        ("Hauptstr.", "1"),
+    ),
+    (
+        "Straße des 17. Juni 5, 7",
+        ("Straße des 17. Juni 5", "7"),
+        ("Straße des", "17. Juni 5, 7"),
+        "Straße des 17. Juni 5, 7",
+        ("", "7"),
+    ),
+]
+
+
+@pytest.mark.parametrize("text, objects, street, short, lowest", CASES)
+def test_parse_addresses(text, objects, street, short, lowest):
+    result = parse_addresses(text)
+
+    assert result.objects == objects
+    assert (result.street, result.house_numbers) == street
+    assert result.short == short
+    assert result.lowest == lowest
+
+@pytest.mark.parametrize("value", [None, "", 0])
+def test_empty_values(value):
+    assert parse_addresses(value) is EMPTY_ADDRESSES
+
+def test_non_string_value_is_parsed_as_text():
+    assert parse_addresses(12).objects == ("12",)
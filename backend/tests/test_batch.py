@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import zipfile
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+from app.services import metrics, render_cache, render_pool
+from app.services.batch import BatchOptions, render_batch, stream_batch
+
+ROW = {
+    "Objekt Str + Hnr": "Hauptstr. 1",
+    "Objekt PLZ": "50667",
+    "Objekt Ort": "Köln",
+    "Anzahl WE": "4",
+    "Vertragsp. Name": "Muster",
+}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Beliebige TTF mit Umlauten; fehlt sie, wird der Test übersprungen
+TEST_TTF = os.environ.get("TEST_TTF") or (
+    "/root/.rbenv/versions/2.7.8/lib/ruby/2.7.0/rdoc/generator/template/darkfish/fonts/Lato-Regular.ttf"
+)
+
+# FONT wird beim Import festgelegt → mit OVERLAY_FONT in eigenem Prozess rendern
+FONT_FILES_SCRIPT = """
+import os
+import sys
+from app.services.batch import BatchOptions, render_batch
+row = {"Objekt PLZ": "50667", "Objekt Ort": "Köln", "Anzahl WE": "4", "Vertragsp. Name": "Müller"}
+for count in (1, 2):
+    rows = [{**row, "Objekt Str + Hnr": f"Hauptstraße {i + 1}"} for i in range(count)]
+    os.makedirs(f"{sys.argv[1]}/{count}")
+    result = render_batch(rows, f"{sys.argv[1]}/{count}", BatchOptions(output="pdf"))
+    print(open(result.path, "rb").read().count(b"/FontFile2"))
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(tmp_path / "cache"))
+
+@pytest.fixture(autouse=True)
+def serial(monkeypatch):
+    # Im Request-Prozess rendern (kein Prozess-Pool im Test)
+    monkeypatch.setattr(render_pool, "RENDER_WORKERS", 1)
+
+
+def test_first_chunk_before_rows_are_drained():
+    consumed = []
+
+    def rows():
+        for i in range(40):
+            consumed.append(i)
+            yield {**ROW, "Objekt Str + Hnr": f"Hauptstr. {i + 1}"}
+
+    stream = stream_batch(rows())
+    first = next(stream)
+
+    # Erstes Byte nach dem ersten Vertrag, nicht nach einem vollen Stapel
+    assert first.startswith(b"PK")
+    assert len(consumed) == 1
+
+    data = first + b"".join(stream)
+    assert len(consumed) == 40
+    assert len(zipfile.ZipFile(BytesIO(data)).namelist()) == 40
+
+def test_combined_pdf_has_one_outline_entry_per_contract(tmp_path):
+    rows = [
+        ROW,
+        {**ROW, "Objekt Str + Hnr": "Nebenweg 2, 4, 6", "Anzahl WE": "1,2,3"},
+        {**ROW, "Objekt Str + Hnr": "Am Ring 9"},
+    ]
+
+    result = render_batch(rows, str(tmp_path), BatchOptions(output="pdf"))
+
+    reader = PdfReader(result.path)
+    outline = [(item.title, reader.get_destination_page_number(item)) for item in reader.outline]
+    # VV + VV2, beim Mehrfachobjekt zusätzlich eine OL-Seite
+    assert outline == [
+        ("Hauptstr 1, 50667 Köln", 0),
+        ("Nebenweg 2, 4, 6, 50667 Köln", 2),
+        ("Am Ring 9, 50667 Köln", 5),
+    ]
+    assert len(reader.pages) == 7
+    assert result.errors == 0
+
+def _font_files(path: str) -> int:
+    with open(path, "rb") as f:
+        return f.read().count(b"/FontFile2")
+
+@pytest.mark.skipif(not os.path.isfile(TEST_TTF), reason="keine TTF zum Einbetten")
+def test_overlay_font_is_embedded_once_per_document(tmp_path):
+    # Ohne OVERLAY_FONT: nur die Schriften der Vorlagen
+    rows = [{**ROW, "Objekt Str + Hnr": f"Hauptstraße {i + 1}"} for i in range(2)]
+    (tmp_path / "builtin").mkdir()
+    builtin = _font_files(render_batch(rows, str(tmp_path / "builtin"), BatchOptions(output="pdf")).path)
+
+    env = {
+        **os.environ,
+        "OVERLAY_FONT": TEST_TTF,
+        "RENDER_WORKERS": "1",
+        "RENDER_CACHE_DIR": str(tmp_path / "cache"),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", FONT_FILES_SCRIPT, str(tmp_path)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+
+    # Gleiche Subsets in allen Overlays → eine Schriftdatei für alle Verträge
+    # (auch keine Meldung "Error in Schrift" in der Ausgabe)
+    assert output.split() == [str(builtin + 1)] * 2
+
+@pytest.mark.parametrize("output", ["zip", "pdf"])
+def test_workdir_is_measured_with_result(tmp_path, monkeypatch, output):
+    sizes = []
+    monkeypatch.setattr(metrics, "record_workdir", lambda path: sizes.append(metrics.dir_size(path)))
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    (workdir / "upload.xlsx").write_bytes(b"x" * 1000)
+
+    render_batch([ROW, {**ROW, "Objekt Str + Hnr": "Am Ring 9"}], str(workdir), BatchOptions(output=output))
+
+    # Gemessen, wenn Upload, PDFs und Ergebnis vorliegen (vor dem Aufräumen)
+    assert sizes == [metrics.dir_size(str(workdir))]
+    assert sizes[0] > 1000
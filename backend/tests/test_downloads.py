@@ -0,0 +1,109 @@
+import asyncio
+import os
+from email.utils import formatdate
+
+import pytest
+from starlette.requests import Request
+
+from app.main import app
+from app.services.downloads import _not_modified, file_etag, hash_file
+
+TEMPLATE = "app/templates/Versorgungsvereinbarung Template.xlsx"
+
+
+def _request(method: str = "GET", **headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+def _get(path: str, **headers) -> tuple[int, dict, bytes]:
+    # Anfrage direkt an die ASGI-App (ohne HTTP-Client)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    start = messages[0]
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"x"', False),
+])
+def test_if_none_match(header, expected):
+    assert _not_modified(_request(if_none_match=header), '"abc"', 1000) is expected
+
+def test_if_none_match_wins_over_if_modified_since():
+    request = _request(if_none_match='"x"', if_modified_since=formatdate(2000, usegmt=True))
+
+    assert _not_modified(request, '"abc"', 1000) is False
+
+@pytest.mark.parametrize("since, expected", [
+    (formatdate(1000, usegmt=True), True),
+    (formatdate(999, usegmt=True), False),
+    ("kein Datum", False),
+])
+def test_if_modified_since(since, expected):
+    assert _not_modified(_request(if_modified_since=since), '"abc"', 1000.5) is expected
+
+def test_only_get_and_head_are_not_modified():
+    assert _not_modified(_request("POST", if_none_match="*"), '"abc"', 1000) is False
+    assert _not_modified(_request("HEAD", if_none_match="*"), '"abc"', 1000) is True
+
+def test_file_etag_follows_content(tmp_path):
+    path = tmp_path / "a.zip"
+    path.write_bytes(b"eins")
+    first = file_etag(str(path))
+
+    path.write_bytes(b"zwei")
+
+    assert file_etag(str(path)) != first
+    assert file_etag(str(path)) == hash_file(str(path))
+
+def test_template_download_with_etag_and_304():
+    status, headers, body = _get("/template")
+    assert status == 200
+    assert headers["etag"] == hash_file(TEMPLATE)
+    assert "must-revalidate" in headers["cache-control"]
+    assert len(body) == os.path.getsize(TEMPLATE)
+
+    status, headers, body = _get("/template", if_none_match=headers["etag"])
+    assert status == 304
+    assert body == b""
+
+def test_template_download_range():
+    size = os.path.getsize(TEMPLATE)
+    with open(TEMPLATE, "rb") as f:
+        expected = f.read()[100:200]
+
+    status, headers, body = _get("/template", range="bytes=100-199")
+
+    assert status == 206
+    assert headers["content-range"] == f"bytes 100-199/{size}"
+    assert body == expected
@@ -0,0 +1,62 @@
+from app.services.excel import iter_rows, read_rows
+
+
+def _write_csv(tmp_path, text: str):
+    path = tmp_path / "upload.csv"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def test_csv_keeps_leading_zero_and_we_list(tmp_path):
+    # PLZ "01067" bleibt Text, "10,20" ist eine WE-Liste und keine Dezimalzahl
+    path = _write_csv(tmp_path, (
+        "Objekt Str + Hnr;Objekt PLZ;Objekt Ort;Anzahl WE\n"
+        "Lange Str. 1, 2;01067;Dresden;10,20\n"
+        "Weg 3;;Köln;7\n"
+    ))
+
+    rows = read_rows(path)
+
+    assert rows[0]["Objekt PLZ"] == "01067"
+    assert rows[0]["Anzahl WE"] == "10,20"
+    assert rows[0]["Objekt Str + Hnr"] == "Lange Str. 1, Lange Str. 2"
+    assert rows[1]["Objekt PLZ"] == ""
+    assert rows[1]["Anzahl WE"] == "7"
+
+def test_csv_columns_are_text_in_every_chunk(tmp_path):
+    # Jeder Block wird gleich gelesen (keine Typ-Erkennung pro Block)
+    path = _write_csv(tmp_path, "Objekt PLZ,Anzahl WE\n01067,3\n04109,4\n28195,5\n")
+
+    rows = list(iter_rows(path, chunk_size=2))
+
+    assert [r["Objekt PLZ"] for r in rows] == ["01067", "04109", "28195"]
+    assert [r["Anzahl WE"] for r in rows] == ["3", "4", "5"]
+
+def test_cp1252_umlaut_after_sample(tmp_path):
+    # Encoding-Stichprobe (erste 64 KB) ist reines ASCII, der erste Umlaut
+    # eines Windows-1252-Exports kommt erst danach
+    path = tmp_path / "upload.csv"
+    text = "Objekt Ort;Objekt PLZ\n" + "Bonn;53111\n" * 8000 + "Köln;50667\n"
+    path.write_bytes(text.encode("cp1252"))
+
+    rows = list(iter_rows(path, chunk_size=3000))
+
+    assert len(rows) == 8001
+    assert rows[-1]["Objekt Ort"] == "Köln"
+
+def test_utf8_with_stray_cp1252_bytes_after_sample(tmp_path):
+    # UTF-8 laut Stichprobe; einzelne cp1252-Zeilen weiter hinten
+    path = _write_csv(tmp_path, "Objekt Ort;Objekt PLZ\nMünchen;80331\n" + "Bonn;53111\n" * 8000)
+    with open(path, "ab") as f:
+        f.write("Köln;50667\n".encode("cp1252"))
+
+    rows = read_rows(path)
+
+    assert rows[0]["Objekt Ort"] == "München"
+    assert rows[-1]["Objekt Ort"] == "Köln"
+
+def test_csv_headers_are_mapped_to_known_columns(tmp_path):
+    path = _write_csv(tmp_path, "﻿objekt  plz;OBJEKT ORT\n01067;Dresden\n")
+
+    rows = read_rows(path)
+
+    assert dict(rows[0]) == {"Objekt PLZ": "01067", "Objekt Ort": "Dresden"}
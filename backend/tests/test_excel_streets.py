@@ -0,0 +1,80 @@
+import random
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.excel import clean_frame, iter_rows
+
+COLUMN = "Objekt Str + Hnr"
+
+# Einzelwert-Normalisierung wie vor der spaltenweisen Umstellung (Referenz)
+_STREET_RE = re.compile(r"^(.+?)\s+(\d.*)$")
+
+def _reference(value):
+    if not value or not isinstance(value, str):
+        return value
+
+    parts = [p.strip() for p in value.split(",") if p.strip()]
+    result = []
+    current_street = None
+
+    for part in parts:
+        m = _STREET_RE.match(part)
+        if m:
+            street, number = m.groups()
+            current_street = street.strip()
+            result.append(f"{current_street} {number.strip()}")
+        elif current_street:
+            result.append(f"{current_street} {part}")
+        else:
+            result.append(part)
+
+    return ", ".join(result)
+
+
+@pytest.mark.parametrize("cells, expected", [
+    ([", "], [""]),
+    ([","], [""]),
+    ([", ", ",", " , ,"], ["", "", ""]),
+    ([np.nan, ""], ["", ""]),
+    ([", ", np.nan, "Weg 3, b"], ["", "", "Weg 3, Weg b"]),
+])
+def test_clean_frame_comma_blank_and_nan_streets(cells, expected):
+    df = clean_frame(pd.DataFrame({COLUMN: cells}))
+
+    assert df[COLUMN].tolist() == expected
+
+def test_chunk_of_comma_only_streets(tmp_path):
+    # Ein Block nur aus Kommas / leeren Zellen darf den Upload nicht abbrechen
+    path = tmp_path / "upload.csv"
+    path.write_text(
+        f'{COLUMN};Objekt Ort\n", ";Köln\n",";Bonn\n;Essen\n"Lange Str. 1, 2";Dresden\n',
+        encoding="utf-8"
+    )
+
+    rows = list(iter_rows(path, chunk_size=2))
+
+    assert [r[COLUMN] for r in rows] == ["", "", "", "Lange Str. 1, Lange Str. 2"]
+    assert [r["Objekt Ort"] for r in rows] == ["Köln", "Bonn", "Essen", "Dresden"]
+
+def test_streets_match_reference_on_fuzzed_frame():
+    rng = random.Random(1234)
+    pieces = ["Bahner Str. 8", "8 a", "b", "Hauptstr. 3", "Am Ring 12a", "",
+              " ", "Weg", "Weg 1 2", "10", "Str.  7", " Gasse 5"]
+
+    cells = []
+    for _ in range(2000):
+        if rng.random() < 0.05:
+            cells.append(np.nan)
+            continue
+        cells.append(",".join(rng.choice(pieces) for _ in range(rng.randint(1, 5))))
+
+    df = clean_frame(pd.DataFrame({COLUMN: cells}))
+
+    expected = [
+        "" if isinstance(c, float) else _reference(c.replace(" ", " ").strip())
+        for c in cells
+    ]
+    assert df[COLUMN].tolist() == expected
@@ -0,0 +1,42 @@
+from openpyxl import Workbook
+
+from app.services import excel
+from app.services.excel import iter_rows
+
+
+def _write_xlsx(tmp_path, rows: int):
+    path = tmp_path / "upload.xlsx"
+    book = Workbook()
+    sheet = book.active
+    sheet.append(["Objekt PLZ", "Objekt Ort"])
+    for i in range(rows):
+        sheet.append([10000 + i, "Köln"])
+    book.save(path)
+    return path
+
+
+def test_first_excel_chunk_is_small(tmp_path):
+    path = _write_xlsx(tmp_path, 50)
+
+    frames = list(excel._iter_excel_frames(str(path), 1000))
+
+    assert [len(f) for f in frames] == [excel.FIRST_EXCEL_CHUNK_ROWS, 50 - excel.FIRST_EXCEL_CHUNK_ROWS]
+
+def test_excel_rows_across_chunks(tmp_path):
+    path = _write_xlsx(tmp_path, 40)
+
+    rows = list(iter_rows(path, chunk_size=10))
+
+    assert [r["Objekt PLZ"] for r in rows] == [str(10000 + i) for i in range(40)]
+
+def test_excel_headers_are_kept(tmp_path):
+    # Abbildung der Kopfzeilen gilt nur für CSV/Parquet
+    path = tmp_path / "upload.xlsx"
+    book = Workbook()
+    book.active.append(["objekt plz", "Objekt Ort"])
+    book.active.append([50667, "Köln"])
+    book.save(path)
+
+    rows = list(iter_rows(path))
+
+    assert dict(rows[0]) == {"objekt plz": "50667", "Objekt Ort": "Köln"}
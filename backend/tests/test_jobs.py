@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import pytest
+
+from app.services import jobs
+from app.services.jobs import create_job, read_status, start_job
+
+
+class Result(NamedTuple):
+    path: str
+    errors: int
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+
+def _wait_for(job_id: str, *states: str, timeout: float = 5) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = read_status(job_id)
+        if status["status"] in states:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} blieb {status['status']}")
+
+
+def test_job_runs_to_done_with_progress():
+    job_id, workdir = create_job()
+    assert read_status(job_id)["status"] == "queued"
+
+    def task(directory: str, progress):
+        path = os.path.join(directory, "out.zip")
+        with open(path, "wb") as f:
+            f.write(b"zip")
+        for done in range(4):
+            progress(done, 3)
+        return Result(path, 1)
+
+    start_job(job_id, task)
+    status = _wait_for(job_id, "done", "error")
+
+    assert status["status"] == "done"
+    assert (status["rows_done"], status["rows_total"], status["eta_seconds"]) == (3, 3, 0)
+    assert status["path"] == os.path.join(workdir, "out.zip")
+    assert status["errors"] == 1
+    assert status["etag"]
+    assert job_id not in jobs._active
+
+def test_failing_task_reports_error():
+    job_id, _ = create_job()
+
+    def task(directory: str, progress):
+        raise ValueError("kaputt")
+
+    start_job(job_id, task)
+    status = _wait_for(job_id, "done", "error")
+
+    assert (status["status"], status["error"]) == ("error", "kaputt")
+
+def test_heartbeat_keeps_running_job_fresh(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(jobs, "_heartbeat", None)
+    release = threading.Event()
+
+    job_id, _ = create_job()
+    start_job(job_id, lambda directory, progress: release.wait(5) and Result("", 0))
+    first = _wait_for(job_id, "running")["updated"]
+
+    # Ohne Fortschritt schreibt nur der Heartbeat
+    time.sleep(0.3)
+    updated = read_status(job_id)["updated"]
+    release.set()
+
+    assert updated > first
+    _wait_for(job_id, "done", "error")
+
+def test_job_without_heartbeat_is_reported_failed(monkeypatch):
+    job_id, directory = create_job()
+    path = os.path.join(directory, "status.json")
+    with open(path, encoding="utf-8") as f:
+        status = json.load(f)
+    status.update(status="running", updated=time.time() - jobs.JOB_STALE_SECONDS - 1)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+
+    status = read_status(job_id)
+
+    assert status["status"] == "error"
+    assert "abgebrochen" in status["error"]
+
+def test_unknown_or_invalid_job_ids():
+    assert read_status("0" * 32) is None
+    assert read_status("../etc") is None
+
+def test_concurrent_first_jobs_start_one_heartbeat(monkeypatch):
+    started = []
+    monkeypatch.setattr(jobs, "_heartbeat", None)
+    monkeypatch.setattr(jobs, "_beat", lambda: started.append(1))
+    barrier = threading.Barrier(8)
+
+    def submit():
+        barrier.wait()
+        jobs._start_heartbeat()
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    jobs._heartbeat.join()
+
+    assert started == [1]
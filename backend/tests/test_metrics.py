@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import app.main as main
+
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/metrics",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def test_metrics_open_without_token(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+
+    response = main.get_metrics(_request())
+
+    assert b"# TYPE vv_workdir_peak_bytes gauge" in response.body
+
+@pytest.mark.parametrize("headers", [{}, {"authorization": "Bearer falsch"}, {"authorization": "geheim"}])
+def test_metrics_need_token(monkeypatch, headers):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "geheim")
+
+    with pytest.raises(HTTPException) as e:
+        main.get_metrics(_request(**headers))
+
+    assert e.value.status_code == 401
+    assert e.value.headers == {"WWW-Authenticate": "Bearer"}
+
+def test_metrics_with_token(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "geheim")
+
+    response = main.get_metrics(_request(authorization="Bearer geheim"))
+
+    assert response.status_code == 200
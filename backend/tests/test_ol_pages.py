@@ -0,0 +1,104 @@
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+from reportlab.lib.units import mm
+
+from app.services import ol_overlay
+from app.services.contract import build_contract_stamps
+from app.services.ol_overlay import OL_ROWS_PER_PAGE, create_ol_stamps, layout_ol_table, ol_pages, render_ol_overlay
+from app.services.template_cache import get_base_pages
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595
+
+
+def _objects(count: int) -> list[str]:
+    return [f"Hauptstr. {i + 1}" for i in range(count)]
+
+def _lfd_numbers(pages) -> list[list[int]]:
+    # lfd. Nr. steht in der ersten Spalte (9.5 mm / ab 10: 8.5 mm)
+    return [
+        [int(text) for x, _, text, _ in cells if x in (9.5 * mm, 8.5 * mm)]
+        for cells in pages
+    ]
+
+def _sum_per_page(overlay: bytes, we_sum: int) -> list[int]:
+    reader = PdfReader(BytesIO(overlay))
+    return [
+        page.get_contents().get_data().count(f"({we_sum}) Tj".encode())
+        for page in reader.pages
+    ]
+
+
+def test_rows_per_page_matches_old_chunk_size():
+    assert OL_ROWS_PER_PAGE == 12
+
+@pytest.mark.parametrize("count, expected", [
+    (0, [(0, 0)]),
+    (1, [(0, 1)]),
+    (12, [(0, 12)]),
+    (13, [(0, 12), (12, 1)]),
+    (24, [(0, 12), (12, 12)]),
+    (300, [(start, 12) for start in range(0, 300, 12)]),
+    (301, [(start, 12) for start in range(0, 300, 12)] + [(300, 1)]),
+])
+def test_ol_pages(count, expected):
+    assert ol_pages(count) == expected
+
+@pytest.mark.parametrize("count", [2, 12, 13, 300])
+def test_lfd_numbers_continue_across_pages(count):
+    pages = layout_ol_table(_objects(count), "50667", "Köln", [1] * count)
+
+    numbers = _lfd_numbers(pages)
+
+    assert len(pages) == -(-count // 12)
+    assert all(len(page) == 12 for page in numbers[:-1])
+    assert [n for page in numbers for n in page] == list(range(1, count + 1))
+
+def test_lfd_numbers_start_after_start_lfd():
+    pages = layout_ol_table(_objects(13), "50667", "Köln", [], start_lfd=24)
+
+    assert _lfd_numbers(pages) == [list(range(25, 37)), [37]]
+
+def test_missing_we_values_are_zero():
+    pages = layout_ol_table(_objects(3), "", "", [5])
+
+    # Spalte WE: 0 rechtsbündig wie eine einstellige Zahl
+    we = [text for x, _, text, _ in pages[0] if x == 186.8 * mm]
+    assert we == ["5", "0", "0"]
+
+@pytest.mark.parametrize("count", [0, 12, 13, 300])
+def test_we_sum_on_every_ol_page(count):
+    we_list = [7] * count
+    we_sum = sum(we_list) + 1000    # keine Verwechslung mit lfd. Nr./WE
+
+    overlay = render_ol_overlay(
+        _objects(count), "50667", "Köln", we_list, we_sum, PAGE_WIDTH, PAGE_HEIGHT
+    ).getvalue()
+
+    # Wie früher je 12er-Block: jede OL-Seite trägt die Summe genau einmal
+    assert _sum_per_page(overlay, we_sum) == [1] * len(ol_pages(count))
+
+@pytest.mark.parametrize("count", [2, 12, 13, 300])
+def test_create_ol_stamps_one_overlay_page_per_ol_page(count):
+    base_pages = get_base_pages(ol_overlay.OL_TEMPLATE)
+
+    stamps = create_ol_stamps(_objects(count), "50667", "Köln", [1] * count, count)
+
+    pages = len(ol_pages(count))
+    assert len(stamps) == pages * len(base_pages)
+    assert [s.overlay_page for s in stamps] == [p for p in range(pages) for _ in base_pages]
+    assert len(PdfReader(BytesIO(stamps[0].overlay)).pages) == pages
+
+@pytest.mark.parametrize("objects, ol_stamps", [
+    ("Hauptstr. 1", 0),
+    ("Hauptstr. 1, 3", 1),
+    (", ".join(_objects(13)), 2),
+])
+def test_contract_has_ol_pages_only_for_several_objects(objects, ol_stamps):
+    row = {"Objekt Str + Hnr": objects, "Anzahl WE": "3", "Vertragsp. Name": "Muster"}
+
+    stamps = build_contract_stamps(row)
+
+    base_pages = len(get_base_pages(ol_overlay.OL_TEMPLATE))
+    assert len(stamps) == 2 + ol_stamps * base_pages
@@ -0,0 +1,50 @@
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+from app.services import render_cache
+from app.services.contract import build_contract_stamps
+from app.services.pdf_merge import write_stamps
+
+# 14 Objekte → VV, VV2 und zwei OL-Seiten aus derselben Vorlagenseite
+ROW = {
+    "Objekt Str + Hnr": ", ".join(f"Hauptstr. {i}" for i in range(1, 15)),
+    "Objekt PLZ": "50667",
+    "Objekt Ort": "Köln",
+    "Anzahl WE": ",".join(["3"] * 14),
+    "Vertragsp. Name": "Muster",
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(tmp_path / "cache"))
+
+def _write(stamps, mode: str) -> PdfReader:
+    buffer = BytesIO()
+    write_stamps(stamps, buffer, mode=mode)
+    return PdfReader(BytesIO(buffer.getvalue()))
+
+
+def test_xobject_output_matches_merge():
+    stamps = build_contract_stamps(ROW)
+
+    merged = _write(stamps, "merge")
+    xobject = _write(stamps, "xobject")
+
+    assert len(xobject.pages) == len(merged.pages) == 4
+    for a, b in zip(merged.pages, xobject.pages):
+        assert [float(v) for v in a.mediabox] == [float(v) for v in b.mediabox]
+        # Gleicher Text; die Reihenfolge der Leerzeichen kann abweichen
+        assert sorted(a.extract_text().split()) == sorted(b.extract_text().split())
+
+def test_xobject_embeds_each_template_page_once():
+    xobject = _write(build_contract_stamps(ROW), "xobject")
+
+    # Beide OL-Seiten zeigen auf dasselbe Vorlagen-XObject
+    ol = [
+        {ref.idnum for ref in page["/Resources"]["/XObject"].values()}
+        for page in xobject.pages[2:]
+    ]
+    assert ol[0] & ol[1]
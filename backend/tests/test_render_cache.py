@@ -0,0 +1,143 @@
+import os
+import shutil
+
+import pytest
+
+from app.services import contract, profiling, render_cache
+from app.services.template_store import BUILTIN_TEMPLATES, TemplateSet
+
+ROW = {
+    "Objekt Str + Hnr": "Hauptstr. 1, Hauptstr. 3",
+    "Objekt PLZ": "50667",
+    "Objekt Ort": "Köln",
+    "Anzahl WE": "4,6",
+    "Vertragsp. Name": "Muster",
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(directory))
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_MAX_MB", 1024)
+    monkeypatch.setattr(render_cache, "_last_prune", -render_cache.PRUNE_INTERVAL)
+    return directory
+
+@pytest.fixture
+def rendered(monkeypatch):
+    # Zeilen, die wirklich gezeichnet wurden (kein Cache-Treffer)
+    calls = []
+    build = contract.build_batch_stamps
+
+    def counting(rows, templates=None):
+        calls.extend(rows)
+        return build(rows, templates)
+
+    monkeypatch.setattr(contract, "build_batch_stamps", counting)
+    return calls
+
+def _cached_files(directory) -> list[str]:
+    return [name for _, _, files in os.walk(directory) for name in files]
+
+def _copy_templates(tmp_path) -> TemplateSet:
+    directory = tmp_path / "templates"
+    directory.mkdir()
+    vv = shutil.copyfile(BUILTIN_TEMPLATES.vv, directory / "VV_Vorlage.pdf")
+    vv2 = shutil.copyfile(BUILTIN_TEMPLATES.vv2, directory / "VV_2_Vorlage.pdf")
+    return TemplateSet("test", str(vv), str(vv2))
+
+
+def test_identical_row_is_served_from_cache(rendered, cache_dir):
+    first = contract.render_contract_bytes_batch([ROW])
+    second = contract.render_contract_bytes_batch([dict(ROW)])
+
+    assert len(rendered) == 1
+    assert len(_cached_files(cache_dir)) == 1
+    assert second == first
+
+def test_changed_row_is_rendered_again(rendered):
+    contract.render_contract_bytes_batch([ROW])
+    contract.render_contract_bytes_batch([{**ROW, "Objekt Ort": "Bonn"}])
+
+    assert len(rendered) == 2
+
+def test_changed_template_misses(tmp_path, rendered):
+    templates = _copy_templates(tmp_path)
+    key = contract.render_key(ROW, "merge", templates)
+    contract.render_contract_bytes_batch([ROW], templates=templates)
+
+    # Andere Vorlage unter demselben Pfad (anderer Inhalt, andere Größe)
+    shutil.copyfile(BUILTIN_TEMPLATES.vv2, templates.vv)
+    contract.render_contract_bytes_batch([ROW], templates=templates)
+
+    assert contract.render_key(ROW, "merge", templates) != key
+    assert len(rendered) == 2
+
+def test_stamp_mode_is_part_of_the_key(rendered):
+    contract.render_contract_bytes_batch([ROW], stamp_mode="merge")
+    contract.render_contract_bytes_batch([ROW], stamp_mode="xobject")
+
+    assert (
+        contract.render_key(ROW, "merge", BUILTIN_TEMPLATES)
+        != contract.render_key(ROW, "xobject", BUILTIN_TEMPLATES)
+    )
+    assert len(rendered) == 2
+
+def test_contract_start_date_is_part_of_the_key(monkeypatch):
+    key = contract.render_key(ROW, "merge", BUILTIN_TEMPLATES)
+    monkeypatch.setattr(contract, "contract_start_date", lambda: "01.01.2099")
+
+    assert contract.render_key(ROW, "merge", BUILTIN_TEMPLATES) != key
+
+def test_no_caching_while_profiling(rendered, cache_dir):
+    with profiling._row_timer(profiling.RowTimer()):
+        assert contract.render_key(ROW, "merge", BUILTIN_TEMPLATES) is None
+        contract.render_contract_bytes_batch([ROW])
+        contract.render_contract_bytes_batch([ROW])
+
+    assert len(rendered) == 2
+    assert _cached_files(cache_dir) == []
+
+def test_disabled_cache_has_no_key(monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_MAX_MB", 0)
+
+    assert contract.render_key(ROW, "merge", BUILTIN_TEMPLATES) is None
+
+def test_prune_evicts_oldest_down_to_limit(cache_dir, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_MAX_MB", 1)
+    size = 300 * 1024
+
+    keys = [render_cache.cache_key(i) for i in range(5)]
+    for age, key in zip((50, 10, 40, 20, 30), keys):
+        render_cache.put_bytes(key, b"x" * size)
+        path = render_cache._path(key)
+        os.utime(path, (1_000_000 - age, 1_000_000 - age))
+
+    # 1500 KB > 1024 KB → Älteste löschen, bis höchstens 90 % übrig sind
+    render_cache.prune_cache()
+
+    assert [render_cache.get_bytes(key) is not None for key in keys] == [False, True, False, True, True]
+
+def test_prune_keeps_cache_below_limit(cache_dir):
+    key = render_cache.cache_key("row")
+    render_cache.put_bytes(key, b"pdf")
+
+    render_cache.prune_cache()
+
+    assert render_cache.get_bytes(key) == b"pdf"
+
+def test_prune_runs_at_most_once_per_interval(cache_dir, monkeypatch):
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(render_cache.os, "walk", lambda path: walks.append(path) or walk(path))
+    render_cache.put_bytes(render_cache.cache_key("row"), b"pdf")
+
+    render_cache.prune_cache()
+    render_cache.prune_cache()
+    assert len(walks) == 1
+
+    # Nach Ablauf des Intervalls bzw. mit force wieder
+    monkeypatch.setattr(render_cache, "_last_prune", render_cache._last_prune - render_cache.PRUNE_INTERVAL)
+    render_cache.prune_cache()
+    render_cache.prune_cache(force=True)
+    assert len(walks) == 3
@@ -0,0 +1,125 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services import render_pool
+from app.services.render_pool import RowResult, iter_render_batches
+
+
+def _double(rows: list[dict]) -> list:
+    return [row["i"] * 2 for row in rows]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Threads statt Render-Prozessen: gleiche Futures, kein spawn im Test
+    executor = ThreadPoolExecutor(4)
+    monkeypatch.setattr(render_pool, "RENDER_WORKERS", 4)
+    monkeypatch.setattr(render_pool, "get_executor", lambda: executor)
+    yield executor
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def test_first_result_before_queue_is_full(pool):
+    consumed = []
+
+    def rows():
+        for i in range(100):
+            consumed.append(i)
+            time.sleep(0.005)
+            yield {"i": i}
+
+    results = iter_render_batches(_double, rows(), batch_size=1)
+
+    assert next(results) == RowResult(0, 0, None)
+    # Obergrenze wären RENDER_WORKERS * PENDING_PER_WORKER = 16 Zeilen
+    assert len(consumed) < render_pool.RENDER_WORKERS * render_pool.PENDING_PER_WORKER
+    assert [r.value for r in results] == [i * 2 for i in range(1, 100)]
+
+def test_first_batch_size_then_full_batches(monkeypatch):
+    monkeypatch.setattr(render_pool, "RENDER_WORKERS", 1)
+    sizes = []
+
+    def record(rows: list[dict]) -> list:
+        sizes.append(len(rows))
+        return _double(rows)
+
+    rows = ({"i": i} for i in range(40))
+    results = list(iter_render_batches(record, rows, batch_size=16, first_batch_size=1))
+
+    assert sizes == [1, 16, 16, 7]
+    assert [r.index for r in results] == list(range(40))
+
+
+class CrashingExecutor:
+    # Jeder Aufruf von submit liefert das nächste Ergebnis aus outcomes
+    # (Exception = Render-Prozess abgestürzt)
+    def __init__(self, outcomes: list):
+        self.outcomes = outcomes
+        self.submitted = []
+
+    def submit(self, func, *args):
+        self.submitted.append(args)
+        future = Future()
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            future.set_exception(outcome)
+        else:
+            future.set_result(func(*args))
+        return future
+
+
+def _crashed() -> Future:
+    future = Future()
+    future.set_exception(BrokenProcessPool("abgestürzt"))
+    return future
+
+@pytest.fixture
+def restarts(monkeypatch):
+    calls = []
+    monkeypatch.setattr(render_pool, "_restart_executor", calls.append)
+    return calls
+
+
+def test_retry_runs_unfinished_batches_one_by_one(monkeypatch, restarts):
+    executor = CrashingExecutor([None, None])
+    monkeypatch.setattr(render_pool, "get_executor", lambda: executor)
+
+    done = Future()
+    done.set_result((render_pool._call_batch(_double, 0, [{"i": 1}]), []))
+    batches = [
+        (0, [{"i": 1}], done),
+        (1, [{"i": 2}, {"i": 3}], _crashed()),
+        (3, [{"i": 4}], _crashed()),
+    ]
+
+    results = [r for batch in render_pool._retry_isolated(_double, batches) for r in batch]
+
+    # Fertiger Stapel wird übernommen, die anderen je einzeln wiederholt
+    assert results == [RowResult(0, 2, None), RowResult(1, 4, None), RowResult(2, 6, None), RowResult(3, 8, None)]
+    assert [args[1] for args in executor.submitted] == [1, 3]
+    assert restarts == []
+
+def test_batch_that_always_crashes_fails_alone(monkeypatch, restarts):
+    executor = CrashingExecutor([BrokenProcessPool("abgestürzt")] * render_pool.CRASH_RETRIES)
+    monkeypatch.setattr(render_pool, "get_executor", lambda: executor)
+
+    results = render_pool._run_isolated(_double, 5, [{"i": 1}, {"i": 2}])
+
+    assert [r.index for r in results] == [5, 6]
+    assert all(r.value is None and r.error.startswith("BrokenProcessPool") for r in results)
+    assert len(executor.submitted) == render_pool.CRASH_RETRIES
+    assert restarts == [executor] * render_pool.CRASH_RETRIES
+
+def test_crash_in_pool_retries_pending_batches(pool, monkeypatch, restarts):
+    # Erster Stapel stürzt ab, der Rest läuft nach der Wiederholung normal weiter
+    executor = CrashingExecutor([BrokenProcessPool("abgestürzt"), None, None, None, None])
+    monkeypatch.setattr(render_pool, "get_executor", lambda: executor)
+
+    results = list(iter_render_batches(_double, [{"i": i} for i in range(4)], batch_size=1))
+
+    assert [r.value for r in results] == [0, 2, 4, 6]
+    assert all(r.error is None for r in results)
+    assert restarts
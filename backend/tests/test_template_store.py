@@ -0,0 +1,122 @@
+import os
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from app.services import template_store
+from app.services.template_store import BUILTIN_TEMPLATES, current_templates, install_bundle
+
+
+@pytest.fixture(autouse=True)
+def versions_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "versions"
+    monkeypatch.setattr(template_store, "TEMPLATE_VERSIONS_DIR", str(directory))
+    monkeypatch.setattr(template_store, "_current", None)
+    return directory
+
+def _bundle(pages: int = 2) -> bytes:
+    # Admin-PDF aus den mitgelieferten A4-Vorlagen
+    writer = PdfWriter()
+    for path in (BUILTIN_TEMPLATES.vv, BUILTIN_TEMPLATES.vv2)[:pages]:
+        writer.add_page(PdfReader(path).pages[0])
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def _read_current(directory) -> str:
+    return (directory / "CURRENT").read_text(encoding="utf-8")
+
+def _make_version(directory, name: str, mtime: float):
+    path = directory / name
+    path.mkdir(parents=True)
+    os.utime(path, (mtime, mtime))
+
+
+def test_without_versions_builtin_templates_are_used():
+    assert current_templates() is BUILTIN_TEMPLATES
+
+def test_install_switches_current(versions_dir):
+    manifest = install_bundle(_bundle(), source="admin.pdf")
+
+    templates = current_templates()
+    assert _read_current(versions_dir) == manifest["version"]
+    assert templates.version == manifest["version"]
+    assert all(os.path.isfile(path) for path in templates[1:])
+    assert [p["file"] for p in manifest["pages"]] == list(template_store.BUNDLE_FILES)
+    assert not [name for name in os.listdir(versions_dir) if name.startswith(".")]
+
+def test_current_is_replaced_atomically(versions_dir, monkeypatch):
+    first = install_bundle(_bundle())["version"]
+    replace = os.replace
+    seen = []
+
+    def checking_replace(src, dst):
+        # Bis zum Umbenennen sehen Leser die alte Version, die neue steht
+        # schon vollständig in der Temp-Datei
+        if dst.endswith("CURRENT"):
+            seen.append((_read_current(versions_dir), open(src, encoding="utf-8").read()))
+        replace(src, dst)
+
+    monkeypatch.setattr(template_store.os, "replace", checking_replace)
+    second = install_bundle(_bundle())["version"]
+
+    assert seen == [(first, second)]
+    assert _read_current(versions_dir) == second
+    assert not [name for name in os.listdir(versions_dir) if name.endswith(".tmp")]
+
+def test_running_job_keeps_its_version():
+    old = install_bundle(_bundle())
+    templates = current_templates()
+
+    install_bundle(_bundle())
+
+    # Abgelöste Version bleibt für TEMPLATE_RETAIN_SECONDS erhalten
+    assert current_templates().version != old["version"]
+    assert all(os.path.isfile(path) for path in templates[1:])
+
+def test_invalid_bundle_keeps_current(versions_dir):
+    version = install_bundle(_bundle())["version"]
+
+    with pytest.raises(ValueError, match="mindestens 2 Seiten"):
+        install_bundle(_bundle(pages=1))
+
+    assert _read_current(versions_dir) == version
+    assert current_templates().version == version
+
+def test_broken_version_falls_back_to_builtin(versions_dir):
+    versions_dir.mkdir()
+    (versions_dir / "CURRENT").write_text("fehlt", encoding="utf-8")
+
+    assert current_templates() is BUILTIN_TEMPLATES
+
+def test_prune_removes_long_superseded_versions(versions_dir, monkeypatch):
+    monkeypatch.setattr(template_store, "TEMPLATE_RETAIN_SECONDS", 100)
+    now = 1_000_000
+    monkeypatch.setattr(template_store.time, "time", lambda: now)
+
+    _make_version(versions_dir, "20240101-000000-a", now - 500)
+    _make_version(versions_dir, "20240102-000000-b", now - 400)     # Nachfolger von a: lange her
+    _make_version(versions_dir, "20240103-000000-c", now - 50)      # Nachfolger von b: gerade erst
+    _make_version(versions_dir, "20240104-000000-d", now - 10)
+    _make_version(versions_dir, ".20240105-000000-e.tmp", now - 7200)
+    _make_version(versions_dir, ".20240106-000000-f.tmp", now - 60)
+
+    template_store._prune(keep="20240104-000000-d")
+
+    assert sorted(os.listdir(versions_dir)) == [
+        ".20240106-000000-f.tmp",
+        "20240102-000000-b",
+        "20240103-000000-c",
+        "20240104-000000-d",
+    ]
+
+def test_prune_never_removes_kept_version(versions_dir, monkeypatch):
+    monkeypatch.setattr(template_store, "TEMPLATE_RETAIN_SECONDS", 100)
+
+    _make_version(versions_dir, "20240101-000000-a", 0)
+    _make_version(versions_dir, "20240102-000000-b", 0)
+
+    template_store._prune(keep="20240101-000000-a")
+
+    assert sorted(os.listdir(versions_dir)) == ["20240101-000000-a", "20240102-000000-b"]
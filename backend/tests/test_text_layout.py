@@ -0,0 +1,89 @@
+import pytest
+from reportlab.lib.units import mm
+
+from app.services.text_layout import draw_text_in_box, draw_text_in_box_plain, layout_text
+
+# Erwartete Werte = Zeilen und Schriftgröße, die draw_text_in_box vorher
+# (Zeile für Zeile mit stringWidth gemessen) gezeichnet hat.
+# Text, Boxbreite, max. Zeilen, Schriftgröße → VV (Bindestrich-Umbruch,
+# mehrzeilig eine Stufe kleiner), OL (nur Leerzeichen)
+CASES = [
+    ("Köln", 45 * mm, 2, 8, (("Köln",), 8), (("Köln",), 8)),
+    ("0.00 €", 45 * mm, 2, 8, (("0.00 €",), 8), (("0.00 €",), 8)),
+    ("a b  c", 45 * mm, 2, 8, (("a b c",), 8), (("a b c",), 8)),
+    (
+        "Hausverwaltung Mustermann und Söhne GmbH & Co. KG", 45 * mm, 2, 6,
+        (("Hausverwaltung Mustermann und Söhne", "GmbH & Co. KG"), 5),
+        (("Hausverwaltung Mustermann und Söhne", "GmbH & Co. KG"), 6),
+    ),
+    (
+        "Wohnungseigentümergemeinschaft Hauptstraße 1-3", 30 * mm, 2, 8,
+        (("Wohnungseigentümergem", "einschaft Hauptstraße 1-3"), 6),
+        (("Wohnungseigentümergem", "einschaft Hauptstraße 1-3"), 7),
+    ),
+    # Wort breiter als die Box → zeichenweise, bei min_font_size abgeschnitten
+    (
+        "Donaudampfschifffahrtsgesellschaftskapitänswitwe", 20 * mm, 2, 8,
+        (("Donaudampfschifffahrtsg", "esellschaftskapitänswitw"), 5),
+        (("Donaudampfschifffahrtsg", "esellschaftskapitänswitw"), 5),
+    ),
+    (
+        "Donaudampfschifffahrtsgesellschaftskapitänswitwenrentenversicherung Nord", 20 * mm, 2, 8,
+        (("Donaudampfschifffahrtsg", "esellschaftskapitänswitw"), 5),
+        (("Donaudampfschifffahrtsg", "esellschaftskapitänswitw"), 5),
+    ),
+    (
+        "Sehr-langer-Bindestrich-Name-ohne-Leerzeichen", 25 * mm, 2, 8,
+        (("Sehr-langer-Bindestrich-", "Name-ohne-Leerzeichen"), 5),
+        (("Sehr-langer-Bindestrich-N", "ame-ohne-Leerzeichen"), 6),
+    ),
+    (
+        "Zeile eins zwei drei vier fünf sechs sieben acht neun zehn", 21 * mm, 3, 8,
+        (("Zeile eins zwei drei", "vier fünf sechs sieben", "acht neun zehn"), 5),
+        (("Zeile eins zwei drei", "vier fünf sechs sieben", "acht neun zehn"), 6),
+    ),
+]
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.calls = []
+
+    def setFont(self, font, size):
+        self.calls.append(("setFont", font, size))
+
+    def drawString(self, x, y, text):
+        self.calls.append(("drawString", x, y, text))
+
+
+@pytest.mark.parametrize("text, box_width, max_lines, font_size, vv, ol", CASES)
+def test_layout_text(text, box_width, max_lines, font_size, vv, ol):
+    assert layout_text(text, box_width, max_lines, "Helvetica", font_size) == vv
+    assert layout_text(
+        text, box_width, max_lines, "Helvetica", font_size,
+        hyphenate=False, shrink_multiline=False
+    ) == ol
+
+@pytest.mark.parametrize("draw", [draw_text_in_box, draw_text_in_box_plain])
+def test_empty_text_draws_nothing(draw):
+    c = RecordingCanvas()
+
+    draw(c, "", 10, 20, 45 * mm, font="Helvetica")
+    draw(c, None, 10, 20, 45 * mm, font="Helvetica")
+
+    assert c.calls == []
+
+def test_lines_are_centred_around_baseline():
+    c = RecordingCanvas()
+
+    draw_text_in_box(
+        c, "Hausverwaltung Mustermann und Söhne GmbH & Co. KG", 10, 100, 45 * mm,
+        font="Helvetica", font_size=6
+    )
+
+    # Zwei Zeilen in 5 pt, Zeilenabstand 6 pt: eine halbe Zeile über/unter y_base
+    assert c.calls == [
+        ("setFont", "Helvetica", 5),
+        ("drawString", 10, 103.0, "Hausverwaltung Mustermann und Söhne"),
+        ("drawString", 10, 97.0, "GmbH & Co. KG"),
+    ]
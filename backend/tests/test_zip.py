@@ -0,0 +1,84 @@
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from app.services import zip as zip_module
+from app.services.zip import AUTO_SAMPLE_SIZE, choose_compression, stream_zip, zip_files
+
+
+def _entries():
+    yield "Vertrag.pdf", b"%PDF-1 erster"
+    yield "Vertrag.pdf", b"%PDF-1 zweiter"
+    yield "Anderer.pdf", b"%PDF-1 dritter"
+    yield "Vertrag.pdf", b"%PDF-1 vierter"
+
+
+def test_stream_zip_is_readable_with_unique_names():
+    data = b"".join(stream_zip(_entries()))
+
+    with zipfile.ZipFile(BytesIO(data)) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == ["Vertrag.pdf", "Vertrag_1.pdf", "Anderer.pdf", "Vertrag_2.pdf"]
+        assert zipf.read("Vertrag_2.pdf") == b"%PDF-1 vierter"
+
+def test_stream_zip_yields_each_entry_before_the_next_is_read():
+    read = []
+
+    def entries():
+        for name, data in _entries():
+            read.append(name)
+            yield name, data
+
+    chunks = stream_zip(entries())
+    first = next(chunks)
+
+    assert first.startswith(b"PK") and b"%PDF-1 erster" in first
+    assert len(read) == 1
+
+def test_stream_zip_without_entries():
+    data = b"".join(stream_zip([]))
+
+    assert zipfile.ZipFile(BytesIO(data)).namelist() == []
+
+@pytest.mark.parametrize("compression, expected", [
+    ("stored", zipfile.ZIP_STORED),
+    ("deflate", zipfile.ZIP_DEFLATED),
+])
+def test_fixed_compression(compression, expected):
+    assert choose_compression(os.urandom(1000), compression, 6) == (expected, 6 if expected == zipfile.ZIP_DEFLATED else None)
+
+def test_auto_deflates_compressible_data():
+    assert choose_compression(b"BT /F1 8 Tf (Hauptstr. 1) Tj ET\n" * 1000, "auto", 9) == (zipfile.ZIP_DEFLATED, 9)
+
+def test_auto_stores_incompressible_data():
+    assert choose_compression(os.urandom(AUTO_SAMPLE_SIZE), "auto") == (zipfile.ZIP_STORED, None)
+    assert choose_compression(b"", "auto") == (zipfile.ZIP_STORED, None)
+
+def test_auto_threshold(monkeypatch):
+    # Stichprobe spart ungefähr die Hälfte: deflaten nur, wenn das reicht
+    sample = os.urandom(AUTO_SAMPLE_SIZE // 2) + bytes(AUTO_SAMPLE_SIZE // 2)
+
+    monkeypatch.setattr(zip_module, "AUTO_MIN_SAVING", 0.4)
+    assert choose_compression(sample, "auto")[0] == zipfile.ZIP_DEFLATED
+
+    monkeypatch.setattr(zip_module, "AUTO_MIN_SAVING", 0.6)
+    assert choose_compression(sample, "auto")[0] == zipfile.ZIP_STORED
+
+def test_auto_looks_only_at_the_sample():
+    # Komprimierbarer Anfang entscheidet, der Rest wird nicht angesehen
+    data = bytes(AUTO_SAMPLE_SIZE) + os.urandom(4 * AUTO_SAMPLE_SIZE)
+
+    assert choose_compression(data, "auto")[0] == zipfile.ZIP_DEFLATED
+
+def test_zip_files_mixes_per_entry(tmp_path):
+    text = tmp_path / "text.pdf"
+    text.write_bytes(b"0 0 m 10 10 l S\n" * 5000)
+    noise = tmp_path / "noise.pdf"
+    noise.write_bytes(os.urandom(50000))
+
+    path = zip_files([str(text), str(noise)], str(tmp_path), "auto")
+
+    with zipfile.ZipFile(path) as zipf:
+        assert [i.compress_type for i in zipf.infolist()] == [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]